@@ -17,8 +17,9 @@ st.set_page_config(
 )
 
 # Importar módulos
-from modules.data_manager import DataManager
+from modules.data_manager import DataManager, STATUS_NORMAIS
 from modules.exam_analyzer import ExamAnalyzer
+from modules.excel_cache import read_excel
 from modules.utils import apply_custom_css, show_header
 
 # Aplicar CSS customizado
@@ -207,6 +208,8 @@ def show_dados_gerais():
                     st.rerun()
                 else:
                     st.error("Erro ao salvar dados.")
+                    # Recarregar a versão gravada (ex.: alteração feita em outra sessão)
+                    st.session_state.paciente_ativo = data_manager.get_paciente(paciente['id']) or paciente
     
     with col2:
         st.subheader("Histórico de Peso")
@@ -387,6 +390,9 @@ def show_importacao_csv():
             
             if not validation['valid']:
                 st.error(f"❌ Erro na validação: {validation['error']}")
+                if len(validation.get('errors', [])) > 5:
+                    with st.expander(f"Ver todos os {len(validation['errors'])} erros"):
+                        st.dataframe(pd.DataFrame({'Erro': validation['errors']}), use_container_width=True)
                 return
             
             # Processar importação
@@ -428,10 +434,10 @@ def show_acompanhamento():
     
     st.subheader("Acompanhamento de Exames")
     
-    # Carregar exames do paciente
-    df_exames = data_manager.load_exames(paciente['id'])
+    # Resumo dos exames do paciente (opções dos filtros)
+    resumo = data_manager.get_resumo_exames(paciente['id'])
     
-    if df_exames.empty:
+    if resumo['total'] == 0:
         st.info("Nenhum exame registrado para este paciente ainda.")
         return
     
@@ -440,41 +446,36 @@ def show_acompanhamento():
     
     with col1:
         # Filtro de parâmetro
-        parametros_disponiveis = ['Todos'] + sorted(df_exames['parametro'].unique().tolist())
+        parametros_disponiveis = ['Todos'] + resumo['parametros']
         parametro_selecionado = st.selectbox("Parâmetro", parametros_disponiveis)
     
     with col2:
         # Filtro de data
-        data_inicio = st.date_input("Data início", value=pd.to_datetime(df_exames['data_coleta']).min().date())
-        data_fim = st.date_input("Data fim", value=pd.to_datetime(df_exames['data_coleta']).max().date())
+        data_inicio = st.date_input("Data início", value=resumo['data_min'])
+        data_fim = st.date_input("Data fim", value=resumo['data_max'])
     
     with col3:
         # Filtro de status
         apenas_alterados = st.checkbox("Apenas alterados")
     
-    # Aplicar filtros
-    df_filtrado = df_exames.copy()
-    
-    if parametro_selecionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['parametro'] == parametro_selecionado]
-    
-    df_filtrado['data_coleta'] = pd.to_datetime(df_filtrado['data_coleta'])
-    df_filtrado = df_filtrado[
-        (df_filtrado['data_coleta'].dt.date >= data_inicio) &
-        (df_filtrado['data_coleta'].dt.date <= data_fim)
-    ]
-    
-    if apenas_alterados:
-        df_filtrado = df_filtrado[df_filtrado['status'] != 'Ideal']
+    # Aplicar filtros no armazenamento
+    df_filtrado = data_manager.query_exames(
+        paciente['id'],
+        parametros=None if parametro_selecionado == 'Todos' else [parametro_selecionado],
+        date_from=data_inicio,
+        date_to=data_fim,
+        status_not_in=STATUS_NORMAIS if apenas_alterados else None,
+        order_by='-data_coleta'
+    )
     
     # Mostrar tabela de resultados
     if not df_filtrado.empty:
         st.subheader("Histórico de Exames")
         
         # Formatar dados para exibição
+        df_filtrado['data_coleta'] = pd.to_datetime(df_filtrado['data_coleta'])
         df_display = df_filtrado.copy()
         df_display['data_coleta'] = df_display['data_coleta'].dt.strftime('%d/%m/%Y')
-        df_display = df_display.sort_values('data_coleta', ascending=False)
         
         # Adicionar ícones de status
         status_icons = {
@@ -496,7 +497,9 @@ def show_acompanhamento():
             st.subheader(f"Evolução - {parametro_selecionado}")
             
             from modules.utils import create_evolution_chart
-            fig = create_evolution_chart(df_filtrado, parametro_selecionado)
+            fig = create_evolution_chart(
+                df_filtrado, parametro_selecionado, cache_key=(data_manager.data_dir, paciente['id'])
+            )
             
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
@@ -519,7 +522,7 @@ def show_base_referencia():
     
     # Carregar dados de referência
     try:
-        df_ref = pd.read_excel("data/valores_referencia.xlsx")
+        df_ref = read_excel(data_manager.referencias_file)
         
         st.info("💡 Esta aba permite visualizar e editar os valores de referência. Funcionalidade de edição será implementada na próxima versão.")
         
@@ -18,10 +18,16 @@ st.set_page_config(
 )
 
 # Importar módulos
-from modules.data_manager import DataManager
+from modules.data_manager import DataManager, STATUS_NORMAIS
 from modules.exam_analyzer_v2 import ExamAnalyzerV2
+from modules.excel_cache import read_excel
+from modules import perf
+from modules.reference_table import STATUS_INFO
 from modules.utils import apply_custom_css, show_header
 
+# Instrumentação de desempenho (NUTRI_PERF=1)
+perf.instrument(globals())
+
 # Aplicar CSS customizado
 apply_custom_css()
 
@@ -40,6 +46,7 @@ if 'paciente_ativo' not in st.session_state:
 
 def main():
     """Função principal da aplicação"""
+    show_status_gravacao()
     
     # Se não há paciente ativo, mostrar tela de seleção
     if st.session_state.paciente_ativo is None:
@@ -47,6 +54,17 @@ def main():
     else:
         show_patient_dashboard()
 
+def show_status_gravacao():
+    """Avisa quando a gravação de exames em segundo plano está falhando ou descartou exames"""
+    status = data_manager.get_write_status()
+    if status['erro']:
+        st.error(f"❌ Falha ao gravar exames no armazenamento: {status['erro']} "
+                 f"({status['pendentes']} gravações pendentes)")
+    if status['descartados']:
+        st.warning(f"⚠️ {status['descartados']} gravações de exames não puderam ser concluídas e foram "
+                   f"guardadas em {status['arquivo_descartados']}")
+
+@perf.page
 def show_patient_selection():
     """Tela de seleção/cadastro de paciente"""
     show_header()
@@ -123,6 +141,7 @@ def show_patient_selection():
                 else:
                     st.error("Nome é obrigatório.")
 
+@perf.page
 def show_patient_dashboard():
     """Dashboard principal do paciente"""
     paciente = st.session_state.paciente_ativo
@@ -140,7 +159,7 @@ def show_patient_dashboard():
             st.session_state.paciente_ativo = None
             st.rerun()
     
-    # Abas principais
+    # Abas principais (cada aba é um fragmento: interações dentro dela reexecutam só a aba)
     tab1, tab2, tab3, tab4 = st.tabs([
         "📋 Dados Gerais", 
         "🧪 Inserção de Exames", 
@@ -160,6 +179,8 @@ def show_patient_dashboard():
     with tab4:
         show_base_referencia()
 
+@st.fragment
+@perf.page
 def show_dados_gerais():
     """Aba de dados gerais do paciente"""
     paciente = st.session_state.paciente_ativo
@@ -208,6 +229,8 @@ def show_dados_gerais():
                     st.rerun()
                 else:
                     st.error("Erro ao salvar dados.")
+                    # Recarregar a versão gravada (ex.: alteração feita em outra sessão)
+                    st.session_state.paciente_ativo = data_manager.get_paciente(paciente['id']) or paciente
     
     with col2:
         st.subheader("Histórico de Peso")
@@ -225,6 +248,8 @@ def show_dados_gerais():
                 if st.form_submit_button("Adicionar"):
                     st.info("Funcionalidade será implementada.")
 
+@st.fragment
+@perf.page
 def show_insercao_exames_v2():
     """Aba de inserção de exames - Versão 2 com tabelas por categoria"""
     paciente = st.session_state.paciente_ativo
@@ -243,6 +268,7 @@ def show_insercao_exames_v2():
     else:
         show_importacao_json()
 
+@perf.page
 def show_insercao_manual_categorias():
     """Interface de inserção manual organizada por categorias"""
     paciente = st.session_state.paciente_ativo
@@ -261,12 +287,23 @@ def show_insercao_manual_categorias():
     if 'exames_por_categoria' not in st.session_state:
         st.session_state.exames_por_categoria = {}
     
+    # Grade: uma tabela editável por categoria; campos: um campo por parâmetro
+    modo = st.radio(
+        "Modo de edição:",
+        ["Grade", "Campos individuais"],
+        horizontal=True,
+        key="modo_insercao_manual"
+    )
+    
     # Criar abas para cada categoria
     tabs = st.tabs(categorias)
     
     for i, categoria in enumerate(categorias):
         with tabs[i]:
-            show_categoria_table(categoria, paciente['sexo'], data_coleta)
+            if modo == "Grade":
+                show_categoria_grade(categoria, paciente['sexo'])
+            else:
+                show_categoria_table(categoria, paciente['sexo'], data_coleta)
     
     # Botões de ação global
     st.divider()
@@ -277,10 +314,11 @@ def show_insercao_manual_categorias():
             salvar_todos_exames(paciente['id'], data_coleta)
     
     with col2:
-        if st.button("🗑️ Limpar todos"):
-            st.session_state.exames_por_categoria = {}
-            st.rerun()
+        # Callback: o estado é limpo antes da reexecução do fragmento, sem st.rerun()
+        st.button("🗑️ Limpar todos", on_click=limpar_exames_em_edicao)
 
+@st.fragment
+@perf.page
 def show_categoria_table(categoria, sexo_paciente, data_coleta):
     """Mostra tabela interativa para uma categoria específica"""
     
@@ -315,8 +353,23 @@ def show_categoria_table(categoria, sexo_paciente, data_coleta):
         
         st.divider()
         
+        # Classificar todos os valores da categoria de uma vez
+        # (os valores dos campos já estão no estado da sessão antes de serem desenhados)
+        valores_categoria = [
+            st.session_state.get(
+                f"{categoria}_{param['parametro']}_valor",
+                st.session_state.exames_por_categoria[categoria].get(param['parametro'], {}).get('valor', 0.0)
+            )
+            for param in parametros
+        ]
+        status_categoria = exam_analyzer.classify_batch(
+            [param['parametro'] for param in parametros],
+            valores_categoria,
+            sexo_paciente
+        )
+        
         # Linhas de parâmetros
-        for param in parametros:
+        for i, param in enumerate(parametros):
             cols = st.columns([3, 1, 1, 2, 2, 1, 1])
             
             # Nome do parâmetro
@@ -338,27 +391,14 @@ def show_categoria_table(categoria, sexo_paciente, data_coleta):
             cols[2].write(param['unidade'] or "")
             
             # Faixas de referência baseadas no sexo
-            if sexo_paciente.upper() == 'M':
-                ideal_min = param.get('valor_ideal_homem_min')
-                ideal_max = param.get('valor_ideal_homem_max')
-                ref_min = param.get('valor_ref_homem_min')
-                ref_max = param.get('valor_ref_homem_max')
-            else:
-                ideal_min = param.get('valor_ideal_mulher_min')
-                ideal_max = param.get('valor_ideal_mulher_max')
-                ref_min = param.get('valor_ref_mulher_min')
-                ref_max = param.get('valor_ref_mulher_max')
-            
-            # Mostrar faixas
-            ideal_range = f"{ideal_min or '-'} - {ideal_max or '-'}"
-            ref_range = f"{ref_min or '-'} - {ref_max or '-'}"
+            ideal_range, ref_range = formatar_faixas(param, sexo_paciente)
             
             cols[3].write(ideal_range)
             cols[4].write(ref_range)
             
             # Calcular e mostrar status
-            if valor > 0:
-                classification = exam_analyzer.classify_exam(param['parametro'], valor, sexo_paciente)
+            classification = STATUS_INFO[status_categoria[i]]
+            if valor > 0 and classification:
                 status_color = classification['color']
                 status_icon = classification['icon']
                 status_text = classification['status']
@@ -378,12 +418,123 @@ def show_categoria_table(categoria, sexo_paciente, data_coleta):
             else:
                 cols[5].write("—")
             
-            # Botão para limpar valor
-            if cols[6].button("🗑️", key=f"clear_{categoria}_{param['parametro']}"):
-                if param['parametro'] in st.session_state.exames_por_categoria[categoria]:
-                    del st.session_state.exames_por_categoria[categoria][param['parametro']]
-                st.rerun()
+            # Botão para limpar valor (callback: só a tabela da categoria é reexecutada)
+            cols[6].button(
+                "🗑️",
+                key=f"clear_{categoria}_{param['parametro']}",
+                on_click=limpar_valor,
+                args=(categoria, param['parametro'], valor_key)
+            )
 
+def formatar_faixas(param, sexo_paciente):
+    """Textos das faixas ideal e de referência de um parâmetro para o sexo do paciente"""
+    sufixo = 'homem' if sexo_paciente.upper() == 'M' else 'mulher'
+    ideal_min = param.get(f'valor_ideal_{sufixo}_min')
+    ideal_max = param.get(f'valor_ideal_{sufixo}_max')
+    ref_min = param.get(f'valor_ref_{sufixo}_min')
+    ref_max = param.get(f'valor_ref_{sufixo}_max')
+    return f"{ideal_min or '-'} - {ideal_max or '-'}", f"{ref_min or '-'} - {ref_max or '-'}"
+
+def colunas_fixas_grade(categoria, sexo_paciente):
+    """
+    Colunas somente leitura da grade de uma categoria (parâmetro, unidade e faixas)
+    
+    Compartilhadas entre sessões e recriadas apenas quando a base de referência muda.
+    """
+    def montar(_):
+        parametros = exam_analyzer.get_parameters_by_category(categoria)
+        faixas = [formatar_faixas(param, sexo_paciente) for param in parametros]
+        return pd.DataFrame({
+            'Parâmetro': [param['parametro'] for param in parametros],
+            'Unidade': [param['unidade'] or "" for param in parametros],
+            'Faixa Ideal': [ideal for ideal, _ in faixas],
+            'Faixa Referência': [ref for _, ref in faixas]
+        })
+    
+    return data_manager.get_artefato_referencias(('grade', categoria, sexo_paciente.upper()), montar)
+
+@st.fragment
+@perf.page
+def show_categoria_grade(categoria, sexo_paciente):
+    """Mostra a categoria como uma única tabela editável (coluna Valor), classificada em lote"""
+    fixas = colunas_fixas_grade(categoria, sexo_paciente)
+    
+    if fixas.empty:
+        st.info(f"Nenhum parâmetro encontrado para a categoria {categoria}")
+        return
+    
+    st.markdown(f"""
+    <div class="category-header">
+        📋 {categoria} ({len(fixas)} parâmetros)
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if categoria not in st.session_state.exames_por_categoria:
+        st.session_state.exames_por_categoria[categoria] = {}
+    exames_categoria = st.session_state.exames_por_categoria[categoria]
+    
+    # Valores salvos no estado + edições ainda pendentes na grade (já no estado antes de desenhá-la)
+    grade_key = f"grade_{categoria}"
+    valores = [
+        exames_categoria.get(param, {}).get('valor', float('nan'))
+        for param in fixas['Parâmetro']
+    ]
+    for linha, edicao in st.session_state.get(grade_key, {}).get('edited_rows', {}).items():
+        if 'Valor' in edicao:
+            valores[int(linha)] = float('nan') if edicao['Valor'] is None else edicao['Valor']
+    
+    # Como na inserção por campos, só entram valores positivos com classificação
+    classificacoes = [
+        STATUS_INFO[codigo]
+        for codigo in exam_analyzer.classify_batch(fixas['Parâmetro'].to_numpy(), valores, sexo_paciente)
+    ]
+    preenchidos = [
+        pd.notna(valor) and valor > 0 and classificacao is not None
+        for valor, classificacao in zip(valores, classificacoes)
+    ]
+    
+    df_grade = fixas.copy()
+    df_grade.insert(1, 'Valor', pd.Series(valores, dtype=float))
+    df_grade['Status'] = [
+        f"{classificacao['icon']} {classificacao['status']}" if preenchido else "—"
+        for classificacao, preenchido in zip(classificacoes, preenchidos)
+    ]
+    
+    st.data_editor(
+        df_grade,
+        key=grade_key,
+        hide_index=True,
+        num_rows="fixed",
+        use_container_width=True,
+        disabled=['Parâmetro', 'Unidade', 'Faixa Ideal', 'Faixa Referência', 'Status'],
+        column_config={
+            'Valor': st.column_config.NumberColumn("Valor", min_value=0.0, step=0.01, format="%.2f")
+        }
+    )
+    
+    # Sincronizar com o estado usado por "Salvar todos os exames"
+    for param, unidade, valor, classificacao, preenchido in zip(
+        fixas['Parâmetro'], fixas['Unidade'], valores, classificacoes, preenchidos
+    ):
+        if preenchido:
+            exames_categoria[param] = {
+                'valor': float(valor), 'unidade': unidade or None, 'status': classificacao['status']
+            }
+        else:
+            exames_categoria.pop(param, None)
+
+def limpar_valor(categoria, parametro, valor_key):
+    """Remove o valor de um parâmetro da categoria e o estado do campo (que volta a 0)"""
+    st.session_state.exames_por_categoria[categoria].pop(parametro, None)
+    st.session_state.pop(valor_key, None)
+
+def limpar_exames_em_edicao():
+    """Descarta os valores digitados em todas as categorias (estado, grades e campos)"""
+    st.session_state.exames_por_categoria = {}
+    for key in [key for key in st.session_state if str(key).startswith('grade_') or str(key).endswith('_valor')]:
+        del st.session_state[key]
+
+@perf.page
 def show_importacao_json():
     """Interface de importação de arquivo JSON"""
     st.subheader("Importação de Arquivo JSON")
@@ -428,35 +579,47 @@ def show_importacao_json():
     
     if uploaded_file is not None:
         try:
-            # Ler arquivo JSON
-            json_content = uploaded_file.read().decode('utf-8')
-            json_data = json.loads(json_content)
-            
-            st.success(f"✅ Arquivo carregado: {len(json_data)} registros encontrados")
-            
-            # Validar dados
-            validation = exam_analyzer.validate_json_data(json_data)
+            paciente = st.session_state.paciente_ativo
             
-            if not validation['valid']:
-                st.error(f"❌ Erro na validação: {validation['error']}")
+            # Processar importação em blocos (uma vez por arquivo/paciente/data; reruns reutilizam o resultado)
+            chave_importacao = (uploaded_file.file_id, paciente['id'], paciente['sexo'], data_coleta)
+            importacao = st.session_state.get('importacao_json')
+            if importacao is not None and importacao[0] == chave_importacao:
+                result = importacao[1]
+            else:
+                progresso = st.progress(0.0, text="Processando arquivo...")
+                uploaded_file.seek(0)
+                result = exam_analyzer.process_json_stream(
+                    uploaded_file,
+                    paciente['id'],
+                    paciente['sexo'],
+                    data_coleta.strftime('%Y-%m-%d'),
+                    on_progress=lambda itens, lidos: progresso.progress(
+                        min(lidos / max(uploaded_file.size, 1), 1.0),
+                        text=f"Processando arquivo... {itens} registros"
+                    )
+                )
+                progresso.empty()
+                st.session_state.importacao_json = (chave_importacao, result)
+            
+            st.success(f"✅ Arquivo carregado: {result['total']} registros encontrados")
+            
+            if not result['valid']:
+                st.error(f"❌ Erro na validação: {result['error']}")
+                if result.get('errors'):
+                    with st.expander(f"Ver todos os {len(result['errors'])} erros"):
+                        df_erros = pd.DataFrame(result['errors'])
+                        df_erros.columns = ['Item', 'Campo', 'Motivo', 'Valor']
+                        st.dataframe(df_erros.astype(str), use_container_width=True)
                 return
             
-            # Processar importação
-            paciente = st.session_state.paciente_ativo
-            result = exam_analyzer.process_json_import(
-                json_data, 
-                paciente['id'], 
-                paciente['sexo'], 
-                data_coleta.strftime('%Y-%m-%d')
-            )
-            
             # Mostrar resultados
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("✅ Exames Reconhecidos")
-                if result['conhecidos']:
-                    df_conhecidos = pd.DataFrame(result['conhecidos'])
+                if not result['conhecidos'].empty:
+                    df_conhecidos = result['conhecidos'].copy()
                     
                     # Adicionar ícones de status
                     status_icons = {
@@ -477,8 +640,12 @@ def show_importacao_json():
                     
                     
                     if st.button("💾 Salvar exames reconhecidos"):
-                        if data_manager.save_exames(result['conhecidos'], paciente['id']):
-                            st.success(f"✅ {len(result['conhecidos'])} exames salvos!")
+                        if data_manager.enqueue_exames(result['conhecidos'].to_dict('records'), paciente['id']) is not None:
+                            erro_gravacao = data_manager.get_write_status()['erro']
+                            if erro_gravacao:
+                                st.warning(f"⚠️ {len(result['conhecidos'])} exames registrados, mas a gravação no armazenamento está falhando: {erro_gravacao}")
+                            else:
+                                st.success(f"✅ {len(result['conhecidos'])} exames salvos!")
                         else:
                             st.error("❌ Erro ao salvar exames.")
                 else:
@@ -486,10 +653,33 @@ def show_importacao_json():
             
             with col2:
                 st.subheader("❓ Exames Não Reconhecidos")
-                if result['desconhecidos']:
-                    df_desconhecidos = pd.DataFrame(result['desconhecidos'])
+                if not result['desconhecidos'].empty:
+                    df_desconhecidos = result['desconhecidos']
                     st.dataframe(df_desconhecidos, use_container_width=True)
-                    st.info("Estes exames precisam ser vinculados manualmente na aba 'Base de Referência'.")
+                    
+                    # Vincular nomes do laboratório a parâmetros da base (lembrado nas próximas importações)
+                    with st.form("vincular_desconhecidos"):
+                        st.write("**🔗 Vincular aos parâmetros da base**")
+                        opcoes = [''] + sorted(exam_analyzer.matcher.nomes)
+                        vinculos = {}
+                        nomes_desconhecidos = df_desconhecidos.drop_duplicates(['parameter_name', 'nome_original'])
+                        for i, item in enumerate(nomes_desconhecidos.to_dict('records')):
+                            parametro = st.selectbox(
+                                f"{item['nome_original']} ({item['parameter_name']})",
+                                opcoes,
+                                key=f"vinculo_{i}_{item['nome_original']}"
+                            )
+                            if parametro:
+                                vinculos[item['nome_original']] = parametro
+                                vinculos[item['parameter_name']] = parametro
+                        
+                        if st.form_submit_button("🔗 Vincular exames"):
+                            if vinculos:
+                                exam_analyzer.register_aliases(vinculos)
+                                st.session_state.pop('importacao_json', None)
+                                st.rerun()
+                            else:
+                                st.warning("⚠️ Selecione o parâmetro de pelo menos um exame.")
                 else:
                     st.success("Todos os exames foram reconhecidos!")
             
@@ -515,25 +705,27 @@ def salvar_todos_exames(id_paciente, data_coleta):
                 exames_para_salvar.append(exame_data)
     
     if exames_para_salvar:
-        if data_manager.save_exames(exames_para_salvar, id_paciente):
+        if data_manager.enqueue_exames(exames_para_salvar, id_paciente) is not None:
             st.success(f"✅ {len(exames_para_salvar)} exames salvos com sucesso!")
-            st.session_state.exames_por_categoria = {}
+            limpar_exames_em_edicao()
             st.rerun()
         else:
             st.error("❌ Erro ao salvar exames.")
     else:
         st.warning("⚠️ Nenhum exame preenchido para salvar.")
 
+@st.fragment
+@perf.page
 def show_acompanhamento():
     """Aba de acompanhamento de exames"""
     paciente = st.session_state.paciente_ativo
     
     st.subheader("Acompanhamento de Exames")
     
-    # Carregar exames do paciente
-    df_exames = data_manager.load_exames(paciente['id'])
+    # Resumo dos exames do paciente (opções dos filtros)
+    resumo = data_manager.get_resumo_exames(paciente['id'])
     
-    if df_exames.empty:
+    if resumo['total'] == 0:
         st.info("Nenhum exame registrado para este paciente ainda.")
         return
     
@@ -542,41 +734,36 @@ def show_acompanhamento():
     
     with col1:
         # Filtro de parâmetro
-        parametros_disponiveis = ['Todos'] + sorted(df_exames['parametro'].unique().tolist())
+        parametros_disponiveis = ['Todos'] + resumo['parametros']
         parametro_selecionado = st.selectbox("Parâmetro", parametros_disponiveis)
     
     with col2:
         # Filtro de data
-        data_inicio = st.date_input("Data início", value=pd.to_datetime(df_exames['data_coleta']).min().date())
-        data_fim = st.date_input("Data fim", value=pd.to_datetime(df_exames['data_coleta']).max().date())
+        data_inicio = st.date_input("Data início", value=resumo['data_min'])
+        data_fim = st.date_input("Data fim", value=resumo['data_max'])
     
     with col3:
         # Filtro de status
         apenas_alterados = st.checkbox("Apenas alterados")
     
-    # Aplicar filtros
-    df_filtrado = df_exames.copy()
-    
-    if parametro_selecionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['parametro'] == parametro_selecionado]
-    
-    df_filtrado['data_coleta'] = pd.to_datetime(df_filtrado['data_coleta'])
-    df_filtrado = df_filtrado[
-        (df_filtrado['data_coleta'].dt.date >= data_inicio) &
-        (df_filtrado['data_coleta'].dt.date <= data_fim)
-    ]
-    
-    if apenas_alterados:
-        df_filtrado = df_filtrado[df_filtrado['status'] != 'Ideal']
+    # Aplicar filtros no armazenamento
+    df_filtrado = data_manager.query_exames(
+        paciente['id'],
+        parametros=None if parametro_selecionado == 'Todos' else [parametro_selecionado],
+        date_from=data_inicio,
+        date_to=data_fim,
+        status_not_in=STATUS_NORMAIS if apenas_alterados else None,
+        order_by='-data_coleta'
+    )
     
     # Mostrar tabela de resultados
     if not df_filtrado.empty:
         st.subheader("Histórico de Exames")
         
         # Formatar dados para exibição
+        df_filtrado['data_coleta'] = pd.to_datetime(df_filtrado['data_coleta'])
         df_display = df_filtrado.copy()
         df_display['data_coleta'] = df_display['data_coleta'].dt.strftime('%d/%m/%Y')
-        df_display = df_display.sort_values('data_coleta', ascending=False)
         
         # Adicionar ícones de status
         status_icons = {
@@ -598,7 +785,9 @@ def show_acompanhamento():
             st.subheader(f"Evolução - {parametro_selecionado}")
             
             from modules.utils import create_evolution_chart
-            fig = create_evolution_chart(df_filtrado, parametro_selecionado)
+            fig = create_evolution_chart(
+                df_filtrado, parametro_selecionado, cache_key=(data_manager.data_dir, paciente['id'])
+            )
             
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
@@ -615,13 +804,15 @@ def show_acompanhamento():
     else:
         st.info("Nenhum exame encontrado com os filtros aplicados.")
 
+@st.fragment
+@perf.page
 def show_base_referencia():
     """Aba de base de referência"""
     st.subheader("Base de Referência de Valores")
     
     # Carregar dados de referência
     try:
-        df_ref = pd.read_excel("data/valores_referencia.xlsx")
+        df_ref = read_excel(data_manager.referencias_file)
         
         st.info("💡 Esta aba permite visualizar e editar os valores de referência. Funcionalidade de edição será implementada na próxima versão.")
         
@@ -670,9 +861,26 @@ def show_base_referencia():
         else:
             st.warning("Nenhum parâmetro encontrado com os filtros aplicados.")
             
+        # Apelidos de exames vinculados na importação JSON
+        with st.expander("🔗 Apelidos de exames"):
+            aliases = exam_analyzer.aliases.stats()
+            if aliases['aliases']:
+                df_aliases = pd.DataFrame(aliases['aliases'])[['nome', 'parametro', 'hits', 'criado_em']]
+                df_aliases.columns = ['Nome no Laboratório', 'Parâmetro', 'Usos', 'Criado em']
+                st.dataframe(df_aliases, use_container_width=True)
+            else:
+                st.info("Nenhum apelido cadastrado. Vincule exames não reconhecidos na importação JSON.")
+            
+            if aliases['misses']:
+                st.write("**Nomes sem apelido mais procurados**")
+                df_misses = pd.DataFrame(list(aliases['misses'].items())[:20], columns=['Nome', 'Buscas'])
+                st.dataframe(df_misses, use_container_width=True)
+            
     except Exception as e:
         st.error(f"Erro ao carregar base de referência: {e}")
 
 if __name__ == "__main__":
-    main()
+    with perf.rerun('app'):
+        main()
+    perf.show_panel()
 
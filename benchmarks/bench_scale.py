@@ -0,0 +1,256 @@
+"""
+Benchmark de escala: leitura, gravação, classificação, importação e filtros
+
+Gera (ou copia) uma pasta de dados sintética (ver benchmarks.synthetic_data)
+em uma pasta temporária e mede, com o backend escolhido:
+
+- load_exames de todos os exames (sem cache, com o cache binário da
+  planilha e em memória) e de um paciente;
+- save_exames de uma coleta;
+- classify_exam item a item e classify_batch sobre todos os exames;
+- process_json_import dos arquivos JSON gerados;
+- validate_csv_data (versão 1) de um CSV sintético;
+- os filtros do Acompanhamento (resumo + consultas filtradas).
+
+Os resultados saem em JSON (--salvar) e podem ser comparados com um baseline
+gravado antes (--baseline): métricas mais lentas que o baseline além da
+tolerância são listadas e o processo termina com código 1.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_scale --escala 1k --salvar baseline_1k.json
+    python -m benchmarks.bench_scale --escala 1k --baseline baseline_1k.json
+    python -m benchmarks.bench_scale --dados /tmp/nutri_100k --backend sqlite --json
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_data import ESCALAS, carregar_parametros, gerar_csv_importacao, gerar_pasta
+
+COLETA = 37  # Exames por coleta gravada (tamanho do Perfil Metabólico Cardiovascular)
+
+
+def _medir(func, repeticoes, preparar=None):
+    """Melhor tempo (segundos) de várias execuções; preparar() roda antes de cada uma, fora da medição"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def executar(data_dir, backend, repeticoes=3, amostra=50, csv_linhas=100_000, seed=0):
+    """
+    Executa os cenários sobre uma pasta de dados (que é alterada por save_exames)
+
+    Returns:
+        dict: nome do cenário -> {'segundos': melhor tempo, 'operacoes': operações medidas,
+              'por_segundo': operações por segundo}
+    """
+    # Importações tardias: o DataManager depende do Streamlit
+    from modules.data_cache import shared_cache
+    from modules.data_manager import DataManager, STATUS_NORMAIS
+    from modules.exam_analyzer import ExamAnalyzer
+    from modules.exam_analyzer_v2 import ExamAnalyzerV2
+    from modules.excel_cache import CACHE_DIR
+
+    rng = np.random.default_rng(seed)
+    resultados = {}
+
+    def registrar(nome, segundos, operacoes=1):
+        resultados[nome] = {
+            'segundos': round(segundos, 6),
+            'operacoes': operacoes,
+            'por_segundo': round(operacoes / segundos, 1) if segundos else None
+        }
+
+    inicio = time.perf_counter()
+    data_manager = DataManager(backend=backend, data_dir=data_dir)
+    data_manager.load_pacientes()
+    registrar('inicializacao do backend', time.perf_counter() - inicio)
+
+    analyzer = ExamAnalyzerV2(data_manager)
+    pacientes = data_manager.load_pacientes()
+    amostra_ids = rng.choice(pacientes['id'].to_numpy(), min(amostra, len(pacientes)), replace=False)
+    sexos = dict(zip(pacientes['id'], pacientes['sexo']))
+
+    def sem_cache():
+        shutil.rmtree(os.path.join(data_dir, CACHE_DIR), ignore_errors=True)
+        shared_cache.invalidate(('exames',))
+
+    def sem_memoria():
+        shared_cache.invalidate(('exames',))
+
+    # Leitura
+    registrar('load_exames (sem cache)', _medir(data_manager.load_exames, repeticoes, sem_cache))
+    registrar('load_exames (cache binário)', _medir(data_manager.load_exames, repeticoes, sem_memoria))
+    registrar('load_exames (memória)', _medir(data_manager.load_exames, repeticoes))
+    registrar('load_exames (por paciente)', _medir(
+        lambda: [data_manager.load_exames(int(i)) for i in amostra_ids], repeticoes, sem_memoria
+    ), len(amostra_ids))
+
+    df_exames = data_manager.load_exames()
+    exames_sexo = df_exames['id_paciente'].map(sexos).fillna('F').to_numpy()
+
+    # Gravação de uma coleta (o backend invalida os caches a cada gravação)
+    parametros = carregar_parametros(data_manager.referencias_file)
+    coleta = [{
+        'parametro': parametro, 'valor': 10.0, 'unidade': unidade,
+        'data_coleta': '2026-01-01', 'status': 'Ideal'
+    } for parametro, unidade in zip(parametros['parametro'][:COLETA], parametros['unidade_medida'][:COLETA])]
+    registrar('save_exames (coleta)', _medir(
+        lambda: data_manager.save_exames(coleta, int(amostra_ids[0])), repeticoes
+    ))
+
+    # Classificação
+    itens = df_exames.sample(min(10_000, len(df_exames)), random_state=seed)
+    itens = list(zip(itens['parametro'], itens['valor'], itens['id_paciente'].map(sexos).fillna('F')))
+    registrar('classify_exam (item a item)', _medir(
+        lambda: [analyzer.classify_exam(p, v, s) for p, v, s in itens], repeticoes
+    ), len(itens))
+    registrar('classify_batch (todos os exames)', _medir(
+        lambda: analyzer.classify_batch(df_exames['parametro'].to_numpy(), df_exames['valor'].to_numpy(), exames_sexo),
+        repeticoes
+    ), len(df_exames))
+
+    # Importação JSON
+    arquivos = []
+    for path in sorted(glob.glob(os.path.join(data_dir, 'importacao', '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            arquivos.append(json.load(f))
+    if arquivos:
+        registrar('process_json_import', _medir(
+            lambda: [analyzer.process_json_import(itens_json, 0, 'F', '2026-01-01') for itens_json in arquivos],
+            repeticoes
+        ), sum(len(itens_json) for itens_json in arquivos))
+
+    # Validação CSV (versão 1)
+    df_csv = gerar_csv_importacao(rng, parametros, csv_linhas)
+    analyzer_v1 = ExamAnalyzer(data_manager)
+    registrar('validate_csv_data', _medir(lambda: analyzer_v1.validate_csv_data(df_csv), repeticoes), csv_linhas)
+
+    # Acompanhamento: resumo, tabela completa e filtros (como a aba faz a cada interação)
+    def acompanhamento():
+        for id_paciente in amostra_ids:
+            id_paciente = int(id_paciente)
+            resumo = data_manager.get_resumo_exames(id_paciente)
+            data_manager.query_exames(id_paciente, order_by='-data_coleta')
+            if resumo['parametros']:
+                data_manager.query_exames(
+                    id_paciente, parametros=[resumo['parametros'][0]],
+                    date_from=resumo['data_min'], date_to=resumo['data_max'], order_by='-data_coleta'
+                )
+            data_manager.query_exames(id_paciente, status_not_in=STATUS_NORMAIS, order_by='-data_coleta')
+
+    registrar('acompanhamento (filtros, cache frio)', _medir(acompanhamento, repeticoes, sem_memoria), len(amostra_ids))
+    registrar('acompanhamento (filtros)', _medir(acompanhamento, repeticoes), len(amostra_ids))
+
+    data_manager.flush_writes()
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Compara os tempos com um baseline
+
+    Returns:
+        list: [{'cenario', 'baseline_s', 'atual_s', 'razao', 'regressao'}] dos cenários presentes em ambos
+    """
+    comparacao = []
+    for nome, atual in resultados.items():
+        anterior = baseline.get('resultados', {}).get(nome)
+        if not anterior or not anterior['segundos']:
+            continue
+        razao = atual['segundos'] / anterior['segundos']
+        comparacao.append({
+            'cenario': nome,
+            'baseline_s': anterior['segundos'],
+            'atual_s': atual['segundos'],
+            'razao': round(razao, 3),
+            'regressao': razao > 1 + tolerancia
+        })
+    return comparacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default=None, help="Tamanho predefinido dos dados")
+    parser.add_argument('--pacientes', type=int, default=1000)
+    parser.add_argument('--exames', type=int, default=12000)
+    parser.add_argument('--dados', default=None, help="Pasta gerada antes por benchmarks.synthetic_data (copiada)")
+    parser.add_argument('--backend', default='excel', choices=['excel', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--amostra', type=int, default=50, help="Pacientes usados nas leituras por paciente")
+    parser.add_argument('--csv-linhas', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--salvar', default=None, help="Grava os resultados em JSON (ex.: como baseline)")
+    parser.add_argument('--baseline', default=None, help="Resultados anteriores para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Lentidão aceita em relação ao baseline")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    from modules.perf import build
+
+    data_dir = tempfile.mkdtemp(prefix='nutri_scale_')
+    try:
+        if args.dados:
+            shutil.copytree(args.dados, data_dir, dirs_exist_ok=True)
+            geracao = None
+        else:
+            pacientes, exames = ESCALAS[args.escala] if args.escala else (args.pacientes, args.exames)
+            geracao = gerar_pasta(data_dir, pacientes, exames, seed=args.seed)
+
+        resultados = executar(data_dir, args.backend, args.repeat, args.amostra, args.csv_linhas, args.seed)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    saida = {
+        'build': build(),
+        'backend': args.backend,
+        'escala': args.escala,
+        'dados': geracao,
+        'resultados': resultados
+    }
+    comparacao = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get('backend'), baseline.get('escala')) != (args.backend, args.escala):
+            print(f"Aviso: baseline com backend {baseline.get('backend')} e escala {baseline.get('escala')}",
+                  file=sys.stderr)
+        comparacao = comparar(resultados, baseline, args.tolerancia)
+        saida['comparacao'] = comparacao
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(saida, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(saida, ensure_ascii=False, indent=2))
+    else:
+        if geracao:
+            print(f"Dados: {geracao['pacientes']} pacientes, {geracao['exames']} exames | backend {args.backend}")
+        for nome, resultado in resultados.items():
+            vazao = f"{resultado['por_segundo']:>12,.0f} op/s" if resultado['operacoes'] > 1 else ''
+            print(f"  {nome:40} {resultado['segundos'] * 1000:>10.1f} ms {vazao}")
+        for item in comparacao:
+            marca = 'REGRESSÃO' if item['regressao'] else ''
+            print(f"  {item['cenario']:40} {item['razao']:>6.2f}x do baseline {marca}")
+
+    if any(item['regressao'] for item in comparacao):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark do validador do formato JSON de exames
+
+Mede a vazão (itens por segundo) do validador compilado sobre itens
+sintéticos, com e sem itens inválidos, comparada à validação item a item
+anterior, e da importação completa (validação + busca + classificação na
+mesma passada) sobre uma cópia temporária da pasta de dados.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_validator --items 200000
+    python -m benchmarks.bench_validator --invalid 0.1 --json
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from modules.json_schema import JSONSchemaValidator
+
+REQUIRED_FIELDS = ['parameter_name', 'nome_original', 'unit', 'valor']
+
+
+def _validate_legacy(items):
+    """Validação item a item usada antes do validador compilado (para comparação)"""
+    errors = []
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(f"Item {idx + 1}: Deve ser um objeto")
+            continue
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in item]
+        if missing_fields:
+            errors.append(f"Item {idx + 1}: Campos ausentes: {', '.join(missing_fields)}")
+            continue
+        try:
+            float(item['valor'])
+        except (ValueError, TypeError):
+            errors.append(f"Item {idx + 1}: Valor '{item['valor']}' não é numérico")
+    return errors
+
+
+def gerar_itens(quantidade, nomes, invalidos=0.0, seed=0):
+    """Itens sintéticos no formato de importação JSON (fração 'invalidos' com erro)"""
+    rng = random.Random(seed)
+    itens = []
+    for i in range(quantidade):
+        nome = rng.choice(nomes)
+        item = {
+            'parameter_name': nome.lower(),
+            'nome_original': nome,
+            'unit': 'mg/dL',
+            'valor': round(rng.uniform(0, 300), 2)
+        }
+        if rng.random() < invalidos:
+            defeito = rng.randrange(3)
+            if defeito == 0:
+                del item['unit']
+            elif defeito == 1:
+                item['valor'] = 'n/d'
+            else:
+                item = [nome]
+        itens.append(item)
+    return itens
+
+
+def _medir(func, quantidade, repeticoes):
+    """Melhor tempo de várias execuções -> itens por segundo"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return quantidade / melhor, melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--invalid', type=float, default=0.05, help="Fração de itens inválidos no segundo cenário")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--source', default='data', help="Pasta de dados copiada para a importação completa")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='nutri_bench_')
+    try:
+        shutil.copy(os.path.join(args.source, 'valores_referencia.xlsx'), data_dir)
+
+        # Importações tardias: o DataManager depende do Streamlit
+        from modules.data_manager import DataManager
+        from modules.exam_analyzer_v2 import ExamAnalyzerV2
+
+        analyzer = ExamAnalyzerV2(DataManager(data_dir=data_dir))
+        nomes = [ref['parametro'] for ref in analyzer.referencias.values()]
+        validator = JSONSchemaValidator()
+
+        validos = gerar_itens(args.items, nomes)
+        mistos = gerar_itens(args.items, nomes, invalidos=args.invalid)
+        arquivo = json.dumps(validos).encode('utf-8')
+
+        cenarios = {
+            'validador compilado (válidos)': lambda: validator.validate(validos),
+            'validação anterior (válidos)': lambda: _validate_legacy(validos),
+            f'validador compilado ({args.invalid:.0%} inválidos)': lambda: validator.validate(mistos),
+            f'validação anterior ({args.invalid:.0%} inválidos)': lambda: _validate_legacy(mistos),
+            'importação completa em blocos': lambda: analyzer.process_json_stream(
+                io.BytesIO(arquivo), 0, 'F', '2025-01-01'
+            ),
+        }
+
+        resultados = {}
+        for nome, func in cenarios.items():
+            vazao, segundos = _medir(func, args.items, args.repeat)
+            resultados[nome] = {'itens_por_segundo': round(vazao), 'segundos': round(segundos, 4)}
+
+        erros = validator.validate(mistos)
+        if args.json:
+            print(json.dumps({'itens': args.items, 'erros_cenario_misto': len(erros), 'resultados': resultados},
+                             ensure_ascii=False, indent=2))
+        else:
+            print(f"Itens: {args.items} | erros no cenário misto: {len(erros)}")
+            for nome, resultado in resultados.items():
+                print(f"  {nome:45} {resultado['itens_por_segundo']:>12,} itens/s  ({resultado['segundos']:.3f}s)")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
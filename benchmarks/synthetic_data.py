@@ -0,0 +1,266 @@
+"""
+Gerador de dados sintéticos em escala de clínica
+
+Gera, a partir dos parâmetros reais de valores_referencia.xlsx, uma pasta
+de dados com pacientes.xlsx e exames.xlsx e arquivos de importação JSON.
+Os valores são sorteados em torno das faixas de referência de cada sexo
+(a maioria dentro da faixa, parte abaixo ou acima) e os status são
+calculados pelo classificador, como se os exames tivessem sido salvos pela
+aplicação. Cada paciente tem de 1 a 4 coletas, e cada coleta traz os
+parâmetros de algumas categorias (painéis).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.synthetic_data /tmp/nutri_10k --escala 10k
+    python -m benchmarks.synthetic_data /tmp/nutri --pacientes 500 --exames 20000 --json-arquivos 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Pacientes e linhas de exame aproximadas por escala
+ESCALAS = {
+    '1k': (1_000, 12_000),
+    '10k': (10_000, 120_000),
+    '100k': (100_000, 1_200_000),
+}
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique',
+         'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Almeida']
+
+# Nomes que nenhum parâmetro da base reconhece (importação JSON)
+NOMES_DESCONHECIDOS = ['Exame Experimental X', 'Marcador Y', 'Painel Z Livre']
+
+
+def carregar_parametros(referencias_file):
+    """Parâmetros da base com categoria, unidade e faixas de referência por sexo"""
+    df = pd.read_excel(referencias_file)
+    df = df[df['parametro'].notna()].drop_duplicates('parametro').reset_index(drop=True)
+    return df
+
+
+def _sortear_valores(rng, parametros, sexos):
+    """
+    Valores em torno da faixa de referência de cada (parâmetro, sexo)
+
+    Cerca de 70% dentro da faixa e o restante até 40% abaixo ou acima dela;
+    parâmetros sem faixa numérica recebem valores entre 0 e 100.
+    """
+    sufixos = np.where(sexos == 'M', 'homem', 'mulher')
+    minimos = np.empty(len(parametros))
+    maximos = np.empty(len(parametros))
+    for sufixo in ('homem', 'mulher'):
+        linhas = sufixos == sufixo
+        minimos[linhas] = pd.to_numeric(parametros[f'valor_ref_{sufixo}_min'], errors='coerce').to_numpy()[linhas]
+        maximos[linhas] = pd.to_numeric(parametros[f'valor_ref_{sufixo}_max'], errors='coerce').to_numpy()[linhas]
+
+    # Faixa com um só limite: estende para o outro lado proporcionalmente
+    minimos = np.where(np.isnan(minimos) & ~np.isnan(maximos), maximos * 0.5, minimos)
+    maximos = np.where(np.isnan(maximos) & ~np.isnan(minimos), np.maximum(minimos * 1.5, minimos + 1), maximos)
+    sem_faixa = np.isnan(minimos) | np.isnan(maximos)
+    minimos = np.where(sem_faixa, 0.0, minimos)
+    maximos = np.where(sem_faixa, 100.0, maximos)
+
+    largura = maximos - minimos
+    posicao = rng.uniform(0, 1, len(parametros))
+    fora = rng.random(len(parametros)) < 0.3
+    posicao = np.where(fora, np.where(rng.random(len(parametros)) < 0.5,
+                                      -rng.uniform(0, 0.4, len(parametros)),
+                                      1 + rng.uniform(0, 0.4, len(parametros))), posicao)
+    return np.round(np.maximum(minimos + posicao * largura, 0), 2)
+
+
+def gerar_pacientes(rng, quantidade):
+    """DataFrame de pacientes no formato de pacientes.xlsx"""
+    sexos = rng.choice(['F', 'M'], quantidade)
+    alturas = np.where(sexos == 'M', rng.normal(1.75, 0.07, quantidade), rng.normal(1.62, 0.06, quantidade))
+    imc = rng.normal(25, 4, quantidade).clip(16, 45)
+    inicio = date(2023, 1, 1)
+    return pd.DataFrame({
+        'id': np.arange(1, quantidade + 1),
+        'nome': [f"{NOMES[i % len(NOMES)]} {SOBRENOMES[(i // len(NOMES)) % len(SOBRENOMES)]} {i + 1}"
+                 for i in range(quantidade)],
+        'sexo': sexos,
+        'idade': rng.integers(18, 90, quantidade),
+        'peso_kg': np.round(imc * alturas ** 2, 1),
+        'altura_m': np.round(alturas, 2),
+        'data_cadastro': [(inicio + timedelta(days=int(d))).isoformat() for d in rng.integers(0, 900, quantidade)],
+        'notas': None
+    })
+
+
+def gerar_exames(rng, pacientes, parametros, total, analyzer=None):
+    """
+    DataFrame de exames no formato de exames.xlsx (aproximadamente 'total' linhas)
+
+    Args:
+        rng (np.random.Generator): Gerador de números aleatórios
+        pacientes (pd.DataFrame): Pacientes gerados
+        parametros (pd.DataFrame): Base de referência
+        total (int): Quantidade aproximada de linhas
+        analyzer: ExamAnalyzerV2 usado para calcular os status (None = status 'Ideal')
+    """
+    categorias = parametros['categoria'].fillna('Outros')
+    indices_por_categoria = [np.flatnonzero(categorias == c) for c in categorias.unique()]
+
+    # Coletas por paciente e parâmetros por coleta ajustados ao total pedido
+    coletas = rng.integers(1, 5, len(pacientes))
+    por_coleta = int(np.clip(round(total / coletas.sum()), 1, len(parametros)))
+
+    id_paciente, parametro_idx, datas = [], [], []
+    for paciente_id, cadastro, n_coletas in zip(pacientes['id'], pacientes['data_cadastro'], coletas):
+        data = date.fromisoformat(cadastro)
+        for _ in range(n_coletas):
+            data += timedelta(days=int(rng.integers(30, 180)))
+            # Painel: categorias inteiras em ordem aleatória, cortado no tamanho da coleta
+            ordem = rng.permutation(len(indices_por_categoria))
+            indices = np.concatenate([indices_por_categoria[c] for c in ordem])[:por_coleta]
+            parametro_idx.append(indices)
+            id_paciente.append(np.full(len(indices), paciente_id))
+            datas.append(np.full(len(indices), data.isoformat(), dtype=object))
+
+    parametro_idx = np.concatenate(parametro_idx)
+    id_paciente = np.concatenate(id_paciente)
+    sexos = pacientes.set_index('id')['sexo'].reindex(id_paciente).to_numpy()
+    linhas = parametros.iloc[parametro_idx].reset_index(drop=True)
+    valores = _sortear_valores(rng, linhas, sexos)
+
+    df = pd.DataFrame({
+        'id_exame': np.arange(1, len(linhas) + 1),
+        'id_paciente': id_paciente,
+        'parametro': linhas['parametro'].to_numpy(),
+        'valor': valores,
+        'unidade': linhas['unidade_medida'].to_numpy(),
+        'data_coleta': np.concatenate(datas),
+        'status': 'Ideal'
+    })
+    if analyzer is not None:
+        df['status'] = analyzer.classify_batch_status(df['parametro'].to_numpy(), valores, sexos)
+    return df
+
+
+def gerar_json_importacao(rng, parametros, itens, desconhecidos=0.05):
+    """
+    Itens no formato de importação JSON, com variações de grafia dos nomes
+
+    Args:
+        itens (int): Quantidade de itens
+        desconhecidos (float): Fração de itens com nomes fora da base
+    """
+    nomes = parametros['parametro'].to_numpy()
+    unidades = parametros['unidade_medida'].to_numpy()
+    escolhidos = rng.integers(0, len(nomes), itens)
+    valores = _sortear_valores(rng, parametros.iloc[escolhidos].reset_index(drop=True),
+                               rng.choice(['F', 'M'], itens))
+    variacoes = [str, str.lower, str.upper, lambda nome: f" {nome} "]
+
+    lista = []
+    for i, idx in enumerate(escolhidos):
+        if rng.random() < desconhecidos:
+            nome = NOMES_DESCONHECIDOS[i % len(NOMES_DESCONHECIDOS)]
+        else:
+            nome = variacoes[i % len(variacoes)](str(nomes[idx]))
+        lista.append({
+            'parameter_name': nome.strip().lower(),
+            'nome_original': nome,
+            'unit': None if pd.isna(unidades[idx]) else str(unidades[idx]),
+            'valor': float(valores[i])
+        })
+    return lista
+
+
+def gerar_csv_importacao(rng, parametros, linhas, invalidos=0.01):
+    """DataFrame no formato da importação CSV (versão 1), com uma fração de linhas inválidas"""
+    escolhidos = rng.integers(0, len(parametros), linhas)
+    df = pd.DataFrame({
+        'nome_exame': parametros['parametro'].to_numpy()[escolhidos],
+        'valor': rng.uniform(0, 300, linhas).round(2).astype(object),
+        'unidade': parametros['unidade_medida'].to_numpy()[escolhidos],
+        'data_exame': [(date(2025, 1, 1) + timedelta(days=int(d))).isoformat() for d in rng.integers(0, 365, linhas)]
+    })
+    ruins = np.flatnonzero(rng.random(linhas) < invalidos)
+    df.loc[ruins[::2], 'valor'] = 'n/d'
+    df.loc[ruins[1::2], 'data_exame'] = '31/02/2025'
+    return df
+
+
+def gerar_pasta(data_dir, pacientes, exames, referencias_file='data/valores_referencia.xlsx',
+                json_arquivos=3, json_itens=200, seed=0):
+    """
+    Cria uma pasta de dados completa (referência, pacientes, exames e JSONs de importação)
+
+    Args:
+        data_dir (str): Pasta de destino (criada se não existir)
+        pacientes (int): Quantidade de pacientes
+        exames (int): Quantidade aproximada de linhas de exame
+        referencias_file (str): Base de referência copiada para a pasta
+        json_arquivos (int): Quantidade de arquivos JSON em data_dir/importacao
+        json_itens (int): Itens por arquivo JSON
+        seed (int): Semente do gerador
+
+    Returns:
+        dict: Quantidades geradas e tempo de cada etapa
+    """
+    # Importação tardia: o DataManager depende do Streamlit
+    from modules.data_manager import DataManager
+    from modules.exam_analyzer_v2 import ExamAnalyzerV2
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    shutil.copy(referencias_file, os.path.join(data_dir, 'valores_referencia.xlsx'))
+    parametros = carregar_parametros(referencias_file)
+    analyzer = ExamAnalyzerV2(DataManager(data_dir=data_dir))
+
+    tempos = {}
+    inicio = time.perf_counter()
+    df_pacientes = gerar_pacientes(rng, pacientes)
+    df_exames = gerar_exames(rng, df_pacientes, parametros, exames, analyzer)
+    tempos['geracao'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df_pacientes.to_excel(os.path.join(data_dir, 'pacientes.xlsx'), index=False)
+    df_exames.to_excel(os.path.join(data_dir, 'exames.xlsx'), index=False)
+    tempos['gravacao_excel'] = time.perf_counter() - inicio
+
+    pasta_json = os.path.join(data_dir, 'importacao')
+    os.makedirs(pasta_json, exist_ok=True)
+    for i in range(json_arquivos):
+        with open(os.path.join(pasta_json, f"exames_{i + 1:04d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(gerar_json_importacao(rng, parametros, json_itens), f, ensure_ascii=False)
+
+    return {
+        'pacientes': len(df_pacientes),
+        'exames': len(df_exames),
+        'json_arquivos': json_arquivos,
+        'segundos': {etapa: round(s, 3) for etapa, s in tempos.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('destino', help="Pasta de dados a criar")
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default=None,
+                        help="Tamanho predefinido (pacientes, exames)")
+    parser.add_argument('--pacientes', type=int, default=1000)
+    parser.add_argument('--exames', type=int, default=12000)
+    parser.add_argument('--json-arquivos', type=int, default=3)
+    parser.add_argument('--json-itens', type=int, default=200)
+    parser.add_argument('--referencias', default='data/valores_referencia.xlsx')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pacientes, exames = ESCALAS[args.escala] if args.escala else (args.pacientes, args.exames)
+    resumo = gerar_pasta(args.destino, pacientes, exames, args.referencias,
+                         args.json_arquivos, args.json_itens, args.seed)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Tabela de apelidos (aliases) de exames para o Sistema Nutri Análises
+
+Guarda em data/aliases.json os vínculos feitos pelo usuário entre o nome
+usado por um laboratório (nome_original/parameter_name) e o parâmetro da
+base de referência. A busca é um acesso direto a dicionário pelo nome
+normalizado, feita antes da busca aproximada.
+
+Os contadores de acertos (por apelido) e de falhas (por nome que nem o
+apelido nem a busca na base reconheceram, ver record_miss) ficam em memória
+e são somados ao arquivo em flush(), com o arquivo protegido por um lock
+entre processos. Só os LIMITE_MISSES nomes com mais falhas são mantidos.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+from modules.concurrency import FileLock
+from modules.data_cache import file_version
+from modules.parameter_matcher import normalize_name
+
+LIMITE_MISSES = 500
+
+
+class AliasStore:
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Arquivo JSON dos apelidos
+        """
+        self.path = path
+        self._lock = FileLock(f"{path}.lock")
+        self._version = None
+        self.aliases = {}   # nome normalizado -> {'nome', 'parametro', 'hits', 'criado_em'}
+        self.misses = {}    # nome normalizado -> falhas registradas no arquivo
+        self._hits_pendentes = {}
+        self._misses_pendentes = {}
+        self._contadores_lock = threading.Lock()  # contadores pendentes são compartilhados entre sessões
+        self.refresh()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {'aliases': {}, 'misses': {}}
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        data.setdefault('aliases', {})
+        data.setdefault('misses', {})
+        return data
+
+    def _write(self, data):
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
+
+    def _set(self, data):
+        self.aliases = data['aliases']
+        self.misses = data['misses']
+        self._version = file_version(self.path)
+
+    def refresh(self):
+        """Recarrega o arquivo se ele foi alterado (ex.: por outro processo)"""
+        if file_version(self.path) != self._version:
+            self._set(self._read())
+
+    def lookup(self, *nomes):
+        """
+        Busca o parâmetro vinculado a algum dos nomes
+
+        Args:
+            *nomes (str): Nomes do exame em ordem de preferência
+
+        Returns:
+            str or None: Parâmetro vinculado ao primeiro nome com apelido
+        """
+        for chave in (normalize_name(nome) for nome in nomes):
+            alias = self.aliases.get(chave)
+            if alias is not None:
+                with self._contadores_lock:
+                    self._hits_pendentes[chave] = self._hits_pendentes.get(chave, 0) + 1
+                return alias['parametro']
+        return None
+
+    def record_miss(self, *nomes):
+        """
+        Registra uma falha para nomes que não foram reconhecidos (nem por apelido nem na base)
+
+        Args:
+            *nomes (str): Nomes do exame
+        """
+        chaves = {normalize_name(nome) for nome in nomes} - {''}
+        with self._contadores_lock:
+            for chave in chaves:
+                self._misses_pendentes[chave] = self._misses_pendentes.get(chave, 0) + 1
+
+    def register_many(self, vinculos):
+        """
+        Registra vários apelidos em uma única escrita
+
+        Args:
+            vinculos (dict): Nome usado pelo laboratório -> parâmetro da base de referência
+
+        Returns:
+            int: Quantidade de apelidos novos ou alterados
+        """
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            data = self._read()
+            alterados = 0
+            for nome, parametro in vinculos.items():
+                chave = normalize_name(nome)
+                if not chave:
+                    continue
+                atual = data['aliases'].get(chave)
+                if atual is not None and atual['parametro'] == parametro:
+                    continue
+                data['aliases'][chave] = {'nome': nome, 'parametro': parametro, 'hits': 0, 'criado_em': agora}
+                data['misses'].pop(chave, None)
+                with self._contadores_lock:
+                    self._misses_pendentes.pop(chave, None)
+                alterados += 1
+            if alterados:
+                self._write(data)
+            self._set(data)
+        return alterados
+
+    def register(self, nome, parametro):
+        """Registra um único apelido"""
+        return self.register_many({nome: parametro})
+
+    def remove(self, nome):
+        """Remove um apelido; retorna False se ele não existir"""
+        chave = normalize_name(nome)
+        with self._lock:
+            data = self._read()
+            if data['aliases'].pop(chave, None) is None:
+                return False
+            self._write(data)
+            self._set(data)
+        return True
+
+    def flush(self):
+        """Soma ao arquivo os contadores de acertos/falhas acumulados em memória"""
+        with self._contadores_lock:
+            if not self._hits_pendentes and not self._misses_pendentes:
+                return
+            hits, self._hits_pendentes = self._hits_pendentes, {}
+            misses, self._misses_pendentes = self._misses_pendentes, {}
+
+        with self._lock:
+            data = self._read()
+            for chave, n in hits.items():
+                if chave in data['aliases']:
+                    data['aliases'][chave]['hits'] += n
+            for chave, n in misses.items():
+                if chave not in data['aliases']:
+                    data['misses'][chave] = data['misses'].get(chave, 0) + n
+            if len(data['misses']) > LIMITE_MISSES:
+                data['misses'] = dict(sorted(data['misses'].items(), key=lambda m: (-m[1], m[0]))[:LIMITE_MISSES])
+            self._write(data)
+            self._set(data)
+
+    def stats(self):
+        """
+        Contadores dos apelidos e dos nomes não encontrados
+
+        Returns:
+            dict: {'aliases': [{'nome', 'parametro', 'hits', 'criado_em'}, ...],
+                'misses': {nome normalizado: falhas}}
+        """
+        with self._contadores_lock:
+            hits_pendentes = dict(self._hits_pendentes)
+            misses_pendentes = dict(self._misses_pendentes)
+
+        aliases = []
+        for chave, alias in self.aliases.items():
+            aliases.append({**alias, 'hits': alias['hits'] + hits_pendentes.get(chave, 0)})
+
+        misses = dict(self.misses)
+        for chave, n in misses_pendentes.items():
+            misses[chave] = misses.get(chave, 0) + n
+
+        return {
+            'aliases': sorted(aliases, key=lambda a: (-a['hits'], a['nome'])),
+            'misses': dict(sorted(misses.items(), key=lambda m: (-m[1], m[0])))
+        }
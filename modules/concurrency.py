@@ -0,0 +1,93 @@
+"""
+Controle de concorrência para o Sistema Nutri Análises
+
+FileLock serializa escritas entre threads e entre processos que compartilham
+a mesma pasta de dados (fcntl no Linux/macOS, msvcrt no Windows).
+ConflitoVersaoError sinaliza uma atualização feita sobre uma versão
+desatualizada de um registro (controle otimista).
+"""
+
+import os
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class ConflitoVersaoError(Exception):
+    """O registro foi alterado por outra sessão desde que foi carregado"""
+
+
+class FileLock:
+    _thread_locks = {}
+    _guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with FileLock._guard:
+            self._thread_lock = FileLock._thread_locks.setdefault(self.path, threading.Lock())
+        self._fd = None
+
+    def _try_os_lock(self):
+        try:
+            if os.name == 'nt':
+                msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking=True, timeout=None):
+        """
+        Adquire o lock
+
+        Args:
+            blocking (bool): Aguardar até obter o lock
+            timeout (float): Tempo máximo de espera em segundos (None = sem limite)
+
+        Returns:
+            bool: True se o lock foi obtido
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if blocking:
+            obtido = self._thread_lock.acquire(True, -1 if timeout is None else timeout)
+        else:
+            obtido = self._thread_lock.acquire(False)
+        if not obtido:
+            return False
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        espera = 0.005
+        while not self._try_os_lock():
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(self._fd)
+                self._fd = None
+                self._thread_lock.release()
+                return False
+            time.sleep(espera)
+            espera = min(espera * 2, 0.1)
+        return True
+
+    def release(self):
+        try:
+            if os.name == 'nt':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,151 @@
+"""
+Cache em memória compartilhado pelo processo para o Sistema Nutri Análises
+
+Registro dos artefatos compartilhados por todas as sessões do Streamlit. As
+chaves são tuplas cujo primeiro elemento é o namespace:
+
+    ('referencias', arquivo, artefato)       base de referência e derivados
+                                             (dicionário, categorias, tabela compilada, busca)
+    ('pacientes', origem)                    lista de pacientes
+    ('exames', origem[, id_paciente])        exames (todos ou de um paciente)
+    ('figuras', origem, id_paciente, param)  gráficos de evolução
+
+Cada valor é guardado junto com a versão dos dados de origem (mtime/tamanho
+dos arquivos, versões gravadas no banco ou o conteúdo usado) e só é
+recarregado quando ela muda. Cada escrita invalida apenas o prefixo de chave
+que afeta (ex.: salvar a base de referência não descarta exames nem
+gráficos); invalidar um prefixo também descarta cargas que estavam em
+andamento com os dados anteriores.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Entradas mantidas; as usadas há mais tempo são descartadas primeiro
+MAX_ENTRIES = 1024
+
+
+class DataCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}    # chave -> [lock, sessões usando]; só enquanto há carga em andamento
+        # Contador de invalidações de cada prefixo de chave (compõe a versão das entradas)
+        self._generations = {}
+        self._namespaces = {}   # namespace -> [hits, misses]
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Lock de carga da chave, descartado quando nenhuma sessão o usa mais"""
+        with self._lock:
+            entrada = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entrada[1] += 1
+        try:
+            with entrada[0]:
+                yield
+        finally:
+            with self._lock:
+                entrada[1] -= 1
+                if not entrada[1]:
+                    del self._key_locks[key]
+
+    def _generation(self, key):
+        """Invalidações já feitas em cada prefixo da chave"""
+        return tuple(self._generations.get(key[:i], 0) for i in range(len(key) + 1))
+
+    def _count(self, key, hit):
+        contadores = self._namespaces.setdefault(key[0] if key else None, [0, 0])
+        if hit:
+            self.hits += 1
+            contadores[0] += 1
+        else:
+            self.misses += 1
+            contadores[1] += 1
+
+    def get(self, key, version, loader):
+        """
+        Retorna o valor em cache para a chave ou o recarrega
+
+        Args:
+            key (tuple): Identificação do dado (ex.: ('exames', caminho, id_paciente))
+            version (tuple): Versão atual dos dados de origem
+            loader (callable): Função que carrega o valor quando a versão mudou
+
+        Returns:
+            Valor carregado (compartilhado: não deve ser alterado pelo chamador)
+        """
+        version = (version, self._generation(key))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self._count(key, hit=True)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return entry[1]
+
+        # Apenas uma sessão recarrega cada chave; as demais aguardam o resultado
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                with self._lock:
+                    self._count(key, hit=True)
+                return entry[1]
+
+            value = loader()
+            with self._lock:
+                self._entries[key] = (version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._count(key, hit=False)
+            return value
+
+    def invalidate(self, prefix=None):
+        """
+        Invalida as entradas cujo início da chave coincide com o prefixo (ou todas)
+
+        Args:
+            prefix (tuple): Ex.: ('referencias', arquivo) ou ('exames', origem, id_paciente)
+        """
+        prefix = tuple(prefix or ())
+        with self._lock:
+            self._generations[prefix] = self._generations.get(prefix, 0) + 1
+            for key in [k for k in self._entries if k[:len(prefix)] == prefix]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            por_namespace = {}
+            for key in self._entries:
+                por_namespace.setdefault(key[0] if key else None, 0)
+                por_namespace[key[0] if key else None] += 1
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'namespaces': {
+                    namespace: {'entries': por_namespace.get(namespace, 0), 'hits': hits, 'misses': misses}
+                    for namespace, (hits, misses) in sorted(self._namespaces.items(), key=lambda item: str(item[0]))
+                }
+            }
+
+
+def file_version(*paths):
+    """Versão de um conjunto de arquivos: (mtime_ns, tamanho) de cada um"""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+# Instância única do processo, compartilhada por todas as sessões
+shared_cache = DataCache()
@@ -4,157 +4,425 @@ Módulo de gerenciamento de dados para o Sistema Nutri Análises
 
 import pandas as pd
 import os
-from datetime import datetime
+import threading
 import streamlit as st
 
+from modules.concurrency import ConflitoVersaoError
+from modules.data_cache import file_version, shared_cache
+from modules.excel_backend import ExcelBackend
+from modules.excel_cache import read_excel
+from modules.reclassifier import reclassify_exames, referencias_por_parametro
+from modules.reference_table import CategoryIndex
+from modules.snapshot_store import SnapshotStore, diff_referencias
+from modules.sqlite_backend import SQLiteBackend
+from modules.write_behind import WriteBehindQueue
+
+# Backends de armazenamento de pacientes e exames
+BACKENDS = {
+    'excel': ExcelBackend,
+    'sqlite': SQLiteBackend
+}
+
+# Status excluídos pelo filtro "Apenas alterados" do Acompanhamento
+STATUS_NORMAIS = ['Ideal']
+
 class DataManager:
-    def __init__(self):
-        self.data_dir = "data"
+    def __init__(self, backend=None, data_dir=None):
+        self.data_dir = data_dir or os.environ.get('NUTRI_DATA_DIR', "data")
         self.pacientes_file = os.path.join(self.data_dir, "pacientes.xlsx")
         self.exames_file = os.path.join(self.data_dir, "exames.xlsx")
         self.referencias_file = os.path.join(self.data_dir, "valores_referencia.xlsx")
+        self.aliases_file = os.path.join(self.data_dir, "aliases.json")
+        
+        # Histórico de versões da base de referência (deduplicado por conteúdo)
+        self.snapshots = SnapshotStore(os.path.join(self.data_dir, "snapshots", "referencias"))
+        
+        # Backend selecionado pelo argumento ou pela variável NUTRI_STORAGE_BACKEND
+        backend = backend or os.environ.get('NUTRI_STORAGE_BACKEND', 'excel')
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+        self.backend = BACKENDS[backend](self.data_dir)
+        
+        # Exames são gravados por um único thread escritor (journal + group commit),
+        # criado no primeiro acesso a exames (processos que só classificam não o criam)
+        self._write_queue = None
+        self._write_queue_lock = threading.Lock()
         
-        # Criar arquivos se não existirem
-        self._initialize_files()
-        
-        # Carregar dados em cache
-        self._load_referencias()
-    
-    def _initialize_files(self):
-        """Inicializa arquivos de dados se não existirem"""
-        os.makedirs(self.data_dir, exist_ok=True)
-        
-        # Inicializar pacientes.xlsx
-        if not os.path.exists(self.pacientes_file):
-            df_pacientes = pd.DataFrame(columns=[
-                'id', 'nome', 'sexo', 'idade', 'peso_kg', 'altura_m', 
-                'data_cadastro', 'notas'
-            ])
-            df_pacientes.to_excel(self.pacientes_file, index=False)
-        
-        # Inicializar exames.xlsx
-        if not os.path.exists(self.exames_file):
-            df_exames = pd.DataFrame(columns=[
-                'id_exame', 'id_paciente', 'parametro', 'valor', 
-                'unidade', 'data_coleta', 'status'
-            ])
-            df_exames.to_excel(self.exames_file, index=False)
-    
-    @st.cache_data
-    def _load_referencias(_self):
-        """Carrega valores de referência em cache"""
+        # Valores de referência são lidos no primeiro get_referencias()
+    
+    @property
+    def write_queue(self):
+        """Fila de gravação de exames; ao ser criada, reaplica journals pendentes"""
+        with self._write_queue_lock:
+            if self._write_queue is None:
+                self._write_queue = WriteBehindQueue(
+                    os.path.join(self.data_dir, "journal"),
+                    f"exames_{self.backend.name}",
+                    self._apply_exames_batch,
+                    replay_filter=self._filter_replayed_exames
+                )
+            return self._write_queue
+    
+    def _load_referencias(self):
+        """Carrega valores de referência do arquivo"""
         try:
-            df = pd.read_excel(_self.referencias_file)
-            # Criar índice por parâmetro (case-insensitive)
-            referencias_dict = {}
-            for _, row in df.iterrows():
-                param = str(row['parametro']).lower().strip()
-                referencias_dict[param] = row.to_dict()
-            return referencias_dict
+            # Índice por parâmetro (case-insensitive)
+            return referencias_por_parametro(read_excel(self.referencias_file))
         except Exception as e:
             st.error(f"Erro ao carregar valores de referência: {e}")
             return {}
     
     def get_referencias(self):
-        """Retorna valores de referência"""
-        return self._load_referencias()
+        """Retorna valores de referência (cache compartilhado entre sessões, recarregado quando o arquivo muda)"""
+        return shared_cache.get(
+            ('referencias', self.referencias_file, 'valores'),
+            file_version(self.referencias_file),
+            self._load_referencias
+        )
+    
+    def get_artefato_referencias(self, nome, builder):
+        """
+        Retorna um objeto derivado da base de referência (ex.: tabela compilada)
+        
+        Args:
+            nome (str): Identificação do artefato no cache
+            builder (callable): Recebe o dicionário de referências e cria o objeto
+        
+        Returns:
+            Objeto compartilhado entre sessões, recriado quando a base muda
+        """
+        return shared_cache.get(
+            ('referencias', self.referencias_file, nome),
+            file_version(self.referencias_file),
+            lambda: builder(self.get_referencias())
+        )
+    
+    def get_indice_categorias(self):
+        """
+        Retorna o índice de parâmetros por categoria da base de referência
+        
+        O índice é imutável, compartilhado entre sessões e só é recriado
+        quando o arquivo de referência muda.
+        
+        Returns:
+            CategoryIndex: Índice categoria -> parâmetros
+        """
+        return shared_cache.get(
+            ('referencias', self.referencias_file, 'categorias'),
+            file_version(self.referencias_file),
+            lambda: CategoryIndex(read_excel(self.referencias_file))
+        )
     
     def load_pacientes(self):
-        """Carrega lista de pacientes"""
+        """Carrega lista de pacientes (cache compartilhado entre sessões)"""
         try:
-            return pd.read_excel(self.pacientes_file)
+            return self.backend.load_pacientes().copy()
         except Exception as e:
             st.error(f"Erro ao carregar pacientes: {e}")
             return pd.DataFrame()
     
+    def get_paciente(self, id_paciente):
+        """Retorna os dados atuais de um paciente (ou None)"""
+        df = self.load_pacientes()
+        if df.empty:
+            return None
+        df = df[df['id'] == id_paciente]
+        return None if df.empty else df.iloc[0].to_dict()
+    
     def save_paciente(self, paciente_data):
-        """Salva dados de um paciente"""
+        """
+        Salva dados de um paciente
+        
+        Atualizações levam a 'versao' lida; se outra sessão gravou o paciente
+        nesse meio tempo, nada é salvo e o usuário é avisado.
+        """
         try:
-            df = self.load_pacientes()
-            
-            if 'id' in paciente_data and paciente_data['id'] in df['id'].values:
-                # Atualizar paciente existente
-                df.loc[df['id'] == paciente_data['id']] = paciente_data
-            else:
-                # Novo paciente
-                if df.empty:
-                    paciente_data['id'] = 1
-                else:
-                    paciente_data['id'] = df['id'].max() + 1
-                paciente_data['data_cadastro'] = datetime.now().strftime('%Y-%m-%d')
-                df = pd.concat([df, pd.DataFrame([paciente_data])], ignore_index=True)
-            
-            df.to_excel(self.pacientes_file, index=False)
+            self.backend.save_paciente(paciente_data)
             return True
+        except ConflitoVersaoError:
+            st.warning("⚠️ Os dados deste paciente foram alterados em outra sessão. Os dados atuais foram recarregados; revise e salve novamente.")
+            return False
         except Exception as e:
             st.error(f"Erro ao salvar paciente: {e}")
             return False
     
     def load_exames(self, id_paciente=None):
-        """Carrega exames de um paciente específico ou todos"""
+        """Carrega exames de um paciente específico ou todos (cache compartilhado entre sessões)"""
         try:
-            df = pd.read_excel(self.exames_file)
-            if id_paciente is not None:
-                df = df[df['id_paciente'] == id_paciente]
-            return df
+            self._aguardar_gravacoes()
+            return self.backend.load_exames(id_paciente).copy()
         except Exception as e:
             st.error(f"Erro ao carregar exames: {e}")
             return pd.DataFrame()
     
-    def save_exames(self, exames_data, id_paciente):
-        """Salva lista de exames para um paciente"""
+    def query_exames(self, id_paciente, parametros=None, date_from=None, date_to=None,
+                     status_in=None, status_not_in=None, limit=None, order_by=None):
+        """
+        Consulta exames de um paciente aplicando os filtros no backend
+        
+        Args:
+            id_paciente (int): ID do paciente
+            parametros (list): Parâmetros a incluir (None = todos)
+            date_from (date): Data de coleta inicial (inclusive)
+            date_to (date): Data de coleta final (inclusive)
+            status_in (list): Status a incluir (None = todos)
+            status_not_in (list): Status a excluir (exames sem status continuam incluídos)
+            limit (int): Número máximo de linhas
+            order_by (str | list): Coluna(s) de ordenação; prefixo '-' para decrescente
+        
+        Returns:
+            DataFrame: Exames filtrados
+        """
+        try:
+            self._aguardar_gravacoes()
+            return self.backend.query_exames(
+                id_paciente, parametros=parametros, date_from=date_from, date_to=date_to,
+                status_in=status_in, status_not_in=status_not_in, limit=limit, order_by=order_by
+            )
+        except Exception as e:
+            st.error(f"Erro ao consultar exames: {e}")
+            return pd.DataFrame()
+    
+    def get_resumo_exames(self, id_paciente):
+        """Retorna total, parâmetros distintos e período dos exames de um paciente"""
         try:
-            df_existente = pd.read_excel(self.exames_file)
+            self._aguardar_gravacoes()
+            return self.backend.resumo_exames(id_paciente)
+        except Exception as e:
+            st.error(f"Erro ao carregar resumo de exames: {e}")
+            return {'total': 0, 'parametros': [], 'data_min': None, 'data_max': None}
+    
+    def enqueue_exames(self, exames_data, id_paciente):
+        """
+        Registra exames para gravação em segundo plano
+        
+        Os IDs são reservados e a intenção é gravada no journal antes de
+        retornar, portanto os exames já estão salvos de forma durável; a
+        escrita no armazenamento é feita pelo thread escritor.
+        
+        Returns:
+            int or None: Ticket da gravação (0 se não há exames; None em caso de erro)
+        """
+        try:
+            if not exames_data:
+                return 0
+            
+            ids = self.backend.reserve_ids('exames', len(exames_data))
             
             # Preparar novos exames
             novos_exames = []
-            for exame in exames_data:
+            for exame, id_exame in zip(exames_data, ids):
                 exame['id_paciente'] = id_paciente
-                if df_existente.empty:
-                    exame['id_exame'] = 1
-                else:
-                    exame['id_exame'] = df_existente['id_exame'].max() + 1 if not df_existente.empty else 1
+                exame['id_exame'] = id_exame
                 novos_exames.append(exame)
             
-            # Adicionar novos exames
-            df_novos = pd.DataFrame(novos_exames)
-            df_final = pd.concat([df_existente, df_novos], ignore_index=True)
-            
-            df_final.to_excel(self.exames_file, index=False)
+            return self.write_queue.submit('exames', {'rows': novos_exames})
+        except Exception as e:
+            st.error(f"Erro ao salvar exames: {e}")
+            return None
+    
+    def save_exames(self, exames_data, id_paciente, timeout=30):
+        """Salva lista de exames para um paciente e aguarda a gravação no armazenamento"""
+        ticket = self.enqueue_exames(exames_data, id_paciente)
+        if ticket is None:
+            return False
+        if not self.write_queue.wait(ticket, timeout):
+            st.error(f"Erro ao salvar exames: {self.write_queue.last_error or 'tempo esgotado'}")
+            return False
+        erro = self.write_queue.discard_error(ticket)
+        if erro is not None:
+            st.error(f"Erro ao salvar exames: {erro}")
+            return False
+        return True
+    
+    def _aguardar_gravacoes(self):
+        """Antes de uma leitura, aguarda os exames da fila (sem esperar se o escritor está falhando)"""
+        self.write_queue.flush(timeout=0 if self.write_queue.is_failing() else 30)
+    
+    def get_write_status(self):
+        """
+        Situação da gravação em segundo plano
+        
+        Returns:
+            dict: {'pendentes': int, 'erro': str ou None, 'descartados': int, 'arquivo_descartados': str}
+        """
+        erro = self.write_queue.last_error
+        return {
+            'pendentes': self.write_queue.pending(),
+            'erro': f"{type(erro).__name__}: {erro}" if erro is not None else None,
+            'descartados': self.write_queue.descartados,
+            'arquivo_descartados': self.write_queue.dead_letter_file
+        }
+    
+    def save_exames_lote(self, exames):
+        """
+        Grava de forma síncrona exames de vários pacientes (importação em lote)
+        
+        Os exames já trazem id_paciente e id_exame (ver reserve_ids); a
+        gravação é uma única escrita no backend, sem passar pela fila.
+        
+        Args:
+            exames (list): Dicionários dos exames
+        
+        Returns:
+            bool: True se os exames foram gravados
+        """
+        try:
+            if exames:
+                self.backend.append_exames(pd.DataFrame(exames))
             return True
         except Exception as e:
             st.error(f"Erro ao salvar exames: {e}")
             return False
     
-    def backup_referencias(self):
-        """Cria backup dos valores de referência"""
+    def flush_writes(self, timeout=None):
+        """Aguarda a gravação de todos os exames pendentes; retorna False se o tempo esgotar"""
+        return self.write_queue.flush(timeout)
+    
+    def _apply_exames_batch(self, intents):
+        """Grava um lote de intenções com uma única escrita no backend (group commit)"""
+        rows = [row for intent in intents for row in intent['rows']]
+        if rows:
+            self.backend.append_exames(pd.DataFrame(rows))
+    
+    def _filter_replayed_exames(self, intents):
+        """Remove de intenções reexecutadas os exames que já chegaram ao backend"""
+        existentes = set(self.backend.load_exames()['id_exame'].dropna().astype(int))
+        for intent in intents:
+            intent['rows'] = [row for row in intent['rows'] if row['id_exame'] not in existentes]
+        return [intent for intent in intents if intent['rows']]
+    
+    def reserve_ids(self, nome, quantidade=1):
+        """
+        Reserva uma faixa de IDs em uma única chamada (ex.: importações em lote)
+        
+        Args:
+            nome (str): Sequência ('pacientes' ou 'exames')
+            quantidade (int): Quantidade de IDs
+        
+        Returns:
+            range: IDs reservados
+        """
+        return self.backend.reserve_ids(nome, quantidade)
+    
+    def compact_exames(self):
+        """Incorpora os exames pendentes do log à base do backend"""
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
-            backup_file = os.path.join(self.data_dir, f"valores_referencia_{timestamp}.xlsx")
-            
-            # Copiar arquivo atual
-            df = pd.read_excel(self.referencias_file)
-            df.to_excel(backup_file, index=False)
-            
-            return backup_file
+            self.write_queue.flush()
+            return self.backend.compact()
+        except Exception as e:
+            st.error(f"Erro ao compactar exames: {e}")
+            return None
+    
+    def get_cache_stats(self):
+        """Estatísticas do cache de dados do processo"""
+        return shared_cache.stats()
+    
+    def backup_referencias(self, motivo='antes de salvar'):
+        """
+        Registra a base de referência atual no histórico de versões
+        
+        Returns:
+            dict or None: Snapshot com o conteúdo atual (o último, se nada mudou) ou None em caso de erro
+        """
+        try:
+            snapshot, _ = self.snapshots.snapshot(self.referencias_file, motivo=motivo)
+            return snapshot
         except Exception as e:
             st.error(f"Erro ao criar backup: {e}")
             return None
     
     def save_referencias(self, df_referencias):
-        """Salva valores de referência atualizados"""
+        """
+        Salva valores de referência atualizados e reclassifica os exames afetados
+        
+        Returns:
+            dict or bool: Relatório da reclassificação (ver reclassify_exames) ou False em caso de erro
+        """
         try:
-            # Criar backup antes de salvar
+            df_atual = read_excel(self.referencias_file)
+            
+            # Nada mudou: sem gravação, backup nem reclassificação
+            if df_referencias.reset_index(drop=True).equals(df_atual):
+                return {'parametros': [], 'avaliados': 0, 'alterados': 0}
+            
+            referencias_antigas = referencias_por_parametro(df_atual)
+            
+            # Versão atual no histórico (sem custo se já registrada)
             self.backup_referencias()
             
             # Salvar novos valores
             df_referencias.to_excel(self.referencias_file, index=False)
+            self.backup_referencias(motivo='salvo')
             
-            # Limpar cache
-            st.cache_data.clear()
-            
-            return True
+            # Descarta apenas a base de referência e seus derivados (pacientes, exames e gráficos seguem em cache)
+            shared_cache.invalidate(('referencias', self.referencias_file))
         except Exception as e:
             st.error(f"Erro ao salvar referências: {e}")
             return False
+        
+        return self._reclassify_apos_alteracao(referencias_antigas)
+    
+    def restore_referencias(self, snapshot_id):
+        """
+        Restaura uma versão do histórico da base de referência e reclassifica os exames afetados
+        
+        A versão substituída é registrada no histórico antes da restauração.
+        
+        Args:
+            snapshot_id (int): Id do snapshot
+        
+        Returns:
+            dict or bool: Relatório da reclassificação ou False em caso de erro
+        """
+        try:
+            referencias_antigas = referencias_por_parametro(read_excel(self.referencias_file))
+            self.snapshots.restore(snapshot_id, self.referencias_file)
+            self.backup_referencias(motivo=f'restaurado da versão {snapshot_id}')
+            shared_cache.invalidate(('referencias', self.referencias_file))
+        except Exception as e:
+            st.error(f"Erro ao restaurar referências: {e}")
+            return False
+        
+        return self._reclassify_apos_alteracao(referencias_antigas)
+    
+    def diff_referencias(self, snapshot_id, outro_id=None):
+        """
+        Diferenças entre uma versão do histórico e outra (ou a base atual)
+        
+        Args:
+            snapshot_id (int): Versão anterior
+            outro_id (int): Versão posterior (None = base atual)
+        
+        Returns:
+            pd.DataFrame: Colunas parametro, campo, antes, depois
+        """
+        depois = read_excel(self.referencias_file) if outro_id is None else self.snapshots.load(outro_id)
+        return diff_referencias(self.snapshots.load(snapshot_id), depois)
+    
+    def _reclassify_apos_alteracao(self, referencias_antigas):
+        try:
+            # Status gravados passam a refletir as novas faixas
+            relatorio = self.reclassify_exames(referencias_antigas, self.get_referencias())
+            if relatorio['alterados']:
+                st.info(f"♻️ {relatorio['alterados']} exames reclassificados com os novos valores de referência")
+            return relatorio
+        except Exception as e:
+            st.error(f"Referências salvas, mas houve erro ao reclassificar exames: {e}")
+            return False
+    
+    def reclassify_exames(self, referencias_antigas, referencias_novas):
+        """
+        Reclassifica os exames gravados cujos parâmetros/sexos mudaram entre as duas bases
+        
+        Args:
+            referencias_antigas (dict): Base anterior ({} = reclassificar todos os parâmetros)
+            referencias_novas (dict): Base atual
+        
+        Returns:
+            dict: {'parametros': list, 'avaliados': int, 'alterados': int}
+        """
+        # Exames ainda na fila entram na reclassificação
+        self.write_queue.flush()
+        return reclassify_exames(self.backend, referencias_antigas, referencias_novas)
 
@@ -2,13 +2,37 @@
 Módulo de análise de exames para o Sistema Nutri Análises
 """
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from modules.reference_table import (
+    CompiledReferenceTable, STATUS_NAO_ENCONTRADO, STATUS_SEM_REFERENCIA, STATUS_VALOR_INVALIDO,
+    STATUS_IDEAL, STATUS_REFERENCIA, STATUS_ABAIXO, STATUS_ACIMA, STATUS_SEM_CLASSIFICACAO
+)
+
+# Status da versão 1 para cada código da tabela compilada (fora das faixas = 'Fora')
+STATUS_LABELS_V1 = np.empty(8, dtype=object)
+STATUS_LABELS_V1[STATUS_NAO_ENCONTRADO] = 'Não encontrado'
+STATUS_LABELS_V1[STATUS_SEM_REFERENCIA] = 'Sem referência'
+STATUS_LABELS_V1[STATUS_VALOR_INVALIDO] = 'Valor inválido'
+STATUS_LABELS_V1[STATUS_IDEAL] = 'Ideal'
+STATUS_LABELS_V1[STATUS_REFERENCIA] = 'Referência'
+STATUS_LABELS_V1[[STATUS_ABAIXO, STATUS_ACIMA, STATUS_SEM_CLASSIFICACAO]] = 'Fora'
+
 class ExamAnalyzer:
     def __init__(self, data_manager):
         self.data_manager = data_manager
-        self.referencias = data_manager.get_referencias()
+    
+    # Base de referência e tabela compilada são montadas no primeiro uso e
+    # recriadas quando a base de referência muda
+    @property
+    def referencias(self):
+        return self.data_manager.get_referencias()
+    
+    @property
+    def tabela_referencia(self):
+        return self.data_manager.get_artefato_referencias('tabela', CompiledReferenceTable)
     
     def classify_exam(self, parametro, valor, sexo):
         """
@@ -24,14 +48,15 @@ class ExamAnalyzer:
         """
         param_key = parametro.lower().strip()
         
-        if param_key not in self.referencias:
+        referencias = self.referencias
+        if param_key not in referencias:
             return {
                 'status': 'Não encontrado',
                 'color': '#6C757D',
                 'icon': '❓'
             }
         
-        ref_data = self.referencias[param_key]
+        ref_data = referencias[param_key]
         
         # Selecionar limites baseado no sexo
         if sexo.upper() == 'M':
@@ -102,10 +127,11 @@ class ExamAnalyzer:
         """
         param_key = parametro.lower().strip()
         
-        if param_key not in self.referencias:
+        referencias = self.referencias
+        if param_key not in referencias:
             return None
         
-        ref_data = self.referencias[param_key]
+        ref_data = referencias[param_key]
         
         if sexo.upper() == 'M':
             return {
@@ -149,30 +175,53 @@ class ExamAnalyzer:
                 'error': f"Colunas obrigatórias ausentes: {', '.join(missing_columns)}"
             }
         
-        # Validar tipos de dados
-        errors = []
+        # Validar tipos de dados (todas as linhas de uma vez)
+        _, valor_invalido = _parse_valores(df['valor'])
+        _, data_invalida = _parse_datas(df['data_exame'])
         
-        for idx, row in df.iterrows():
-            # Validar valor numérico
-            try:
-                float(row['valor'])
-            except (ValueError, TypeError):
-                errors.append(f"Linha {idx + 1}: Valor '{row['valor']}' não é numérico")
-            
-            # Validar data
-            try:
-                pd.to_datetime(row['data_exame'])
-            except:
-                errors.append(f"Linha {idx + 1}: Data '{row['data_exame']}' inválida")
+        errors = []
+        for pos in np.flatnonzero(valor_invalido | data_invalida):
+            idx = df.index[pos]
+            if valor_invalido[pos]:
+                errors.append(f"Linha {idx + 1}: Valor '{df['valor'].iloc[pos]}' não é numérico")
+            if data_invalida[pos]:
+                errors.append(f"Linha {idx + 1}: Data '{df['data_exame'].iloc[pos]}' inválida")
         
         if errors:
             return {
                 'valid': False,
-                'error': '; '.join(errors[:5])  # Mostrar apenas os primeiros 5 erros
+                'error': '; '.join(errors[:5]),  # Mostrar apenas os primeiros 5 erros
+                'errors': errors
             }
         
         return {'valid': True}
     
+    def classify_batch(self, parametros, valores, sexos):
+        """
+        Classifica vários exames em uma única passada vetorizada
+        
+        Args:
+            parametros (array-like): Nomes dos parâmetros
+            valores (array-like): Valores dos exames
+            sexos (str or array-like): Sexo de cada exame ('M' ou 'F') ou um único sexo para todos
+        
+        Returns:
+            np.ndarray: Status de cada exame, iguais aos de classify_exam
+        """
+        codes = self.tabela_referencia.classify(parametros, valores, sexos)
+        status = STATUS_LABELS_V1[codes]
+        
+        # Limites não numéricos: a lógica escalar da versão 1 difere da versão 2
+        escalar = self.tabela_referencia.scalar_rows(parametros, sexos)
+        if len(escalar):
+            parametros = np.asarray(parametros, dtype=object)
+            valores = np.asarray(valores, dtype=object)
+            sexos = np.full(len(status), sexos, dtype=object) if isinstance(sexos, str) else np.asarray(sexos, dtype=object)
+            for i in escalar:
+                status[i] = self.classify_exam(parametros[i], valores[i], sexos[i])['status']
+        
+        return status
+    
     def process_csv_import(self, df, id_paciente, sexo_paciente):
         """
         Processa importação de CSV
@@ -185,36 +234,22 @@ class ExamAnalyzer:
         Returns:
             dict: Resultado do processamento
         """
-        # Separar parâmetros conhecidos e desconhecidos
-        conhecidos = []
-        desconhecidos = []
+        # Separar parâmetros conhecidos e desconhecidos (junção com o índice de referência)
+        encontrado = self.tabela_referencia.param_indices(df['nome_exame']) >= 0
         
-        for _, row in df.iterrows():
-            param_key = row['nome_exame'].lower().strip()
-            
-            if param_key in self.referencias:
-                # Classificar exame
-                classification = self.classify_exam(
-                    row['nome_exame'], 
-                    row['valor'], 
-                    sexo_paciente
-                )
-                
-                exame_data = {
-                    'parametro': row['nome_exame'],
-                    'valor': float(row['valor']),
-                    'unidade': row['unidade'],
-                    'data_coleta': pd.to_datetime(row['data_exame']).strftime('%Y-%m-%d'),
-                    'status': classification['status']
-                }
-                conhecidos.append(exame_data)
-            else:
-                desconhecidos.append({
-                    'nome_exame': row['nome_exame'],
-                    'valor': row['valor'],
-                    'unidade': row['unidade'],
-                    'data_exame': row['data_exame']
-                })
+        df_conhecidos = df[encontrado]
+        valores, _ = _parse_valores(df_conhecidos['valor'])
+        datas, _ = _parse_datas(df_conhecidos['data_exame'])
+        
+        conhecidos = pd.DataFrame({
+            'parametro': df_conhecidos['nome_exame'].to_numpy(dtype=object),
+            'valor': valores,
+            'unidade': df_conhecidos['unidade'].to_numpy(dtype=object),
+            'data_coleta': datas,
+            'status': self.classify_batch(df_conhecidos['nome_exame'], df_conhecidos['valor'], sexo_paciente)
+        }).to_dict('records')
+        
+        desconhecidos = df.loc[~encontrado, ['nome_exame', 'valor', 'unidade', 'data_exame']].to_dict('records')
         
         return {
             'conhecidos': conhecidos,
@@ -249,3 +284,60 @@ class ExamAnalyzer:
                 'classificacao': "Dados inválidos"
             }
 
+
+def _parse_valores(valores):
+    """
+    Converte a coluna de valores como float(valor)
+    
+    Returns:
+        tuple: (np.ndarray de floats, máscara dos valores não numéricos)
+    """
+    if pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+        return valores.to_numpy(dtype=np.float64, copy=True), np.zeros(len(valores), dtype=bool)
+    
+    brutos = valores.to_numpy(dtype=object)
+    convertidos = pd.to_numeric(valores, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    invalido = np.zeros(len(brutos), dtype=bool)
+    
+    # to_numeric não distingue texto inválido de vazio/'nan': conferir esses com float()
+    # (None/NaN/NA ficam como NaN, como na leitura linha a linha)
+    for pos in np.flatnonzero(np.isnan(convertidos)):
+        if pd.isna(brutos[pos]):
+            continue
+        try:
+            valor = float(brutos[pos])
+        except (ValueError, TypeError):
+            invalido[pos] = True
+            continue
+        convertidos[pos] = valor
+    return convertidos, invalido
+
+
+def _parse_datas(datas):
+    """
+    Converte a coluna de datas como pd.to_datetime(data), analisando cada data distinta uma vez
+    
+    Returns:
+        tuple: (np.ndarray com as datas em 'YYYY-MM-DD' (None se vazia), máscara das datas inválidas)
+    """
+    codigos, unicas = pd.factorize(datas.to_numpy(dtype=object))
+    
+    try:
+        convertidas = list(pd.to_datetime(pd.Series(unicas, dtype=object), errors='coerce', format='mixed'))
+    except (ValueError, TypeError):
+        # Ex.: datas com e sem fuso horário misturadas; converter uma a uma abaixo
+        convertidas = [pd.NaT] * len(unicas)
+    
+    # Datas não convertidas: inválidas apenas se pd.to_datetime escalar também falhar
+    invalidas = np.zeros(len(unicas) + 1, dtype=bool)
+    for pos, data in enumerate(convertidas):
+        if pd.isna(data):
+            try:
+                convertidas[pos] = pd.to_datetime(unicas[pos])
+            except Exception:
+                invalidas[pos] = True
+    
+    formatadas = np.array([None if pd.isna(data) else data.strftime('%Y-%m-%d') for data in convertidas] + [None], dtype=object)
+    
+    # Código -1 = data vazia (NaN), aceita como no pd.to_datetime escalar
+    return formatadas[codigos], invalidas[codigos]
@@ -6,46 +6,57 @@ Suporte para JSON e tabelas por categoria
 import pandas as pd
 import streamlit as st
 import json
+from functools import cached_property
+
+from modules.alias_store import AliasStore
+from modules.json_schema import JSONSchemaValidator, resumo_erros
+from modules.json_stream import JSONArrayReader, JSONNotArrayError, iter_chunks
+from modules.parameter_matcher import ParameterMatcher
+from modules.reference_table import CompiledReferenceTable, status_labels
+
+# Itens validados, buscados e classificados por vez na importação em blocos
+JSON_CHUNK_SIZE = 1000
+
+COLUNAS_CONHECIDOS = ['parametro', 'valor', 'unidade', 'data_coleta', 'status']
+COLUNAS_DESCONHECIDOS = ['parameter_name', 'nome_original', 'valor', 'unit']
 
 class ExamAnalyzerV2:
     def __init__(self, data_manager):
         self.data_manager = data_manager
-        self.referencias = data_manager.get_referencias()
-        self.categorias = self._get_categorias()
+        self.validator = JSONSchemaValidator()
+    
+    # Base de referência, tabela compilada e busca são montadas no primeiro
+    # uso (não antes da primeira tela), compartilhadas entre sessões e
+    # recriadas quando a base de referência muda
+    @property
+    def referencias(self):
+        return self.data_manager.get_referencias()
+    
+    @property
+    def tabela_referencia(self):
+        return self.data_manager.get_artefato_referencias('tabela', CompiledReferenceTable)
+    
+    @property
+    def matcher(self):
+        return self.data_manager.get_artefato_referencias('busca', ParameterMatcher)
     
-    def _get_categorias(self):
-        """Extrai as categorias únicas dos valores de referência"""
+    @cached_property
+    def aliases(self):
+        return AliasStore(self.data_manager.aliases_file)
+    
+    @property
+    def categorias(self):
+        """Categorias únicas dos valores de referência"""
         try:
-            df_ref = pd.read_excel("data/valores_referencia.xlsx")
-            categorias = df_ref['categoria'].dropna().unique().tolist()
-            return sorted(categorias)
+            return list(self.data_manager.get_indice_categorias().categorias)
         except Exception as e:
             st.error(f"Erro ao carregar categorias: {e}")
             return []
     
     def get_parameters_by_category(self, categoria):
-        """Retorna parâmetros de uma categoria específica"""
+        """Retorna parâmetros de uma categoria específica (registros somente leitura)"""
         try:
-            df_ref = pd.read_excel("data/valores_referencia.xlsx")
-            df_categoria = df_ref[df_ref['categoria'] == categoria]
-            
-            parametros = []
-            for _, row in df_categoria.iterrows():
-                parametros.append({
-                    'parametro': row['parametro'],
-                    'unidade': row['unidade_medida'],
-                    'valor_ideal_homem_min': row.get('valor_ideal_homem_min'),
-                    'valor_ideal_homem_max': row.get('valor_ideal_homem_max'),
-                    'valor_ideal_mulher_min': row.get('valor_ideal_mulher_min'),
-                    'valor_ideal_mulher_max': row.get('valor_ideal_mulher_max'),
-                    'valor_ref_homem_min': row.get('valor_ref_homem_min'),
-                    'valor_ref_homem_max': row.get('valor_ref_homem_max'),
-                    'valor_ref_mulher_min': row.get('valor_ref_mulher_min'),
-                    'valor_ref_mulher_max': row.get('valor_ref_mulher_max'),
-                    'observacao': row.get('observacao', '')
-                })
-            
-            return parametros
+            return list(self.data_manager.get_indice_categorias().parametros(categoria))
         except Exception as e:
             st.error(f"Erro ao carregar parâmetros da categoria {categoria}: {e}")
             return []
@@ -64,14 +75,15 @@ class ExamAnalyzerV2:
         """
         param_key = parametro.lower().strip()
         
-        if param_key not in self.referencias:
+        referencias = self.referencias
+        if param_key not in referencias:
             return {
                 'status': 'Não encontrado',
                 'color': '#6C757D',
                 'icon': '❓'
             }
         
-        ref_data = self.referencias[param_key]
+        ref_data = referencias[param_key]
         
         # Selecionar limites baseado no sexo
         if sexo.upper() == 'M':
@@ -138,6 +150,25 @@ class ExamAnalyzerV2:
                 'icon': '⚠️'
             }
     
+    def classify_batch(self, parametros, valores, sexos):
+        """
+        Classifica vários exames em uma única passada vetorizada
+        
+        Args:
+            parametros (array-like): Nomes dos parâmetros (ex.: coluna de um DataFrame)
+            valores (array-like): Valores dos exames
+            sexos (str or array-like): Sexo de cada exame ('M' ou 'F') ou um único sexo para todos
+        
+        Returns:
+            np.ndarray: Códigos de status (ver modules.reference_table.STATUS_*),
+            equivalentes ao resultado de classify_exam para cada linha
+        """
+        return self.tabela_referencia.classify(parametros, valores, sexos)
+    
+    def classify_batch_status(self, parametros, valores, sexos):
+        """Mesmo que classify_batch, devolvendo o texto do status de cada exame"""
+        return status_labels(self.classify_batch(parametros, valores, sexos))
+    
     def get_reference_ranges(self, parametro, sexo):
         """
         Retorna as faixas de referência para um parâmetro
@@ -151,10 +182,11 @@ class ExamAnalyzerV2:
         """
         param_key = parametro.lower().strip()
         
-        if param_key not in self.referencias:
+        referencias = self.referencias
+        if param_key not in referencias:
             return None
         
-        ref_data = self.referencias[param_key]
+        ref_data = referencias[param_key]
         
         if sexo.upper() == 'M':
             return {
@@ -187,39 +219,21 @@ class ExamAnalyzerV2:
             json_data (list): Lista de dicionários com dados dos exames
         
         Returns:
-            dict: Resultado da validação
+            dict: Resultado da validação ('errors' lista todos os erros: item, campo, motivo, valor)
         """
-        required_fields = ['parameter_name', 'nome_original', 'unit', 'valor']
-        
         if not isinstance(json_data, list):
             return {
                 'valid': False,
                 'error': "JSON deve ser uma lista de objetos"
             }
         
-        errors = []
-        
-        for idx, item in enumerate(json_data):
-            if not isinstance(item, dict):
-                errors.append(f"Item {idx + 1}: Deve ser um objeto")
-                continue
-            
-            # Verificar campos obrigatórios
-            missing_fields = [field for field in required_fields if field not in item]
-            if missing_fields:
-                errors.append(f"Item {idx + 1}: Campos ausentes: {', '.join(missing_fields)}")
-                continue
-            
-            # Validar valor numérico
-            try:
-                float(item['valor'])
-            except (ValueError, TypeError):
-                errors.append(f"Item {idx + 1}: Valor '{item['valor']}' não é numérico")
+        errors = self.validator.validate(json_data)
         
         if errors:
             return {
                 'valid': False,
-                'error': '; '.join(errors[:5])  # Mostrar apenas os primeiros 5 erros
+                'error': resumo_erros(errors),
+                'errors': [erro.to_dict() for erro in errors]
             }
         
         return {'valid': True}
@@ -237,55 +251,125 @@ class ExamAnalyzerV2:
         Returns:
             dict: Resultado do processamento
         """
+        self.aliases.refresh()
+        conhecidos, desconhecidos, _ = self._process_items(json_data, sexo_paciente, data_coleta, validar=False)
+        self.aliases.flush()
+        
+        return {
+            'conhecidos': conhecidos,
+            'desconhecidos': desconhecidos
+        }
+    
+    def process_json_stream(self, fileobj, id_paciente, sexo_paciente, data_coleta,
+                            chunk_size=JSON_CHUNK_SIZE, on_progress=None):
+        """
+        Processa importação de JSON lendo o arquivo aos poucos
+        
+        Os itens são lidos um a um e validados, buscados e classificados em
+        blocos de chunk_size; apenas os resultados de cada bloco (em
+        DataFrames) ficam em memória.
+        
+        Args:
+            fileobj: Arquivo JSON aberto (ex.: UploadedFile do Streamlit)
+            id_paciente (int): ID do paciente
+            sexo_paciente (str): Sexo do paciente
+            data_coleta (str): Data de coleta no formato YYYY-MM-DD
+            chunk_size (int): Itens processados por bloco
+            on_progress (callable): Recebe (itens lidos, bytes lidos) após cada bloco
+        
+        Returns:
+            dict: {'valid', 'total', 'conhecidos' (DataFrame), 'desconhecidos' (DataFrame)};
+            se houver itens inválidos, {'valid': False, 'error', 'errors', 'total'}
+        
+        Raises:
+            json.JSONDecodeError: Se o arquivo não for um JSON válido
+        """
+        reader = JSONArrayReader(fileobj)
+        errors = []
+        conhecidos = []
+        desconhecidos = []
+        total = 0
+        
+        self.aliases.refresh()
+        
+        try:
+            for chunk in iter_chunks(reader, chunk_size):
+                # Validação e busca no mesmo bloco; após o primeiro erro o restante é apenas validado
+                chunk_conhecidos, chunk_desconhecidos, chunk_errors = self._process_items(
+                    chunk, sexo_paciente, data_coleta, inicio=total, somente_validar=bool(errors)
+                )
+                total += len(chunk)
+                errors.extend(chunk_errors)
+                
+                if not errors:
+                    if chunk_conhecidos:
+                        conhecidos.append(pd.DataFrame(chunk_conhecidos, columns=COLUNAS_CONHECIDOS))
+                    if chunk_desconhecidos:
+                        desconhecidos.append(pd.DataFrame(chunk_desconhecidos, columns=COLUNAS_DESCONHECIDOS))
+                
+                if on_progress is not None:
+                    on_progress(total, reader.bytes_read)
+        except JSONNotArrayError as e:
+            return {'valid': False, 'error': str(e), 'total': total}
+        finally:
+            self.aliases.flush()
+        
+        if errors:
+            return {
+                'valid': False,
+                'error': resumo_erros(errors),
+                'errors': [erro.to_dict() for erro in errors],
+                'total': total
+            }
+        
+        return {
+            'valid': True,
+            'total': total,
+            'conhecidos': pd.concat(conhecidos, ignore_index=True) if conhecidos else pd.DataFrame(columns=COLUNAS_CONHECIDOS),
+            'desconhecidos': pd.concat(desconhecidos, ignore_index=True) if desconhecidos else pd.DataFrame(columns=COLUNAS_DESCONHECIDOS)
+        }
+    
+    def _process_items(self, items, sexo_paciente, data_coleta, inicio=0, validar=True, somente_validar=False):
+        """
+        Valida o bloco e busca o parâmetro de cada item; classifica os reconhecidos em uma única chamada
+        
+        Args:
+            items (list): Itens do JSON
+            sexo_paciente (str): Sexo do paciente
+            data_coleta (str): Data de coleta no formato YYYY-MM-DD
+            inicio (int): Posição do primeiro item no arquivo (para os erros)
+            validar (bool): Validar os itens (False se já foram validados)
+            somente_validar (bool): Apenas validar, sem buscar/classificar
+        
+        Returns:
+            tuple: (conhecidos, desconhecidos, erros de validação)
+        """
+        errors = self.validator.validate(items, inicio) if validar else []
+        if errors or somente_validar:
+            return [], [], errors
+        
         # Separar parâmetros conhecidos e desconhecidos
         conhecidos = []
         desconhecidos = []
+        aliases, matcher = self.aliases, self.matcher
         
-        for item in json_data:
-            # Tentar encontrar o parâmetro usando parameter_name ou nome_original
-            param_key = item['parameter_name'].lower().strip()
-            nome_original_key = item['nome_original'].lower().strip()
-            
-            found = False
-            parametro_encontrado = None
-            
-            # Buscar por parameter_name
-            if param_key in self.referencias:
-                parametro_encontrado = item['parameter_name']
-                found = True
-            # Buscar por nome_original
-            elif nome_original_key in self.referencias:
-                parametro_encontrado = item['nome_original']
-                found = True
-            else:
-                # Buscar por correspondência parcial
-                for ref_param in self.referencias.keys():
-                    if param_key in ref_param or ref_param in param_key:
-                        parametro_encontrado = list(self.referencias.keys())[list(self.referencias.keys()).index(ref_param)]
-                        found = True
-                        break
-                    if nome_original_key in ref_param or ref_param in nome_original_key:
-                        parametro_encontrado = list(self.referencias.keys())[list(self.referencias.keys()).index(ref_param)]
-                        found = True
-                        break
+        for item in items:
+            # Buscar o parâmetro por parameter_name ou nome_original: primeiro nos
+            # apelidos vinculados pelo usuário, depois na base (nome canônico)
+            nomes = (item['parameter_name'], item['nome_original'])
+            parametro_encontrado = aliases.lookup(*nomes) or matcher.match(*nomes)
+            found = parametro_encontrado is not None
             
             if found:
-                # Classificar exame
-                classification = self.classify_exam(
-                    parametro_encontrado, 
-                    item['valor'], 
-                    sexo_paciente
-                )
-                
-                exame_data = {
+                conhecidos.append({
                     'parametro': parametro_encontrado,
                     'valor': float(item['valor']),
                     'unidade': item['unit'],
                     'data_coleta': data_coleta,
-                    'status': classification['status']
-                }
-                conhecidos.append(exame_data)
+                    'status': None
+                })
             else:
+                aliases.record_miss(*nomes)
                 desconhecidos.append({
                     'parameter_name': item['parameter_name'],
                     'nome_original': item['nome_original'],
@@ -293,10 +377,17 @@ class ExamAnalyzerV2:
                     'unit': item['unit']
                 })
         
-        return {
-            'conhecidos': conhecidos,
-            'desconhecidos': desconhecidos
-        }
+        # Classificar todos os exames reconhecidos de uma vez
+        if conhecidos:
+            status = self.classify_batch(
+                [exame['parametro'] for exame in conhecidos],
+                [exame['valor'] for exame in conhecidos],
+                sexo_paciente
+            )
+            for exame, status_exame in zip(conhecidos, status_labels(status)):
+                exame['status'] = status_exame
+        
+        return conhecidos, desconhecidos, errors
     
     def calculate_imc(self, peso_kg, altura_m):
         """Calcula IMC e retorna classificação"""
@@ -336,16 +427,26 @@ class ExamAnalyzerV2:
         Returns:
             str or None: Nome do parâmetro encontrado ou None
         """
-        search_key = search_name.lower().strip()
+        return self.aliases.lookup(search_name) or self.matcher.match(search_name)
+    
+    def register_aliases(self, vinculos):
+        """
+        Vincula nomes usados pelos laboratórios a parâmetros da base de referência
         
-        # Busca exata
-        if search_key in self.referencias:
-            return search_name
+        Args:
+            vinculos (dict): Nome do exame -> parâmetro da base de referência
         
-        # Busca por correspondência parcial
-        for param_key, param_data in self.referencias.items():
-            if search_key in param_key or param_key in search_key:
-                return param_data['parametro']
+        Returns:
+            int: Quantidade de apelidos novos ou alterados
         
-        return None
+        Raises:
+            ValueError: Se algum parâmetro não existir na base de referência
+        """
+        canonicos = {}
+        for nome, parametro in vinculos.items():
+            canonico = self.matcher.match_exact(parametro)
+            if canonico is None:
+                raise ValueError(f"Parâmetro não encontrado na base de referência: {parametro}")
+            canonicos[nome] = canonico
+        return self.aliases.register_many(canonicos)
 
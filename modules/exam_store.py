@@ -0,0 +1,220 @@
+"""
+Armazenamento de exames somente-anexação para o Sistema Nutri Análises
+
+O arquivo exames.xlsx passa a ser a base compactada. Cada salvamento apenas
+anexa as novas linhas a um log CSV (exames_log.csv); a compactação, executada
+separadamente, incorpora o log à base e o esvazia.
+"""
+
+import glob
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from modules.concurrency import FileLock
+from modules.excel_cache import read_excel
+
+COLUNAS_EXAMES = [
+    'id_exame', 'id_paciente', 'parametro', 'valor',
+    'unidade', 'data_coleta', 'status'
+]
+
+DTYPES_LOG = {
+    'parametro': str,
+    'unidade': str,
+    'data_coleta': str,
+    'status': str
+}
+
+
+class AppendOnlyExamStore:
+    def __init__(self, base_file, log_file=None):
+        self.base_file = base_file
+        base, _ = os.path.splitext(base_file)
+        self.log_file = log_file or f"{base}_log.csv"
+        self.journal_file = f"{base}.compact.json"
+        self.tmp_file = f"{base}.compacting{os.path.splitext(base_file)[1]}"
+        self._max_id = None
+
+        # Anexações e a troca do log são serializadas entre sessões e processos;
+        # a compactação inteira usa um lock próprio para não bloquear os salvamentos
+        self._lock = FileLock(f"{base}.lock")
+        self._compact_lock = FileLock(f"{base}.compact.lock")
+
+        with self._compact_lock:
+            self._recover_compaction()
+
+    def _segment_files(self):
+        """Segmentos de log congelados por uma compactação em andamento"""
+        base, _ = os.path.splitext(self.log_file)
+        return sorted(glob.glob(f"{base}.*.csv"))
+
+    def files(self):
+        """Arquivos que compõem o armazenamento (base, segmentos e log)"""
+        return [self.base_file] + self._segment_files() + [self.log_file]
+
+    def _read_log(self, path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return pd.DataFrame(columns=COLUNAS_EXAMES)
+        return pd.read_csv(path, dtype=DTYPES_LOG, encoding='utf-8')
+
+    def _recover_compaction(self):
+        """Conclui ou desfaz uma compactação interrompida"""
+        if not os.path.exists(self.journal_file):
+            return
+
+        try:
+            with open(self.journal_file, encoding='utf-8') as f:
+                journal = json.load(f)
+        except ValueError:
+            # Journal incompleto: a base temporária só é gravada depois dele, então
+            # a base não foi trocada e os segmentos continuam valendo (nenhum é removido)
+            journal = {'tmp_file': self.tmp_file, 'segments': []}
+
+        if os.path.exists(journal['tmp_file']):
+            # A base nova não chegou a substituir a antiga: manter os segmentos
+            os.remove(journal['tmp_file'])
+        else:
+            # A base já contém as linhas dos segmentos
+            for segment in journal['segments']:
+                if os.path.exists(segment):
+                    os.remove(segment)
+
+        os.remove(self.journal_file)
+
+    def append(self, df_novos):
+        """Anexa novas linhas ao log sem reescrever a base"""
+        df_novos = df_novos.reindex(columns=COLUNAS_EXAMES)
+
+        with self._lock:
+            write_header = not os.path.exists(self.log_file) or os.path.getsize(self.log_file) == 0
+            with open(self.log_file, 'a', encoding='utf-8', newline='') as f:
+                df_novos.to_csv(f, index=False, header=write_header)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if self._max_id is not None and not df_novos.empty:
+            self._max_id = max(self._max_id, int(df_novos['id_exame'].max()))
+
+    def load(self):
+        """Carrega base compactada mais as linhas pendentes do log"""
+        with self._lock:
+            frames = [read_excel(self.base_file)]
+            for path in self._segment_files() + [self.log_file]:
+                df_log = self._read_log(path)
+                if not df_log.empty:
+                    frames.append(df_log)
+
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def max_id(self):
+        """Maior id_exame armazenado (calculado uma vez por processo)"""
+        if self._max_id is None:
+            df = self.load()
+            self._max_id = 0 if df.empty else int(df['id_exame'].max())
+        return self._max_id
+
+    def pending_rows(self):
+        """Quantidade de linhas no log ainda não compactadas"""
+        return sum(len(self._read_log(path)) for path in self._segment_files() + [self.log_file])
+
+    def compact(self):
+        """
+        Incorpora o log à base exames.xlsx
+
+        O log atual é congelado como segmento (novos salvamentos seguem para um
+        log novo), a base é reescrita em um arquivo temporário e substituída de
+        forma atômica. Um journal permite recuperar uma compactação interrompida.
+
+        Returns:
+            int: Número de linhas incorporadas à base
+        """
+        with self._compact_lock:
+            return self._compact()[0]
+
+    def rewrite(self, transform):
+        """
+        Altera linhas já gravadas com a mesma troca atômica da compactação
+
+        O log pendente é incorporado à base na mesma escrita; salvamentos
+        feitos durante a reescrita seguem para um log novo e não são afetados.
+
+        Args:
+            transform (callable): Recebe o DataFrame completo, altera-o no lugar
+                e retorna o número de linhas alteradas
+
+        Returns:
+            int: Número de linhas alteradas
+        """
+        with self._compact_lock:
+            return self._compact(transform)[1]
+
+    def _write_journal(self, journal):
+        """Grava o journal da compactação de forma atômica (arquivo temporário + fsync)"""
+        tmp_journal = f"{self.journal_file}.tmp"
+        with open(tmp_journal, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_journal, self.journal_file)
+
+    def _compact(self, transform=None):
+        """Incorpora os segmentos e aplica transform; retorna (linhas incorporadas, linhas alteradas)"""
+        with self._lock:
+            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > 0:
+                base, _ = os.path.splitext(self.log_file)
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+                os.replace(self.log_file, f"{base}.{timestamp}.csv")
+
+        segments = self._segment_files()
+        if not segments and transform is None:
+            return 0, 0
+
+        frames = [read_excel(self.base_file)]
+        frames.extend(self._read_log(path) for path in segments)
+        df_final = pd.concat(frames, ignore_index=True)
+
+        alteradas = transform(df_final) if transform is not None else 0
+
+        # Reescrita sem alterações e sem log pendente: a base fica como está
+        if not alteradas and not segments:
+            return 0, 0
+
+        self._write_journal({'tmp_file': self.tmp_file, 'segments': segments})
+
+        df_final.to_excel(self.tmp_file, index=False)
+
+        # Troca da base e remoção dos segmentos sem leitores no meio
+        with self._lock:
+            os.replace(self.tmp_file, self.base_file)
+            for segment in segments:
+                os.remove(segment)
+        os.remove(self.journal_file)
+
+        return len(df_final) - len(frames[0]), alteradas
+
+
+def parse_order_by(order_by):
+    """
+    Converte a ordenação de query_exames em pares (coluna, ascendente)
+
+    Aceita um nome de coluna ou uma lista deles; o prefixo '-' indica ordem
+    decrescente (ex.: '-data_coleta').
+    """
+    if order_by is None:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+
+    ordem = []
+    for campo in order_by:
+        ascendente = not campo.startswith('-')
+        coluna = campo.lstrip('-')
+        if coluna not in COLUNAS_EXAMES:
+            raise ValueError(f"Coluna de ordenação inválida: {coluna}")
+        ordem.append((coluna, ascendente))
+    return ordem
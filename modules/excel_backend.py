@@ -0,0 +1,201 @@
+"""
+Backend de armazenamento em planilhas Excel para o Sistema Nutri Análises
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from modules.concurrency import ConflitoVersaoError, FileLock
+from modules.data_cache import shared_cache, file_version
+from modules.exam_store import AppendOnlyExamStore, COLUNAS_EXAMES, parse_order_by
+from modules.excel_cache import read_excel
+from modules.id_allocator import IdAllocator
+
+COLUNAS_PACIENTES = [
+    'id', 'nome', 'sexo', 'idade', 'peso_kg', 'altura_m',
+    'data_cadastro', 'notas', 'versao'
+]
+
+
+class ExcelBackend:
+    name = 'excel'
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.pacientes_file = os.path.join(data_dir, "pacientes.xlsx")
+        self.exames_file = os.path.join(data_dir, "exames.xlsx")
+
+        self._initialize_files()
+
+        # Lock entre sessões e processos para a leitura-alteração-escrita de pacientes
+        self._pacientes_lock = FileLock(f"{self.pacientes_file}.lock")
+
+        # Exames: base compactada + log somente-anexação
+        self.exam_store = AppendOnlyExamStore(self.exames_file)
+
+        # Sequências de IDs (semeadas com o maior ID existente na primeira vez)
+        self.id_allocator = IdAllocator(
+            os.path.join(data_dir, "sequences.json"),
+            seeds={
+                'pacientes': self._max_paciente_id,
+                'exames': self.exam_store.max_id
+            }
+        )
+
+    def _initialize_files(self):
+        """Inicializa arquivos de dados se não existirem"""
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        if not os.path.exists(self.pacientes_file):
+            pd.DataFrame(columns=COLUNAS_PACIENTES).to_excel(self.pacientes_file, index=False)
+
+        if not os.path.exists(self.exames_file):
+            pd.DataFrame(columns=COLUNAS_EXAMES).to_excel(self.exames_file, index=False)
+
+    def _max_paciente_id(self):
+        df = self.load_pacientes()
+        return 0 if df.empty else int(df['id'].max())
+
+    def reserve_ids(self, nome, quantidade=1):
+        return self.id_allocator.reserve(nome, quantidade)
+
+    def pacientes_version(self):
+        return file_version(self.pacientes_file)
+
+    def exames_version(self):
+        return file_version(*self.exam_store.files())
+
+    def _read_pacientes(self):
+        df = read_excel(self.pacientes_file)
+        # Planilhas anteriores ao controle de versão: todos na versão 0
+        if 'versao' not in df.columns:
+            df = df.assign(versao=0)
+        df['versao'] = df['versao'].fillna(0).astype(int)
+        return df
+
+    def load_pacientes(self):
+        return shared_cache.get(
+            ('pacientes', self.pacientes_file),
+            self.pacientes_version(),
+            self._read_pacientes
+        )
+
+    def save_paciente(self, paciente_data):
+        """
+        Insere ou atualiza um paciente com controle otimista de versão
+
+        Se paciente_data traz 'versao', a atualização só é aceita quando ela
+        coincide com a versão gravada; caso contrário ConflitoVersaoError.
+        """
+        with self._pacientes_lock:
+            # Leitura direta do arquivo: a versão precisa refletir a última escrita de qualquer processo
+            df = self._read_pacientes()
+
+            if 'id' in paciente_data and paciente_data['id'] in df['id'].values:
+                mask = df['id'] == paciente_data['id']
+                versao_atual = _versao(df.loc[mask, 'versao'].iloc[0])
+                versao_lida = paciente_data.get('versao')
+                if versao_lida is not None and not pd.isna(versao_lida) and int(versao_lida) != versao_atual:
+                    raise ConflitoVersaoError(
+                        f"Paciente {paciente_data['id']} alterado em outra sessão "
+                        f"(versão {versao_lida}, atual {versao_atual})"
+                    )
+                paciente_data['versao'] = versao_atual + 1
+
+                # Atualizar paciente existente (colunas como object para aceitar qualquer tipo)
+                df = df.astype(object)
+                for campo, valor in paciente_data.items():
+                    if campo in df.columns:
+                        df.loc[mask, campo] = valor
+            else:
+                # Novo paciente
+                paciente_data['id'] = self.id_allocator.next_id('pacientes')
+                paciente_data['data_cadastro'] = datetime.now().strftime('%Y-%m-%d')
+                paciente_data['versao'] = 1
+                df = pd.concat([df, pd.DataFrame([paciente_data])], ignore_index=True)
+
+            # Escrita atômica: leitores nunca veem a planilha pela metade
+            base, ext = os.path.splitext(self.pacientes_file)
+            tmp_file = f"{base}.tmp{ext}"
+            df.to_excel(tmp_file, index=False)
+            os.replace(tmp_file, self.pacientes_file)
+            # Escritas deste processo invalidam só a lista de pacientes (exames seguem em cache)
+            shared_cache.invalidate(('pacientes', self.pacientes_file))
+
+        return paciente_data
+
+    def load_exames(self, id_paciente=None):
+        df = shared_cache.get(('exames', self.exames_file), self.exames_version(), self.exam_store.load)
+        if id_paciente is not None:
+            df = df[df['id_paciente'] == id_paciente]
+        return df
+
+    def query_exames(self, id_paciente, parametros=None, date_from=None, date_to=None,
+                     status_in=None, status_not_in=None, limit=None, order_by=None):
+        df = self.load_exames(id_paciente)
+
+        mask = pd.Series(True, index=df.index)
+        if parametros is not None:
+            mask &= df['parametro'].isin(parametros)
+        if date_from is not None or date_to is not None:
+            datas = pd.to_datetime(df['data_coleta']).dt.normalize()
+            if date_from is not None:
+                mask &= datas >= pd.Timestamp(date_from)
+            if date_to is not None:
+                mask &= datas <= pd.Timestamp(date_to)
+        if status_in is not None:
+            mask &= df['status'].isin(status_in)
+        if status_not_in is not None:
+            mask &= ~df['status'].isin(status_not_in)
+        df = df[mask]
+
+        ordem = parse_order_by(order_by)
+        if ordem:
+            df = df.sort_values(
+                [coluna for coluna, _ in ordem],
+                ascending=[ascendente for _, ascendente in ordem],
+                kind='stable'
+            )
+        if limit is not None:
+            df = df.head(limit)
+        return df.reset_index(drop=True)
+
+    def resumo_exames(self, id_paciente):
+        df = self.load_exames(id_paciente)
+        datas = pd.to_datetime(df['data_coleta'])
+        return {
+            'total': len(df),
+            'parametros': sorted(df['parametro'].dropna().unique().tolist()),
+            'data_min': datas.min().date() if not df.empty else None,
+            'data_max': datas.max().date() if not df.empty else None
+        }
+
+    def append_exames(self, df_novos):
+        self.exam_store.append(df_novos)
+        shared_cache.invalidate(('exames', self.exames_file))
+
+    def pending_rows(self):
+        return self.exam_store.pending_rows()
+
+    def compact(self):
+        incorporadas = self.exam_store.compact()
+        shared_cache.invalidate(('exames', self.exames_file))
+        return incorporadas
+
+    def reclassify_exames(self, parametros, reclassificar):
+        def transform(df):
+            selecionadas = df['parametro'].str.lower().str.strip().isin(parametros)
+            novos = reclassificar(df[selecionadas])
+            df.loc[novos.index, 'status'] = novos
+            return len(novos)
+
+        alteradas = self.exam_store.rewrite(transform)
+        shared_cache.invalidate(('exames', self.exames_file))
+        return alteradas
+
+
+def _versao(valor):
+    """Versão gravada de um paciente (planilhas antigas não têm a coluna)"""
+    return 0 if valor is None or pd.isna(valor) else int(valor)
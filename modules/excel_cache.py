@@ -0,0 +1,166 @@
+"""
+Cache binário das planilhas Excel para o Sistema Nutri Análises
+
+A leitura de .xlsx pelo openpyxl é lenta. Na primeira leitura de uma
+planilha, o DataFrame é gravado ao lado dela, na pasta .cache, em formato
+colunar (Feather, lido com memory map, se o pyarrow estiver instalado;
+senão, ou se o Feather não aceitar a tabela, um pickle), junto com o
+tamanho, o mtime e o hash SHA-256 do arquivo de origem. As leituras
+seguintes usam o arquivo binário enquanto a planilha não mudar. A planilha
+continua sendo a fonte editável dos dados: qualquer alteração nela (pela
+aplicação ou à mão) invalida o cache.
+
+O nome do arquivo de dados inclui o hash da planilha, então os metadados
+sempre apontam para os dados do conteúdo que descrevem, mesmo que duas
+gravações do cache se intercalem. O pyarrow só é importado na primeira
+leitura ou gravação de um arquivo Feather.
+
+O cache pode ser desativado com NUTRI_EXCEL_CACHE=0.
+"""
+
+import glob
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import uuid
+
+import pandas as pd
+
+# Disponibilidade do pyarrow sem importá-lo (a importação é feita no primeiro uso)
+FORMATOS = ('feather', 'pickle') if importlib.util.find_spec('pyarrow') else ('pickle',)
+
+CACHE_DIR = '.cache'
+
+
+def _habilitado():
+    return os.environ.get('NUTRI_EXCEL_CACHE', '1') != '0'
+
+
+def _caminhos(path):
+    """Pasta do cache e prefixo dos arquivos de uma planilha"""
+    pasta = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    return pasta, os.path.join(pasta, os.path.basename(path))
+
+
+def _ler_meta(meta_file):
+    try:
+        with open(meta_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_atomico(path, gravar):
+    tmp_file = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        gravar(tmp_file)
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _gravar_meta(meta_file, meta):
+    def gravar(tmp_file):
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    _gravar_atomico(meta_file, gravar)
+
+
+def _data_file(prefixo, sha256, formato):
+    return f"{prefixo}.{sha256[:16]}.{formato}"
+
+
+def _ler_dados(prefixo, meta):
+    if meta['formato'] not in FORMATOS:
+        raise ValueError(f"Formato de cache indisponível: {meta['formato']}")
+    data_file = _data_file(prefixo, meta['sha256'], meta['formato'])
+    if meta['formato'] == 'feather':
+        from pyarrow import feather
+        return feather.read_table(data_file, memory_map=True).to_pandas()
+    return pd.read_pickle(data_file)
+
+
+def _gravar_dados(prefixo, sha256, df):
+    """Grava os dados no primeiro formato que aceitar a tabela; retorna o formato"""
+    for formato in FORMATOS:
+        def gravar(tmp_file):
+            if formato == 'feather':
+                df.to_feather(tmp_file)
+            else:
+                df.to_pickle(tmp_file)
+        try:
+            _gravar_atomico(_data_file(prefixo, sha256, formato), gravar)
+            return formato
+        except Exception:
+            if formato == FORMATOS[-1]:
+                raise
+
+
+def _remover_antigos(prefixo, atual):
+    """Remove dados de versões anteriores da planilha (os em uso por outro processo ficam)"""
+    for formato in ('feather', 'pickle'):
+        # Inclui o nome sem hash usado pelas versões anteriores do cache
+        for path in glob.glob(f"{glob.escape(prefixo)}.*.{formato}") + [f"{prefixo}.{formato}"]:
+            if path != atual:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def read_excel(path):
+    """
+    Lê uma planilha (primeira aba) usando o cache binário quando válido
+
+    Args:
+        path (str): Caminho do arquivo .xlsx
+
+    Returns:
+        pd.DataFrame: Mesmo resultado de pd.read_excel(path)
+    """
+    if not _habilitado():
+        return pd.read_excel(path)
+
+    pasta, prefixo = _caminhos(path)
+    meta_file = f"{prefixo}.json"
+    stat = os.stat(path)
+    meta = _ler_meta(meta_file)
+
+    # Tamanho e mtime iguais: cache válido sem ler a planilha
+    if meta and meta['tamanho'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        try:
+            return _ler_dados(prefixo, meta)
+        except Exception:
+            pass
+
+    # Os bytes lidos uma única vez servem para o hash e para o parse
+    with open(path, 'rb') as f:
+        conteudo = f.read()
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    novo_meta = {'tamanho': len(conteudo), 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+    # Arquivo tocado ou copiado sem mudar o conteúdo: reaproveita os dados
+    if meta and meta['sha256'] == sha256:
+        try:
+            df = _ler_dados(prefixo, meta)
+            _gravar_meta(meta_file, {**novo_meta, 'formato': meta['formato']})
+            return df
+        except Exception:
+            pass
+
+    df = pd.read_excel(io.BytesIO(conteudo))
+
+    # Falha ao gravar o cache (pasta somente leitura, tipos que o Feather não
+    # aceita) não impede a leitura: a planilha continua sendo lida a cada vez
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        formato = _gravar_dados(prefixo, sha256, df)
+        _gravar_meta(meta_file, {**novo_meta, 'formato': formato})
+        _remover_antigos(prefixo, _data_file(prefixo, sha256, formato))
+    except Exception:
+        pass
+    return df
+
@@ -0,0 +1,70 @@
+"""
+Alocação persistente de IDs para o Sistema Nutri Análises
+
+Cada sequência (pacientes, exames) guarda o último ID entregue em
+data/sequences.json. Reservar um ID ou uma faixa inteira de IDs custa uma
+única escrita do arquivo, sem varrer os dados existentes. O arquivo é
+protegido por um lock entre processos.
+"""
+
+import json
+import os
+
+from modules.concurrency import FileLock
+
+
+class IdAllocator:
+    def __init__(self, path, seeds=None):
+        """
+        Args:
+            path (str): Arquivo JSON das sequências
+            seeds (dict): Função por sequência que retorna o maior ID já usado;
+                chamada apenas na primeira vez que a sequência é criada
+        """
+        self.path = path
+        self.seeds = seeds or {}
+        self._lock = FileLock(f"{path}.lock")
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, sequences):
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(sequences, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
+
+    def reserve(self, nome, quantidade=1):
+        """
+        Reserva uma faixa contígua de IDs
+
+        Args:
+            nome (str): Nome da sequência ('pacientes', 'exames')
+            quantidade (int): Quantidade de IDs
+
+        Returns:
+            range: IDs reservados
+        """
+        if quantidade < 1:
+            raise ValueError("Quantidade de IDs deve ser positiva")
+
+        with self._lock:
+            sequences = self._read()
+            if nome not in sequences:
+                seed = self.seeds.get(nome)
+                sequences[nome] = int(seed()) if seed else 0
+
+            primeiro = sequences[nome] + 1
+            sequences[nome] += quantidade
+            self._write(sequences)
+
+        return range(primeiro, primeiro + quantidade)
+
+    def next_id(self, nome):
+        """Reserva um único ID"""
+        return self.reserve(nome)[0]
@@ -0,0 +1,156 @@
+"""
+Validação do formato JSON de exames para o Sistema Nutri Análises
+
+O esquema (campo -> regra) é compilado uma vez em uma função Python gerada
+com as verificações de tipo em linha: um item válido custa uma única
+expressão. Só os itens que falham nela passam pela verificação campo a
+campo, que devolve erros estruturados (índice do item, campo, motivo), sem
+limite de quantidade.
+"""
+
+from typing import NamedTuple
+
+# Esquema de cada exame do JSON importado: campo -> regra
+EXAM_SCHEMA = {
+    'parameter_name': 'texto',
+    'nome_original': 'texto',
+    'unit': 'texto_ou_nulo',
+    'valor': 'numero'
+}
+
+MOTIVOS = {
+    'objeto': "Deve ser um objeto",
+    'ausente': "Campo ausente",
+    'texto': "Deve ser um texto",
+    'texto_ou_nulo': "Deve ser um texto ou nulo",
+    'numero': "Valor não é numérico"
+}
+
+
+class ErroValidacao(NamedTuple):
+    indice: int        # posição do item no arquivo (0 = primeiro)
+    campo: str         # campo com erro (None = o item inteiro)
+    motivo: str        # código do motivo (ver MOTIVOS)
+    valor: object = None
+
+    @property
+    def mensagem(self):
+        texto = f"Item {self.indice + 1}: "
+        if self.campo is not None:
+            texto += f"{self.campo}: "
+        texto += MOTIVOS[self.motivo]
+        if self.motivo in ('texto', 'texto_ou_nulo', 'numero'):
+            texto += f" ('{self.valor}')"
+        return texto
+
+    def to_dict(self):
+        return {'item': self.indice + 1, 'campo': self.campo, 'motivo': MOTIVOS[self.motivo], 'valor': self.valor}
+
+
+def _is_texto(valor):
+    return isinstance(valor, str)
+
+
+def _is_texto_ou_nulo(valor):
+    return valor is None or isinstance(valor, str)
+
+
+def _is_numero(valor):
+    # Mesma regra da importação: float(valor) deve funcionar
+    if type(valor) in (int, float):
+        return True
+    try:
+        float(valor)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+REGRAS = {
+    'texto': _is_texto,
+    'texto_ou_nulo': _is_texto_ou_nulo,
+    'numero': _is_numero
+}
+
+# Caminho rápido de cada regra (tipos exatos); o que não passar é conferido pela regra completa
+REGRAS_RAPIDAS = {
+    'texto': "type({v}) is str",
+    'texto_ou_nulo': "({v} is None or type({v}) is str)",
+    'numero': "(type({v}) is float or type({v}) is int)"
+}
+
+_SEM_ERROS = ()
+
+
+class JSONSchemaValidator:
+    def __init__(self, schema=EXAM_SCHEMA):
+        """
+        Args:
+            schema (dict): Campo -> regra ('texto', 'texto_ou_nulo' ou 'numero')
+        """
+        self.schema = dict(schema)
+        self._checks = tuple((campo, regra, REGRAS[regra]) for campo, regra in self.schema.items())
+        self._validate_items = self._compile()
+
+    def _compile(self):
+        """Gera a função de validação de uma lista de itens para este esquema"""
+        leituras = '; '.join(f"v{i} = item[{campo!r}]" for i, campo in enumerate(self.schema))
+        condicao = ' and '.join(
+            REGRAS_RAPIDAS[regra].format(v=f"v{i}") for i, regra in enumerate(self.schema.values())
+        ) or 'True'
+        codigo = (
+            "def validate_items(items, inicio):\n"
+            "    erros = []\n"
+            "    for indice, item in enumerate(items, inicio):\n"
+            "        if type(item) is dict:\n"
+            "            try:\n"
+            f"                {leituras or 'pass'}\n"
+            "            except KeyError:\n"
+            "                erros.extend(check_item(item, indice))\n"
+            "                continue\n"
+            f"            if {condicao}:\n"
+            "                continue\n"
+            "        erros.extend(check_item(item, indice))\n"
+            "    return erros\n"
+        )
+        namespace = {'check_item': self._check_item}
+        exec(compile(codigo, f"<validador {', '.join(self.schema)}>", 'exec'), namespace)
+        return namespace['validate_items']
+
+    def _check_item(self, item, indice):
+        """Verificação completa, campo a campo, de um item que falhou no caminho rápido"""
+        if not isinstance(item, dict):
+            return [ErroValidacao(indice, None, 'objeto')]
+
+        erros = []
+        for campo, regra, check in self._checks:
+            if campo not in item:
+                erros.append(ErroValidacao(indice, campo, 'ausente'))
+            elif not check(item[campo]):
+                erros.append(ErroValidacao(indice, campo, regra, item[campo]))
+        return erros
+
+    def validate_item(self, item, indice):
+        """
+        Valida um item
+
+        Args:
+            item: Item lido do JSON
+            indice (int): Posição do item no arquivo
+
+        Returns:
+            list: Erros encontrados (vazia se o item é válido)
+        """
+        return self._validate_items((item,), indice) or _SEM_ERROS
+
+    def validate(self, items, inicio=0):
+        """Erros de todos os itens (inicio = posição do primeiro item no arquivo)"""
+        return self._validate_items(items, inicio)
+
+
+def resumo_erros(erros, limite=5):
+    """Texto com os primeiros erros e a quantidade total"""
+    texto = '; '.join(erro.mensagem for erro in erros[:limite])
+    if len(erros) > limite:
+        texto += f" (e mais {len(erros) - limite} erros)"
+    return texto
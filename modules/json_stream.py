@@ -0,0 +1,127 @@
+"""
+Leitura incremental de arquivos JSON para o Sistema Nutri Análises
+
+iter_json_array lê um array JSON em blocos de tamanho fixo e devolve um
+item por vez (json.JSONDecoder.raw_decode sobre um buffer), sem carregar o
+arquivo inteiro nem a lista completa de objetos na memória.
+"""
+
+import codecs
+import json
+import re
+
+# Bytes lidos do arquivo por vez
+READ_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+class JSONNotArrayError(ValueError):
+    """O conteúdo do arquivo não é uma lista JSON"""
+
+
+class JSONArrayReader:
+    def __init__(self, fileobj, read_size=READ_SIZE):
+        """
+        Args:
+            fileobj: Arquivo aberto (binário ou texto), ex.: UploadedFile do Streamlit
+            read_size (int): Bytes lidos por vez
+        """
+        self.fileobj = fileobj
+        self.read_size = read_size
+        self.bytes_read = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Lê mais um bloco para o buffer; retorna False no fim do arquivo"""
+        if self._eof:
+            return False
+        data = self.fileobj.read(self.read_size)
+        if isinstance(data, bytes):
+            self.bytes_read += len(data)
+            text = self._utf8.decode(data, final=not data)
+        else:
+            self.bytes_read += len(data.encode('utf-8'))
+            text = data
+        if not data:
+            self._eof = True
+
+        # Descarta o que já foi consumido
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return bool(data) or bool(text)
+
+    def _error(self, msg):
+        return json.JSONDecodeError(msg, self._buffer, self._pos)
+
+    def _next_char(self):
+        """Próximo caractere não branco (None no fim do arquivo), sem consumi-lo"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def _decode_value(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # Um número pode ter sido cortado pelo fim do bloco (ex.: "-1.5" de "-1.5e10")
+                if self._eof or (end < len(self._buffer) and self._buffer[end] not in _NUMBER_CHARS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def __iter__(self):
+        if self._next_char() != '[':
+            raise JSONNotArrayError("JSON deve ser uma lista de objetos")
+        self._pos += 1
+
+        if self._next_char() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            if self._next_char() is None:
+                raise self._error("Fim inesperado do arquivo")
+            yield self._decode_value()
+
+            char = self._next_char()
+            if char == ',':
+                self._pos += 1
+            elif char == ']':
+                self._pos += 1
+                break
+            elif char is None:
+                raise self._error("Fim inesperado do arquivo")
+            else:
+                raise self._error("Esperado ',' ou ']'")
+
+        if self._next_char() is not None:
+            raise self._error("Conteúdo após o fim da lista")
+
+
+def iter_json_array(fileobj, read_size=READ_SIZE):
+    """Itera sobre os itens de um array JSON lido em blocos"""
+    return iter(JSONArrayReader(fileobj, read_size))
+
+
+def iter_chunks(items, size):
+    """Agrupa um iterável em listas de até size itens"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
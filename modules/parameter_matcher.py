@@ -0,0 +1,132 @@
+"""
+Busca de parâmetros por nome para o Sistema Nutri Análises
+
+Os nomes da base de referência são normalizados (sem acentos, minúsculos,
+pontuação como espaço) e indexados de duas formas: um dicionário para a
+busca exata e um índice de trigramas para correspondências parciais. A
+correspondência parcial escolhe o parâmetro de maior pontuação (desempate
+pela ordem da base), de modo que o mesmo nome sempre leva ao mesmo parâmetro.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Similaridade mínima (coeficiente de Dice dos trigramas) sem contenção entre os nomes
+MIN_SIMILARIDADE = 0.7
+
+# Tamanho mínimo do nome contido para contar como correspondência por contenção
+MIN_CONTIDO = 3
+
+# Quantidade máxima de buscas parciais memorizadas
+MAX_RESULTADOS = 10000
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(nome):
+    """Normaliza um nome de exame: sem acentos, minúsculo, só letras/dígitos separados por espaço"""
+    if not isinstance(nome, str):
+        return ''
+    nome = unicodedata.normalize('NFKD', nome)
+    nome = ''.join(c for c in nome if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', nome.casefold()).split())
+
+
+def _trigramas(nome):
+    nome = f" {nome} "
+    return {nome[i:i + 3] for i in range(len(nome) - 2)}
+
+
+class ParameterMatcher:
+    def __init__(self, referencias):
+        """
+        Args:
+            referencias (dict): Parâmetro normalizado (minúsculo) -> linha da base de referência
+        """
+        self.nomes = []          # nome canônico de cada parâmetro, na ordem da base
+        self._chaves = []        # nome normalizado de cada parâmetro
+        self._trigramas = []     # trigramas de cada parâmetro
+        self._exato = {}         # nome normalizado -> posição
+        self._indice = {}        # trigrama -> posições dos parâmetros que o contêm
+        self._resultados = {}    # memória das buscas parciais já feitas
+
+        for key, ref_data in referencias.items():
+            chave = normalize_name(key)
+            if not chave or chave in self._exato:
+                continue
+            posicao = len(self.nomes)
+            nome = ref_data.get('parametro', key)
+            self.nomes.append(nome if isinstance(nome, str) else key)
+            self._chaves.append(chave)
+            self._exato[chave] = posicao
+
+            trigramas = _trigramas(chave)
+            self._trigramas.append(len(trigramas))
+            for trigrama in trigramas:
+                self._indice.setdefault(trigrama, []).append(posicao)
+
+    def match_exact(self, nome):
+        """Nome canônico com o mesmo nome normalizado (ou None)"""
+        posicao = self._exato.get(normalize_name(nome))
+        return None if posicao is None else self.nomes[posicao]
+
+    def _best_partial(self, chave):
+        """Melhor correspondência parcial: (pontuação, -posição) ou None"""
+        if chave in self._resultados:
+            return self._resultados[chave]
+
+        trigramas = _trigramas(chave)
+        comuns = {}
+        for trigrama in trigramas:
+            for posicao in self._indice.get(trigrama, ()):
+                comuns[posicao] = comuns.get(posicao, 0) + 1
+
+        melhor = None
+        for posicao, n in comuns.items():
+            candidato = self._chaves[posicao]
+            similaridade = 2 * n / (len(trigramas) + self._trigramas[posicao])
+            curto, longo = sorted((chave, candidato), key=len)
+            # Contenção de um nome no outro tem prioridade sobre a similaridade;
+            # entre contidos, vence o que cobre a maior parte do nome mais longo
+            if len(curto) >= MIN_CONTIDO and curto in longo:
+                pontuacao = 1 + len(curto) / len(longo)
+            elif similaridade >= MIN_SIMILARIDADE:
+                pontuacao = similaridade
+            else:
+                continue
+            resultado = (pontuacao, -posicao)
+            if melhor is None or resultado > melhor:
+                melhor = resultado
+
+        if len(self._resultados) >= MAX_RESULTADOS:
+            self._resultados.clear()
+        self._resultados[chave] = melhor
+        return melhor
+
+    def match(self, *nomes):
+        """
+        Busca o parâmetro correspondente a um exame
+
+        Args:
+            *nomes (str): Nomes do exame em ordem de preferência (ex.: parameter_name, nome_original)
+
+        Returns:
+            str or None: Nome canônico do parâmetro na base de referência
+        """
+        chaves = [normalize_name(nome) for nome in nomes]
+
+        # Busca exata, na ordem dos nomes
+        for chave in chaves:
+            if chave in self._exato:
+                return self.nomes[self._exato[chave]]
+
+        # Correspondência parcial: melhor pontuação entre todos os nomes
+        melhor = None
+        for chave in chaves:
+            if not chave:
+                continue
+            resultado = self._best_partial(chave)
+            if resultado is not None and (melhor is None or resultado > melhor):
+                melhor = resultado
+
+        return None if melhor is None else self.nomes[-melhor[1]]
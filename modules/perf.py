@@ -0,0 +1,296 @@
+"""
+Instrumentação de desempenho por execução (rerun) para o Sistema Nutri Análises
+
+Desativada por padrão; NUTRI_PERF=1 ativa. Com ela ativa:
+
+- os métodos de E/S do DataManager, os métodos públicos do ExamAnalyzerV2 e
+  as funções de página decoradas com @page são cronometrados e contados;
+- as leituras de planilha (excel_cache.read_excel) e de SQL
+  (pd.read_sql_query) somam as linhas lidas;
+- os widgets criados são contados pelo contexto de execução do Streamlit.
+
+Cada execução do script (ou de um fragmento, que reexecuta apenas a sua
+função) gera um registro, exibido no painel show_panel() e acrescentado ao
+log JSON Lines NUTRI_PERF_LOG (padrão data/perf.jsonl), que é rotacionado
+ao passar de NUTRI_PERF_LOG_MB megabytes (padrão 5). O campo 'build'
+(NUTRI_BUILD ou o commit do git) permite comparar versões com
+tools/perf_report.
+
+Com a instrumentação desativada, page() devolve a própria função e as
+demais chamadas não fazem nada.
+"""
+
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ATIVO = os.environ.get('NUTRI_PERF', '0') == '1'
+
+# Métodos de E/S do DataManager cronometrados
+METODOS_DATA_MANAGER = [
+    'load_pacientes', 'get_paciente', 'save_paciente', 'load_exames', 'query_exames',
+    'get_resumo_exames', 'enqueue_exames', 'save_exames', 'flush_writes', 'get_referencias',
+    'get_artefato_referencias', 'get_indice_categorias', 'save_referencias', 'reclassify_exames'
+]
+
+_local = threading.local()
+_instalacao = threading.Lock()
+_instalado = False
+_log_lock = threading.Lock()
+
+
+def _log_file():
+    return os.environ.get(
+        'NUTRI_PERF_LOG',
+        os.path.join(os.environ.get('NUTRI_DATA_DIR', 'data'), 'perf.jsonl')
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def build():
+    """Identificação da versão em execução (NUTRI_BUILD ou commit atual do git)"""
+    if os.environ.get('NUTRI_BUILD'):
+        return os.environ['NUTRI_BUILD']
+    try:
+        processo = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return processo.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _widgets_registrados():
+    """Widgets já registrados na execução atual do Streamlit (None fora dela)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return len(ctx.shared.widget_ids_this_run.snapshot()) if ctx else None
+    except Exception:
+        return None
+
+
+def _registrar(nome, segundos, linhas=0, widgets=None):
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        return
+    chamada = execucao['chamadas'].setdefault(nome, {'n': 0, 'ms': 0.0, 'linhas': 0})
+    chamada['n'] += 1
+    chamada['ms'] += segundos * 1000
+    chamada['linhas'] += linhas
+    execucao['linhas_lidas'] += linhas
+    if widgets is not None:
+        chamada['widgets'] = chamada.get('widgets', 0) + widgets
+
+
+def _cronometrar(func, nome, leitura=False):
+    """Envolve func registrando tempo e chamadas (e linhas do DataFrame retornado, se leitura)"""
+    if getattr(func, '_perf_original', None) is not None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'execucao', None) is None:
+            return func(*args, **kwargs)
+        inicio = time.perf_counter()
+        resultado = None
+        try:
+            resultado = func(*args, **kwargs)
+            return resultado
+        finally:
+            linhas = len(resultado) if leitura and hasattr(resultado, 'columns') else 0
+            _registrar(nome, time.perf_counter() - inicio, linhas)
+
+    wrapper._perf_original = func
+    return wrapper
+
+
+def _instrumentar_classe(cls, metodos):
+    for metodo in metodos:
+        if metodo in vars(cls):
+            setattr(cls, metodo, _cronometrar(vars(cls)[metodo], f"{cls.__name__}.{metodo}"))
+
+
+def _metodos_publicos(cls):
+    return [nome for nome, attr in vars(cls).items() if not nome.startswith('_') and callable(attr)]
+
+
+def instrument(namespace=None):
+    """
+    Instala os cronômetros (uma vez por processo) e, se informado, nos nomes do namespace
+
+    O script da aplicação é reexecutado a cada interação e reimporta
+    read_excel no próprio namespace; por isso o app chama instrument(globals())
+    a cada execução.
+
+    Args:
+        namespace (dict): globals() do script da aplicação
+    """
+    global _instalado
+    if not ATIVO:
+        return
+
+    import pandas as pd
+    from modules import excel_cache
+    from modules.data_manager import DataManager
+    from modules.exam_analyzer_v2 import ExamAnalyzerV2
+
+    with _instalacao:
+        if not _instalado:
+            _instrumentar_classe(DataManager, METODOS_DATA_MANAGER)
+            _instrumentar_classe(ExamAnalyzerV2, _metodos_publicos(ExamAnalyzerV2))
+            pd.read_sql_query = _cronometrar(pd.read_sql_query, 'pd.read_sql_query', leitura=True)
+
+            # Módulos que importaram read_excel por nome
+            read_excel = _cronometrar(excel_cache.read_excel, 'read_excel', leitura=True)
+            for modulo in list(sys.modules.values()):
+                if getattr(modulo, 'read_excel', None) is excel_cache.read_excel and modulo is not excel_cache:
+                    modulo.read_excel = read_excel
+            _instalado = True
+
+    if namespace is not None and namespace.get('read_excel') is excel_cache.read_excel:
+        namespace['read_excel'] = _cronometrar(excel_cache.read_excel, 'read_excel', leitura=True)
+
+
+def page(func):
+    """
+    Decorador das funções de página (show_*): tempo, chamadas e widgets criados
+
+    Quando chamada fora de uma execução medida (reexecução de um fragmento),
+    a função abre a sua própria execução.
+    """
+    if not ATIVO:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'execucao', None) is None:
+            with rerun(func.__name__):
+                return wrapper(*args, **kwargs)
+        widgets_antes = _widgets_registrados()
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            widgets_depois = _widgets_registrados()
+            widgets = widgets_depois - widgets_antes if widgets_antes is not None and widgets_depois is not None else None
+            _registrar(func.__name__, time.perf_counter() - inicio, widgets=widgets)
+
+    return wrapper
+
+
+@contextmanager
+def rerun(rotulo='app'):
+    """
+    Mede uma execução do script; o registro fica em last_run() e no log
+
+    Args:
+        rotulo (str): Identificação da execução ('app' ou nome do fragmento)
+    """
+    if not ATIVO or getattr(_local, 'execucao', None) is not None:
+        yield None
+        return
+
+    execucao = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'build': build(),
+        'rotulo': rotulo,
+        'chamadas': {},
+        'linhas_lidas': 0,
+        'interrompida': False
+    }
+    widgets_antes = _widgets_registrados()
+    inicio = time.perf_counter()
+    _local.execucao = execucao
+    try:
+        yield execucao
+    except BaseException:
+        # st.rerun()/st.stop() encerram a execução por exceção
+        execucao['interrompida'] = True
+        raise
+    finally:
+        _local.execucao = None
+        execucao['total_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        widgets_depois = _widgets_registrados()
+        execucao['widgets'] = (
+            widgets_depois - widgets_antes
+            if widgets_antes is not None and widgets_depois is not None else None
+        )
+        for chamada in execucao['chamadas'].values():
+            chamada['ms'] = round(chamada['ms'], 2)
+        _local.ultima = execucao
+        _append_log(execucao)
+
+
+def last_run():
+    """Registro da última execução medida nesta thread (None se não houver)"""
+    return getattr(_local, 'ultima', None)
+
+
+def _append_log(execucao):
+    """Acrescenta a execução ao log, rotacionando-o pelo tamanho; falhas de gravação são ignoradas"""
+    log_file = _log_file()
+    limite = float(os.environ.get('NUTRI_PERF_LOG_MB', '5')) * 1024 * 1024
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            if os.path.exists(log_file) and os.path.getsize(log_file) > limite:
+                os.replace(log_file, f"{log_file}.1")
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(execucao, ensure_ascii=False) + '\n')
+    except OSError:
+        pass
+
+
+def read_log(log_file=None):
+    """
+    Lê o log de execuções (arquivo rotacionado primeiro)
+
+    Returns:
+        list: Registros de execução, do mais antigo ao mais recente
+    """
+    log_file = log_file or _log_file()
+    registros = []
+    for path in (f"{log_file}.1", log_file):
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue
+    return registros
+
+
+def show_panel(execucao=None):
+    """Painel recolhível com o detalhamento da última execução (não faz nada se desativado)"""
+    execucao = execucao or last_run()
+    if not ATIVO or execucao is None:
+        return
+
+    import pandas as pd
+    import streamlit as st
+
+    with st.expander(f"⏱️ Desempenho desta execução: {execucao['total_ms']:.0f} ms"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Tempo total", f"{execucao['total_ms']:.0f} ms")
+        col2.metric("Widgets criados", execucao['widgets'] if execucao['widgets'] is not None else "—")
+        col3.metric("Linhas lidas", execucao['linhas_lidas'])
+
+        if execucao['chamadas']:
+            df = pd.DataFrame([
+                {'Função': nome, 'Chamadas': c['n'], 'Tempo (ms)': c['ms'],
+                 'Linhas lidas': c['linhas'], 'Widgets': c.get('widgets')}
+                for nome, c in execucao['chamadas'].items()
+            ]).sort_values('Tempo (ms)', ascending=False)
+            st.dataframe(df, hide_index=True, use_container_width=True)
+        st.caption(f"Build {execucao['build'] or '—'} · log em {_log_file()} · reexecuções de fragmentos vão apenas para o log")
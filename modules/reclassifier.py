@@ -0,0 +1,71 @@
+"""
+Reclassificação dos exames gravados após alteração dos valores de referência
+
+O status de cada exame é gravado no momento do salvamento. Quando a base de
+referência muda, as tabelas compiladas antiga e nova são comparadas por
+parâmetro e sexo, e apenas os exames gravados dessas combinações são
+reclassificados (em lote) e regravados pelo backend em uma única operação
+atômica.
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.exam_analyzer import STATUS_LABELS_V1
+from modules.reference_table import CompiledReferenceTable, status_labels
+
+
+def referencias_por_parametro(df_referencias):
+    """Base de referência indexada pelo parâmetro normalizado (minúsculo)"""
+    referencias = {}
+    for _, row in df_referencias.iterrows():
+        param = str(row['parametro']).lower().strip()
+        referencias[param] = row.to_dict()
+    return referencias
+
+
+def reclassify_exames(backend, referencias_antigas, referencias_novas):
+    """
+    Reclassifica os exames afetados pela alteração da base de referência
+
+    Args:
+        backend: Backend de armazenamento (ExcelBackend ou SQLiteBackend)
+        referencias_antigas (dict): Base anterior ({} = reclassificar todos os parâmetros)
+        referencias_novas (dict): Base atual
+
+    Returns:
+        dict: {'parametros': parâmetros alterados, 'avaliados': exames reavaliados,
+               'alterados': exames cujo status mudou}
+    """
+    anterior = CompiledReferenceTable(referencias_antigas)
+    nova = CompiledReferenceTable(referencias_novas)
+    alterados = nova.changed(anterior)
+    relatorio = {'parametros': sorted(alterados), 'avaliados': 0, 'alterados': 0}
+    if not alterados:
+        return relatorio
+
+    pacientes = backend.load_pacientes()
+    sexos = pd.Series(pacientes['sexo'].to_numpy(), index=pacientes['id'].astype(int))
+
+    def reclassificar(df):
+        """Novo status das linhas cujo status mudou (índice = linhas de df)"""
+        # Exames sem paciente cadastrado mantêm o status gravado
+        sexo = df['id_paciente'].map(sexos)
+        df, sexo = df[sexo.notna()], sexo[sexo.notna()].to_numpy()
+
+        afetadas = nova.changed_rows(anterior, df['parametro'].to_numpy(), sexo)
+        df, sexo = df[afetadas], sexo[afetadas]
+        relatorio['avaliados'] = len(df)
+
+        codes = nova.classify(df['parametro'].to_numpy(), df['valor'].to_numpy(), sexo)
+        atual = df['status'].to_numpy(dtype=object)
+        # Exames salvos pela versão 1 mantêm o vocabulário dela ('Fora')
+        novo = np.where(atual == 'Fora', STATUS_LABELS_V1[codes], status_labels(codes))
+
+        mudou = np.array([
+            not (pd.isna(a) and pd.isna(b)) and a != b for a, b in zip(atual, novo)
+        ], dtype=bool)
+        return pd.Series(novo[mudou], index=df.index[mudou], dtype=object)
+
+    relatorio['alterados'] = backend.reclassify_exames(set(alterados), reclassificar)
+    return relatorio
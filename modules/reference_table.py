@@ -0,0 +1,284 @@
+"""
+Tabela de referência compilada para classificação vetorizada de exames
+
+Os limites ideal/referência de cada parâmetro e sexo são compilados em um
+array NumPy (parâmetro x sexo x limite), e os nomes de parâmetro em um índice
+inteiro. classify() classifica arrays inteiros em uma única passada e devolve
+códigos de status equivalentes ao resultado de ExamAnalyzerV2.classify_exam.
+
+CategoryIndex agrupa a mesma base por categoria, para as abas de inserção.
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+# Códigos de status (ordem = prioridade de avaliação de classify_exam)
+STATUS_NAO_ENCONTRADO = 0
+STATUS_SEM_REFERENCIA = 1
+STATUS_VALOR_INVALIDO = 2
+STATUS_IDEAL = 3
+STATUS_REFERENCIA = 4
+STATUS_ABAIXO = 5
+STATUS_ACIMA = 6
+STATUS_SEM_CLASSIFICACAO = 7  # classify_exam retorna None (ex.: faixa só com mínimo)
+
+# Resultado de classify_exam para cada código
+STATUS_INFO = [
+    {'status': 'Não encontrado', 'color': '#6C757D', 'icon': '❓'},
+    {'status': 'Sem referência', 'color': '#6C757D', 'icon': '—'},
+    {'status': 'Valor inválido', 'color': '#6C757D', 'icon': '⚠️'},
+    {'status': 'Ideal', 'color': '#D4EDDA', 'icon': '✅'},
+    {'status': 'Referência', 'color': '#FFF3CD', 'icon': '☑️'},
+    {'status': 'Abaixo da Referência', 'color': '#F8D7DA', 'icon': '⬇️'},
+    {'status': 'Acima da Referência', 'color': '#F8D7DA', 'icon': '⬆️'},
+    None
+]
+
+STATUS_LABELS = np.array([info['status'] if info else None for info in STATUS_INFO], dtype=object)
+
+SEXOS = ('homem', 'mulher')
+LIMITES = ('valor_ideal_{}_min', 'valor_ideal_{}_max', 'valor_ref_{}_min', 'valor_ref_{}_max')
+
+
+class CompiledReferenceTable:
+    def __init__(self, referencias):
+        """
+        Args:
+            referencias (dict): Parâmetro normalizado (minúsculo) -> linha da base de referência
+        """
+        self._referencias = referencias
+        self.keys = list(referencias.keys())
+        self.index = {key: i for i, key in enumerate(self.keys)}
+
+        # bounds[p, s, :] = ideal_min, ideal_max, ref_min, ref_max (NaN = ausente)
+        self.bounds = np.full((len(self.keys), len(SEXOS), len(LIMITES)), np.nan)
+        # Limites não numéricos: essas combinações são classificadas pelo método escalar
+        self.scalar_only = np.zeros((len(self.keys), len(SEXOS)), dtype=bool)
+
+        for p, key in enumerate(self.keys):
+            ref_data = referencias[key]
+            for s, sexo in enumerate(SEXOS):
+                for b, limite in enumerate(LIMITES):
+                    valor = ref_data.get(limite.format(sexo))
+                    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+                        continue
+                    if isinstance(valor, (int, float, np.number)) and not isinstance(valor, bool):
+                        self.bounds[p, s, b] = valor
+                    else:
+                        self.scalar_only[p, s] = True
+
+    def param_indices(self, parametros):
+        """Índice inteiro de cada parâmetro (-1 = não encontrado)"""
+        # Normaliza apenas os nomes distintos (poucos, mesmo com muitas linhas)
+        codigos, nomes = pd.factorize(np.asarray(parametros, dtype=object))
+        indices = np.array([
+            self.index.get(nome.lower().strip(), -1) if isinstance(nome, str) else -1
+            for nome in nomes
+        ], dtype=np.int64)
+        return np.where(codigos >= 0, indices[codigos] if len(indices) else -1, -1)
+
+    def classify(self, parametros, valores, sexos):
+        """
+        Classifica exames em uma única passada vetorizada
+
+        Args:
+            parametros (array-like): Nomes dos parâmetros
+            valores (array-like): Valores dos exames
+            sexos (str or array-like): Sexo de cada exame ('M' ou 'F') ou um único sexo para todos
+
+        Returns:
+            np.ndarray: Códigos de status (int8), ver STATUS_*
+        """
+        p = self.param_indices(parametros)
+        n = len(p)
+        s = _sex_indices(sexos, n)
+
+        valores_brutos = valores
+        v, invalido = _to_float(valores)
+
+        encontrado = p >= 0
+        limites = self.bounds[np.where(encontrado, p, 0), s] if len(self.keys) else np.full((n, 4), np.nan)
+        ideal_min, ideal_max, ref_min, ref_max = limites.T
+        tem = ~np.isnan(limites)
+
+        with np.errstate(invalid='ignore'):
+            ideal = tem[:, 0] & tem[:, 1] & (ideal_min <= v) & (v <= ideal_max)
+            referencia = tem[:, 2] & tem[:, 3] & (ref_min <= v) & (v <= ref_max)
+            abaixo = tem[:, 2] & (v < ref_min)
+            acima = tem[:, 3] & (v > ref_max)
+
+        codes = np.select(
+            [~encontrado, ~tem.any(axis=1), invalido, ideal, referencia, abaixo, acima],
+            [STATUS_NAO_ENCONTRADO, STATUS_SEM_REFERENCIA, STATUS_VALOR_INVALIDO,
+             STATUS_IDEAL, STATUS_REFERENCIA, STATUS_ABAIXO, STATUS_ACIMA],
+            default=STATUS_SEM_CLASSIFICACAO
+        ).astype(np.int8)
+
+        # Limites não numéricos: classificação escalar exata
+        escalar = np.flatnonzero(encontrado & self.scalar_only[np.where(encontrado, p, 0), s])
+        if len(escalar):
+            valores_originais = np.asarray(valores_brutos, dtype=object)
+            for i in escalar:
+                codes[i] = self._classify_scalar(p[i], s[i], valores_originais[i])
+
+        return codes
+
+    def scalar_rows(self, parametros, sexos):
+        """Posições das linhas cujos limites não são numéricos (classificadas pela lógica escalar)"""
+        p = self.param_indices(parametros)
+        s = _sex_indices(sexos, len(p))
+        encontrado = p >= 0
+        return np.flatnonzero(encontrado & self.scalar_only[np.where(encontrado, p, 0), s])
+
+    def changed(self, anterior):
+        """
+        Parâmetros cuja classificação pode ter mudado em relação a outra tabela
+
+        Args:
+            anterior (CompiledReferenceTable): Tabela antes da alteração da base
+
+        Returns:
+            dict: Parâmetro normalizado -> array bool (homem, mulher) dos sexos alterados
+        """
+        alterados = {}
+        for key in set(self.keys) | set(anterior.keys):
+            if key not in self.index or key not in anterior.index:
+                # Parâmetro incluído ou removido: muda para ambos os sexos
+                alterados[key] = np.ones(len(SEXOS), dtype=bool)
+                continue
+
+            p, q = self.index[key], anterior.index[key]
+            mudou = (
+                ~_bounds_equal(self.bounds[p], anterior.bounds[q])
+                | (self.scalar_only[p] != anterior.scalar_only[q])
+            )
+            # Limites não numéricos só são comparáveis pelos valores originais
+            for s in np.flatnonzero(self.scalar_only[p] & ~mudou):
+                mudou[s] = not all(
+                    _same_value(self._referencias[key].get(limite.format(SEXOS[s])),
+                                anterior._referencias[key].get(limite.format(SEXOS[s])))
+                    for limite in LIMITES
+                )
+            if mudou.any():
+                alterados[key] = mudou
+        return alterados
+
+    def changed_rows(self, anterior, parametros, sexos):
+        """Máscara das linhas (parâmetro, sexo) cuja classificação pode ter mudado em relação à tabela anterior"""
+        alterados = self.changed(anterior)
+        codigos, nomes = pd.factorize(np.asarray(parametros, dtype=object))
+        n = len(codigos)
+        if not alterados or not len(nomes):
+            return np.zeros(n, dtype=bool)
+
+        sem_alteracao = np.zeros(len(SEXOS), dtype=bool)
+        por_nome = np.array([
+            alterados.get(nome.lower().strip(), sem_alteracao) if isinstance(nome, str) else sem_alteracao
+            for nome in nomes
+        ])
+        s = _sex_indices(sexos, n)
+        return (codigos >= 0) & por_nome[np.maximum(codigos, 0), s]
+
+    def _classify_scalar(self, p, s, valor):
+        """Mesma lógica de classify_exam para limites não numéricos (comparações podem falhar)"""
+        ref_data = self._referencias[self.keys[p]]
+        ideal_min, ideal_max, ref_min, ref_max = (ref_data.get(limite.format(SEXOS[s])) for limite in LIMITES)
+
+        if pd.isna(ideal_min) and pd.isna(ideal_max) and pd.isna(ref_min) and pd.isna(ref_max):
+            return STATUS_SEM_REFERENCIA
+        try:
+            valor = float(valor)
+            if not pd.isna(ideal_min) and not pd.isna(ideal_max) and ideal_min <= valor <= ideal_max:
+                return STATUS_IDEAL
+            if not pd.isna(ref_min) and not pd.isna(ref_max) and ref_min <= valor <= ref_max:
+                return STATUS_REFERENCIA
+            if not pd.isna(ref_min) and valor < ref_min:
+                return STATUS_ABAIXO
+            if not pd.isna(ref_max) and valor > ref_max:
+                return STATUS_ACIMA
+        except (ValueError, TypeError):
+            return STATUS_VALOR_INVALIDO
+        return STATUS_SEM_CLASSIFICACAO
+
+
+class CategoryIndex:
+    """Índice imutável categoria -> parâmetros (na ordem da planilha de referência)"""
+
+    def __init__(self, df_referencias):
+        """
+        Args:
+            df_referencias (pd.DataFrame): Base de valores de referência
+        """
+        grupos = {}
+        for row in df_referencias.to_dict('records'):
+            categoria = row.get('categoria')
+            if categoria is None or pd.isna(categoria):
+                continue
+            registro = {
+                'parametro': row['parametro'],
+                'unidade': row['unidade_medida'],
+                **{limite.format(sexo): row.get(limite.format(sexo)) for sexo in SEXOS for limite in LIMITES},
+                'observacao': row.get('observacao', '')
+            }
+            grupos.setdefault(categoria, []).append(MappingProxyType(registro))
+
+        self.categorias = tuple(sorted(grupos))
+        self._parametros = MappingProxyType({categoria: tuple(registros) for categoria, registros in grupos.items()})
+
+    def parametros(self, categoria):
+        """Parâmetros da categoria (tupla vazia se não existir)"""
+        return self._parametros.get(categoria, ())
+
+
+def _sex_indices(sexos, n):
+    """Índice do sexo de cada linha: 0 = homem ('M'), 1 = mulher (demais valores)"""
+    if isinstance(sexos, str):
+        return np.full(n, 0 if sexos.upper() == 'M' else 1, dtype=np.int64)
+    codigos, distintos = pd.factorize(np.asarray(sexos, dtype=object))
+    masculino = np.array([isinstance(x, str) and x.upper() == 'M' for x in distintos], dtype=bool)
+    if not len(masculino):
+        return np.ones(n, dtype=np.int64)
+    return np.where((codigos >= 0) & masculino[np.maximum(codigos, 0)], 0, 1)
+
+
+def _to_float(valores):
+    """Converte valores exatamente como float(valor), marcando os que não convertem"""
+    arr = np.asarray(valores)
+    if arr.dtype.kind in 'biuf':
+        return arr.astype(np.float64), np.zeros(len(arr), dtype=bool)
+
+    # Texto/objetos: float() elemento a elemento (astype trataria None como NaN)
+    arr = np.asarray(valores, dtype=object)
+    v = np.empty(len(arr), dtype=np.float64)
+    invalido = np.zeros(len(arr), dtype=bool)
+    for i, valor in enumerate(arr):
+        try:
+            v[i] = float(valor)
+        except (ValueError, TypeError):
+            v[i] = np.nan
+            invalido[i] = True
+    return v, invalido
+
+
+def status_labels(codes):
+    """Converte códigos em textos de status (None para STATUS_SEM_CLASSIFICACAO)"""
+    return STATUS_LABELS[codes]
+
+
+def _bounds_equal(a, b):
+    """Igualdade dos limites por sexo (NaN = NaN)"""
+    return ((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=-1)
+
+
+def _same_value(a, b):
+    """Igualdade de valores da planilha (ausentes são iguais entre si)"""
+    ausente_a = a is None or (not isinstance(a, str) and pd.isna(a))
+    ausente_b = b is None or (not isinstance(b, str) and pd.isna(b))
+    if ausente_a or ausente_b:
+        return ausente_a and ausente_b
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
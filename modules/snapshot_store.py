@@ -0,0 +1,300 @@
+"""
+Histórico de versões (snapshots) da base de referência do Sistema Nutri Análises
+
+Cada snapshot é uma cópia byte a byte da planilha, comprimida com gzip e
+endereçada pelo hash SHA-256 do conteúdo (objects/<sha256>.gz): versões
+iguais ocupam um único objeto, e salvar a base sem alterá-la não cria nada
+(o hash é comparado com o do último snapshot). Como o .xlsx é um zip que
+guarda a data de gravação em docProps/core.xml, o hash considera apenas os
+demais arquivos internos: a mesma planilha gravada duas vezes tem o mesmo
+hash. O manifest.json lista os snapshots em ordem, com id sequencial e
+data/hora com microssegundos, de modo que dois salvamentos no mesmo minuto
+não colidem.
+
+A retenção mantém os últimos `manter_ultimos` snapshots e o último de cada
+um dos `manter_dias` dias mais recentes; objetos que nenhum snapshot
+referencia são apagados, o que limita o espaço em disco.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import uuid
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from modules.concurrency import FileLock
+from modules.data_cache import shared_cache
+
+MANTER_ULTIMOS = 20
+MANTER_DIAS = 30
+
+
+# Metadados do .xlsx que mudam a cada gravação sem mudar os dados
+_IGNORADOS_NO_HASH = {'docProps/core.xml'}
+
+
+class SnapshotNaoEncontradoError(KeyError):
+    """Id de snapshot inexistente no manifesto"""
+
+
+def content_hash(conteudo):
+    """
+    Hash SHA-256 do conteúdo de um arquivo, ignorando os metadados de gravação do .xlsx
+
+    Args:
+        conteudo (bytes): Conteúdo do arquivo
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    if not zipfile.is_zipfile(io.BytesIO(conteudo)):
+        return hashlib.sha256(conteudo).hexdigest()
+
+    sha256 = hashlib.sha256()
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        for nome in sorted(arquivo.namelist()):
+            if nome in _IGNORADOS_NO_HASH:
+                continue
+            sha256.update(nome.encode('utf-8') + b'\0')
+            sha256.update(arquivo.read(nome))
+    return sha256.hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, directory, manter_ultimos=MANTER_ULTIMOS, manter_dias=MANTER_DIAS):
+        """
+        Args:
+            directory (str): Pasta do histórico (manifest.json e objects/)
+            manter_ultimos (int): Quantidade de snapshots recentes sempre mantidos
+            manter_dias (int): Quantidade de dias com um snapshot diário mantido
+        """
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.manifest_file = os.path.join(directory, 'manifest.json')
+        self.manter_ultimos = manter_ultimos
+        self.manter_dias = manter_dias
+        self._lock = FileLock(os.path.join(directory, 'manifest.lock'))
+
+    def _object_file(self, sha256):
+        return os.path.join(self.objects_dir, f"{sha256}.gz")
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_file):
+            return {'proximo_id': 1, 'snapshots': []}
+        with open(self.manifest_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_file)
+
+    def _write_object(self, sha256, conteudo):
+        """Grava o objeto comprimido, se ainda não existir; retorna o tamanho em disco"""
+        object_file = self._object_file(sha256)
+        if not os.path.exists(object_file):
+            tmp_file = f"{object_file}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(tmp_file, 'wb') as f:
+                    f.write(gzip.compress(conteudo, mtime=0))
+                os.replace(tmp_file, object_file)
+            finally:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+        return os.path.getsize(object_file)
+
+    def snapshot(self, path, motivo='', criado_em=None):
+        """
+        Registra o conteúdo atual de um arquivo no histórico
+
+        Args:
+            path (str): Arquivo a copiar (planilha de referência)
+            motivo (str): Descrição do snapshot (ex.: 'antes de salvar')
+            criado_em (datetime): Data/hora registrada (padrão: agora)
+
+        Returns:
+            tuple: (snapshot, criado) - criado=False se o conteúdo é igual ao do último snapshot
+        """
+        with open(path, 'rb') as f:
+            conteudo = f.read()
+        sha256 = content_hash(conteudo)
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with self._lock:
+            manifest = self._read_manifest()
+            snapshots = manifest['snapshots']
+            if snapshots and snapshots[-1]['sha256'] == sha256:
+                return snapshots[-1], False
+
+            tamanho_comprimido = self._write_object(sha256, conteudo)
+            snapshot = {
+                'id': manifest['proximo_id'],
+                'sha256': sha256,
+                'criado_em': (criado_em or datetime.now()).isoformat(timespec='microseconds'),
+                'tamanho': len(conteudo),
+                'tamanho_comprimido': tamanho_comprimido,
+                'origem': os.path.basename(path),
+                'motivo': motivo
+            }
+            manifest['proximo_id'] += 1
+            snapshots.append(snapshot)
+            snapshots.sort(key=lambda s: (s['criado_em'], s['id']))
+            self._apply_retention(manifest)
+            self._write_manifest(manifest)
+        return snapshot, True
+
+    def _apply_retention(self, manifest):
+        """Remove do manifesto os snapshots fora da política e apaga objetos órfãos"""
+        snapshots = manifest['snapshots']
+        manter = {s['id'] for s in snapshots[-self.manter_ultimos:]} if self.manter_ultimos else set()
+
+        # Último snapshot de cada um dos dias mais recentes
+        por_dia = {}
+        for s in snapshots:
+            por_dia[s['criado_em'][:10]] = s['id']
+        for dia in sorted(por_dia)[-self.manter_dias:] if self.manter_dias else []:
+            manter.add(por_dia[dia])
+
+        manifest['snapshots'] = [s for s in snapshots if s['id'] in manter]
+        referenciados = {s['sha256'] for s in manifest['snapshots']}
+        for s in snapshots:
+            if s['sha256'] not in referenciados and os.path.exists(self._object_file(s['sha256'])):
+                os.remove(self._object_file(s['sha256']))
+                referenciados.add(s['sha256'])
+
+    def prune(self):
+        """
+        Aplica a política de retenção sem criar snapshot
+
+        Returns:
+            int: Quantidade de snapshots removidos
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with self._lock:
+            manifest = self._read_manifest()
+            antes = len(manifest['snapshots'])
+            self._apply_retention(manifest)
+            self._write_manifest(manifest)
+        return antes - len(manifest['snapshots'])
+
+    def list(self):
+        """Snapshots do histórico, do mais antigo ao mais recente"""
+        return self._read_manifest()['snapshots']
+
+    def get(self, snapshot_id):
+        """Entrada do manifesto de um snapshot"""
+        for snapshot in self.list():
+            if snapshot['id'] == int(snapshot_id):
+                return snapshot
+        raise SnapshotNaoEncontradoError(snapshot_id)
+
+    def read(self, snapshot_id):
+        """Conteúdo original (bytes) de um snapshot"""
+        snapshot = self.get(snapshot_id)
+        with open(self._object_file(snapshot['sha256']), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def load(self, snapshot_id):
+        """Planilha de um snapshot como DataFrame (objetos são imutáveis: o parse fica em cache)"""
+        sha256 = self.get(snapshot_id)['sha256']
+        return shared_cache.get(
+            ('snapshots', self.directory, sha256),
+            sha256,
+            lambda: pd.read_excel(io.BytesIO(self.read(snapshot_id)))
+        )
+
+    def restore(self, snapshot_id, path, motivo='antes de restaurar'):
+        """
+        Restaura um snapshot sobre o arquivo, registrando antes o conteúdo atual
+
+        Args:
+            snapshot_id (int): Snapshot a restaurar
+            path (str): Arquivo de destino
+            motivo (str): Motivo do snapshot do conteúdo substituído
+
+        Returns:
+            dict: Snapshot restaurado
+        """
+        snapshot = self.get(snapshot_id)
+        conteudo = self.read(snapshot_id)
+        if os.path.exists(path):
+            self.snapshot(path, motivo=motivo)
+
+        tmp_file = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(conteudo)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, path)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return snapshot
+
+    def stats(self):
+        """
+        Uso de disco do histórico
+
+        Returns:
+            dict: {'snapshots', 'objetos', 'tamanho_original', 'tamanho_em_disco'}
+        """
+        snapshots = self.list()
+        objetos = {s['sha256']: s for s in snapshots}
+        return {
+            'snapshots': len(snapshots),
+            'objetos': len(objetos),
+            'tamanho_original': sum(s['tamanho'] for s in snapshots),
+            'tamanho_em_disco': sum(s['tamanho_comprimido'] for s in objetos.values())
+        }
+
+
+def diff_referencias(df_antes, df_depois, chave='parametro'):
+    """
+    Diferenças célula a célula entre duas versões da base de referência
+
+    Args:
+        df_antes (pd.DataFrame): Versão anterior
+        df_depois (pd.DataFrame): Versão posterior
+        chave (str): Coluna que identifica cada linha
+
+    Returns:
+        pd.DataFrame: Colunas parametro, campo, antes, depois ('(incluído)'/'(removido)'
+            em campo para linhas que existem em apenas uma das versões)
+    """
+    def indexar(df):
+        df = df.copy()
+        df.index = df[chave].astype(str).str.lower().str.strip()
+        return df[~df.index.duplicated(keep='last')]
+
+    antes, depois = indexar(df_antes), indexar(df_depois)
+    linhas = []
+    for param in antes.index.difference(depois.index):
+        linhas.append({'parametro': antes.at[param, chave], 'campo': '(removido)', 'antes': None, 'depois': None})
+    for param in depois.index.difference(antes.index):
+        linhas.append({'parametro': depois.at[param, chave], 'campo': '(incluído)', 'antes': None, 'depois': None})
+
+    colunas = [c for c in depois.columns if c in antes.columns and c != chave]
+    comuns = antes.index.intersection(depois.index, sort=False)
+    for param in comuns:
+        for coluna in colunas:
+            valor_antes, valor_depois = antes.at[param, coluna], depois.at[param, coluna]
+            if pd.isna(valor_antes) and pd.isna(valor_depois):
+                continue
+            if pd.isna(valor_antes) or pd.isna(valor_depois) or valor_antes != valor_depois:
+                linhas.append({'parametro': depois.at[param, chave], 'campo': coluna,
+                               'antes': valor_antes, 'depois': valor_depois})
+    for coluna in depois.columns.difference(antes.columns):
+        linhas.append({'parametro': None, 'campo': f"{coluna} (coluna incluída)", 'antes': None, 'depois': None})
+    for coluna in antes.columns.difference(depois.columns):
+        linhas.append({'parametro': None, 'campo': f"{coluna} (coluna removida)", 'antes': None, 'depois': None})
+
+    return pd.DataFrame(linhas, columns=['parametro', 'campo', 'antes', 'depois'])
@@ -0,0 +1,333 @@
+"""
+Backend de armazenamento SQLite para o Sistema Nutri Análises
+
+Pacientes e exames ficam em data/nutri.db, com índices em id_paciente,
+parametro e data_coleta. Na primeira abertura o banco é populado a partir
+das planilhas existentes.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from modules.concurrency import ConflitoVersaoError
+from modules.data_cache import shared_cache
+from modules.exam_store import AppendOnlyExamStore, COLUNAS_EXAMES, parse_order_by
+from modules.excel_backend import COLUNAS_PACIENTES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pacientes (
+    id INTEGER PRIMARY KEY,
+    nome TEXT,
+    sexo TEXT,
+    idade INTEGER,
+    peso_kg REAL,
+    altura_m REAL,
+    data_cadastro TEXT,
+    notas TEXT,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS exames (
+    id_exame INTEGER,
+    id_paciente INTEGER,
+    parametro TEXT,
+    valor REAL,
+    unidade TEXT,
+    data_coleta TEXT,
+    status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    nome TEXT PRIMARY KEY,
+    ultimo INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS versoes (
+    chave TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_exames_id_paciente ON exames (id_paciente);
+CREATE INDEX IF NOT EXISTS idx_exames_parametro ON exames (parametro);
+CREATE INDEX IF NOT EXISTS idx_exames_data_coleta ON exames (data_coleta);
+"""
+
+# Tabela/coluna usadas para semear cada sequência de IDs
+SEQUENCE_SOURCES = {
+    'pacientes': ('pacientes', 'id'),
+    'exames': ('exames', 'id_exame')
+}
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, data_dir, db_file=None):
+        self.data_dir = data_dir
+        self.db_file = db_file or os.path.join(data_dir, "nutri.db")
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        novo_banco = not os.path.exists(self.db_file)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+            # Bancos criados antes do controle de versão
+            colunas = [row[1] for row in conn.execute("PRAGMA table_info(pacientes)")]
+            if 'versao' not in colunas:
+                conn.execute("ALTER TABLE pacientes ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+
+        if novo_banco:
+            self._import_excel()
+
+    @contextmanager
+    def _connect(self):
+        """Abre uma conexão por operação (o DataManager é compartilhado entre sessões)"""
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _import_excel(self):
+        """Popula o banco a partir de pacientes.xlsx e exames.xlsx, se existirem"""
+        pacientes_file = os.path.join(self.data_dir, "pacientes.xlsx")
+        exames_file = os.path.join(self.data_dir, "exames.xlsx")
+
+        with self._connect() as conn:
+            if os.path.exists(pacientes_file):
+                df_pacientes = pd.read_excel(pacientes_file).reindex(columns=COLUNAS_PACIENTES)
+                df_pacientes['versao'] = df_pacientes['versao'].fillna(0).astype(int)
+                df_pacientes.to_sql('pacientes', conn, if_exists='append', index=False)
+
+            if os.path.exists(exames_file):
+                df_exames = AppendOnlyExamStore(exames_file).load().reindex(columns=COLUNAS_EXAMES)
+                df_exames.to_sql('exames', conn, if_exists='append', index=False)
+
+    def _versoes(self, *chaves):
+        """Versões gravadas das chaves (incrementadas na mesma transação de cada escrita)"""
+        with self._connect() as conn:
+            gravadas = dict(conn.execute(
+                f"SELECT chave, versao FROM versoes WHERE chave IN ({', '.join('?' * len(chaves))})", chaves
+            ))
+        return tuple(gravadas.get(chave, 0) for chave in chaves)
+
+    def _bump_versoes(self, conn, chaves):
+        conn.executemany(
+            "INSERT INTO versoes (chave, versao) VALUES (?, 1) "
+            "ON CONFLICT (chave) DO UPDATE SET versao = versao + 1",
+            [(chave,) for chave in chaves]
+        )
+
+    def pacientes_version(self):
+        return self._versoes('pacientes')
+
+    def exames_version(self, id_paciente=None):
+        """Versão de todos os exames ou só dos exames de um paciente"""
+        return self._versoes('exames' if id_paciente is None else f"exames:{int(id_paciente)}")
+
+    def reserve_ids(self, nome, quantidade=1):
+        """Reserva uma faixa contígua de IDs na tabela sequences"""
+        if quantidade < 1:
+            raise ValueError("Quantidade de IDs deve ser positiva")
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._reserve_ids(conn, nome, quantidade)
+
+    def _reserve_ids(self, conn, nome, quantidade):
+        row = conn.execute("SELECT ultimo FROM sequences WHERE nome = ?", (nome,)).fetchone()
+        if row is None:
+            # Primeira reserva: semear com o maior ID existente
+            tabela, coluna = SEQUENCE_SOURCES[nome]
+            ultimo = conn.execute(f"SELECT COALESCE(MAX({coluna}), 0) FROM {tabela}").fetchone()[0]
+            conn.execute("INSERT INTO sequences (nome, ultimo) VALUES (?, ?)", (nome, ultimo))
+        else:
+            ultimo = row[0]
+
+        conn.execute("UPDATE sequences SET ultimo = ? WHERE nome = ?", (ultimo + quantidade, nome))
+        return range(ultimo + 1, ultimo + 1 + quantidade)
+
+    def load_pacientes(self):
+        def loader():
+            with self._connect() as conn:
+                return pd.read_sql_query("SELECT * FROM pacientes ORDER BY id", conn)
+
+        return shared_cache.get(('pacientes', self.db_file), self.pacientes_version(), loader)
+
+    def save_paciente(self, paciente_data):
+        """
+        Insere ou atualiza um paciente com controle otimista de versão
+
+        Se paciente_data traz 'versao', a atualização só é aceita quando ela
+        coincide com a versão gravada; caso contrário ConflitoVersaoError.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existente = None
+            if paciente_data.get('id') is not None:
+                existente = conn.execute(
+                    "SELECT versao FROM pacientes WHERE id = ?", (int(paciente_data['id']),)
+                ).fetchone()
+
+            if existente:
+                versao_atual = existente[0]
+                versao_lida = paciente_data.get('versao')
+                if versao_lida is not None and not pd.isna(versao_lida) and int(versao_lida) != versao_atual:
+                    raise ConflitoVersaoError(
+                        f"Paciente {paciente_data['id']} alterado em outra sessão "
+                        f"(versão {versao_lida}, atual {versao_atual})"
+                    )
+                paciente_data['versao'] = versao_atual + 1
+
+                # Atualizar paciente existente
+                campos = [c for c in COLUNAS_PACIENTES if c != 'id' and c in paciente_data]
+                conn.execute(
+                    f"UPDATE pacientes SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?",
+                    [_to_sql(paciente_data[c]) for c in campos] + [int(paciente_data['id'])]
+                )
+            else:
+                # Novo paciente
+                paciente_data['id'] = self._reserve_ids(conn, 'pacientes', 1)[0]
+                paciente_data['data_cadastro'] = datetime.now().strftime('%Y-%m-%d')
+                paciente_data['versao'] = 1
+                campos = [c for c in COLUNAS_PACIENTES if c in paciente_data]
+                conn.execute(
+                    f"INSERT INTO pacientes ({', '.join(campos)}) VALUES ({', '.join('?' * len(campos))})",
+                    [_to_sql(paciente_data[c]) for c in campos]
+                )
+
+            self._bump_versoes(conn, ['pacientes'])
+
+        return paciente_data
+
+    def load_exames(self, id_paciente=None):
+        def loader():
+            with self._connect() as conn:
+                if id_paciente is None:
+                    return pd.read_sql_query("SELECT * FROM exames", conn)
+                return pd.read_sql_query(
+                    "SELECT * FROM exames WHERE id_paciente = ?", conn, params=(int(id_paciente),)
+                )
+
+        # Cada paciente tem sua versão: gravar exames de um não descarta o cache dos demais
+        return shared_cache.get(('exames', self.db_file, id_paciente), self.exames_version(id_paciente), loader)
+
+    def query_exames(self, id_paciente, parametros=None, date_from=None, date_to=None,
+                     status_in=None, status_not_in=None, limit=None, order_by=None):
+        condicoes = ["id_paciente = ?"]
+        params = [int(id_paciente)]
+
+        if parametros is not None:
+            condicoes.append(f"parametro IN ({', '.join('?' * len(parametros))})")
+            params.extend(parametros)
+        if date_from is not None:
+            condicoes.append("data_coleta >= ?")
+            params.append(pd.Timestamp(date_from).strftime('%Y-%m-%d'))
+        if date_to is not None:
+            # Limite exclusivo no dia seguinte: cobre datas gravadas com horário
+            condicoes.append("data_coleta < ?")
+            params.append((pd.Timestamp(date_to) + timedelta(days=1)).strftime('%Y-%m-%d'))
+        if status_in is not None:
+            condicoes.append(f"status IN ({', '.join('?' * len(status_in))})")
+            params.extend(status_in)
+        if status_not_in is not None:
+            # Exames sem status (NULL) continuam incluídos, como em pandas
+            condicoes.append(f"(status IS NULL OR status NOT IN ({', '.join('?' * len(status_not_in))}))")
+            params.extend(status_not_in)
+
+        sql = f"SELECT * FROM exames WHERE {' AND '.join(condicoes)}"
+
+        ordem = parse_order_by(order_by)
+        if ordem:
+            sql += " ORDER BY " + ", ".join(
+                f"{coluna} {'ASC' if ascendente else 'DESC'}" for coluna, ascendente in ordem
+            )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def resumo_exames(self, id_paciente):
+        with self._connect() as conn:
+            total, data_min, data_max = conn.execute(
+                "SELECT COUNT(*), MIN(data_coleta), MAX(data_coleta) FROM exames WHERE id_paciente = ?",
+                (int(id_paciente),)
+            ).fetchone()
+            parametros = [row[0] for row in conn.execute(
+                "SELECT DISTINCT parametro FROM exames WHERE id_paciente = ? AND parametro IS NOT NULL ORDER BY parametro",
+                (int(id_paciente),)
+            )]
+
+        return {
+            'total': total,
+            'parametros': parametros,
+            'data_min': pd.Timestamp(data_min).date() if data_min else None,
+            'data_max': pd.Timestamp(data_max).date() if data_max else None
+        }
+
+    def append_exames(self, df_novos):
+        df_novos = df_novos.reindex(columns=COLUNAS_EXAMES)
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO exames ({', '.join(COLUNAS_EXAMES)}) VALUES ({', '.join('?' * len(COLUNAS_EXAMES))})",
+                [[_to_sql(v) for v in row] for row in df_novos.itertuples(index=False)]
+            )
+            self._bump_versoes(conn, _chaves_exames(df_novos['id_paciente']))
+
+    def reclassify_exames(self, parametros, reclassificar):
+        """Lê, reclassifica e atualiza as linhas em uma única transação"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Normalização em Python (lower() do SQLite não trata acentos)
+            nomes = [
+                nome for (nome,) in conn.execute("SELECT DISTINCT parametro FROM exames WHERE parametro IS NOT NULL")
+                if nome.lower().strip() in parametros
+            ]
+            if not nomes:
+                return 0
+
+            df = pd.read_sql_query(
+                f"SELECT rowid AS _rowid, * FROM exames WHERE parametro IN ({', '.join('?' * len(nomes))})",
+                conn, params=nomes, index_col='_rowid'
+            )
+            novos = reclassificar(df)
+            conn.executemany(
+                "UPDATE exames SET status = ? WHERE rowid = ?",
+                [(_to_sql(status), int(rowid)) for rowid, status in novos.items()]
+            )
+            if len(novos):
+                self._bump_versoes(conn, _chaves_exames(df.loc[novos.index, 'id_paciente']))
+
+        return len(novos)
+
+    def pending_rows(self):
+        return 0
+
+    def compact(self):
+        """Sem log a compactar: apenas atualiza as estatísticas dos índices"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA optimize")
+        return 0
+
+
+def _chaves_exames(ids_paciente):
+    """Chaves de versão afetadas por exames gravados para esses pacientes"""
+    return ['exames'] + [f"exames:{int(i)}" for i in pd.unique(ids_paciente.dropna())]
+
+
+def _to_sql(value):
+    """Converte valores pandas/numpy para tipos aceitos pelo sqlite3"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
@@ -4,10 +4,10 @@ Funções utilitárias para o Sistema Nutri Análises
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 
+from modules.data_cache import shared_cache
+
 def apply_custom_css():
     """Aplica CSS customizado ao Streamlit com tema claro e alta legibilidade"""
     st.markdown("""
@@ -406,8 +406,14 @@ def format_dataframe_with_status(df, status_column='status'):
     
     return df.style.apply(highlight_status, axis=1)
 
-def create_evolution_chart(df, parameter, date_column='data_coleta', value_column='valor'):
-    """Cria gráfico de evolução de um parâmetro"""
+def create_evolution_chart(df, parameter, date_column='data_coleta', value_column='valor', cache_key=None):
+    """
+    Cria gráfico de evolução de um parâmetro
+    
+    Com cache_key (ex.: (pasta de dados, id do paciente)), o gráfico fica no
+    cache compartilhado entre sessões e só é refeito quando os dados
+    exibidos do parâmetro mudam.
+    """
     if df.empty:
         return None
     
@@ -417,6 +423,18 @@ def create_evolution_chart(df, parameter, date_column='data_coleta', value_colum
     if df_param.empty:
         return None
     
+    if cache_key is not None:
+        # Versão = conteúdo exibido (datas, valores e status)
+        conteudo = df_param[[date_column, value_column, 'status']]
+        versao = (len(conteudo), int(pd.util.hash_pandas_object(conteudo, index=False).sum()))
+        return shared_cache.get(
+            ('figuras', *cache_key, parameter),
+            versao,
+            lambda: _evolution_figure(df_param, parameter, date_column, value_column)
+        )
+    return _evolution_figure(df_param, parameter, date_column, value_column)
+
+def _evolution_figure(df_param, parameter, date_column, value_column):
     # Converter data
     df_param[date_column] = pd.to_datetime(df_param[date_column])
     df_param = df_param.sort_values(date_column)
@@ -430,7 +448,8 @@ def create_evolution_chart(df, parameter, date_column='data_coleta', value_colum
     
     colors = [color_map.get(status, '#6c757d') for status in df_param['status']]
     
-    # Criar gráfico
+    # Criar gráfico (plotly só é importado quando um gráfico é desenhado)
+    import plotly.graph_objects as go
     fig = go.Figure()
     
     # Linha de evolução
@@ -467,6 +486,7 @@ def create_weight_chart(df_weight):
     if df_weight.empty:
         return None
     
+    import plotly.express as px
     fig = px.line(
         df_weight, 
         x='data', 
@@ -0,0 +1,252 @@
+"""
+Fila de escrita em segundo plano (write-behind) para o Sistema Nutri Análises
+
+Cada salvamento é gravado primeiro em um journal de intenções (JSON lines com
+fsync) e devolvido ao chamador como um ticket: a partir daí ele é durável.
+Um único thread escritor aplica as intenções ao armazenamento, agrupando em
+um só commit os salvamentos que chegam próximos (group commit). Intenções
+não aplicadas são reexecutadas na próxima inicialização.
+
+Cada processo usa o próprio journal, protegido por um lock mantido enquanto
+o processo vive; journals sem dono (processo encerrado) são reaplicados e
+removidos por quem inicializar depois.
+
+Falhas de E/S (OSError, ex.: planilha aberta em outro programa) são
+tentadas novamente algumas vezes, com espera crescente; as demais são
+consideradas permanentes. Uma intenção que não pode ser gravada vai para o
+arquivo de descarte (<name>_descartados.jsonl, com o erro) e sai do journal,
+para não bloquear as que vêm depois.
+"""
+
+import contextlib
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from modules.concurrency import FileLock
+
+# Erros considerados transitórios (tentados novamente antes do descarte)
+ERROS_TRANSITORIOS = (OSError,)
+
+
+class WriteBehindQueue:
+    def __init__(self, journal_dir, name, apply_batch, group_window=0.05, replay_filter=None,
+                 max_tentativas=8):
+        """
+        Args:
+            journal_dir (str): Pasta dos journals de intenções
+            name (str): Prefixo dos journals desta fila (ex.: 'exames_excel')
+            apply_batch (callable): Recebe a lista de intenções e as grava no armazenamento
+            group_window (float): Segundos de espera para agrupar intenções próximas
+            replay_filter (callable): Remove de intenções reexecutadas o que já foi gravado
+            max_tentativas (int): Tentativas de um lote com erro transitório antes do descarte
+        """
+        self.journal_dir = journal_dir
+        self.name = name
+        self.apply_batch = apply_batch
+        self.group_window = group_window
+        self.max_tentativas = max_tentativas
+        self.dead_letter_file = os.path.join(journal_dir, f"{name}_descartados.jsonl")
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._applied_cond = threading.Condition()
+        self._submitted = 0
+        self._applied = 0
+        self.last_error = None
+        self.descartados = 0
+        self._erros_descartados = {}
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._recover(replay_filter)
+
+        # Journal deste processo; o lock indica aos demais que ele tem dono
+        self.journal_file = os.path.join(journal_dir, f"{name}_{os.getpid()}_{uuid.uuid4().hex[:8]}.jsonl")
+        self._owner_lock = FileLock(f"{self.journal_file}.lock")
+        self._owner_lock.acquire()
+        self._truncate_journal()
+
+        self._thread = threading.Thread(target=self._run, name="nutri-write-behind", daemon=True)
+        self._thread.start()
+
+    def _read_journal(self, path):
+        """Lê intenções e marcas de aplicação (tolera uma última linha incompleta)"""
+        intents, applied = [], 0
+        if not os.path.exists(path):
+            return intents, applied
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if 'applied' in record:
+                    applied = max(applied, record['applied'])
+                else:
+                    intents.append(record)
+        return [i for i in intents if i['seq'] > applied], applied
+
+    def _recover(self, replay_filter):
+        """Reaplica intenções de journals cujo processo terminou sem gravá-las"""
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, f"{self.name}_*.jsonl"))):
+            lock = FileLock(f"{path}.lock")
+            if not lock.acquire(blocking=False):
+                continue  # journal de um processo ainda ativo
+
+            try:
+                # Outro processo pode ter reaplicado e removido o journal antes do lock
+                if os.path.exists(path):
+                    pendentes, _ = self._read_journal(path)
+                    if pendentes and replay_filter is not None:
+                        pendentes = replay_filter(pendentes)
+                    if pendentes:
+                        self._apply_or_discard(pendentes)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+            finally:
+                lock.release()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{path}.lock")
+
+        # Tickets deste processo recomeçam em 1: os descartes da recuperação não são deles
+        self._erros_descartados.clear()
+
+    def _truncate_journal(self):
+        with open(self.journal_file, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_journal(self, record):
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=_json_default, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def submit(self, kind, payload):
+        """
+        Registra uma intenção de escrita
+
+        Args:
+            kind (str): Tipo da intenção (ex.: 'exames')
+            payload (dict): Dados serializáveis em JSON
+
+        Returns:
+            int: Ticket; a intenção já está durável no journal quando retorna
+        """
+        with self._lock:
+            self._submitted += 1
+            intent = {'seq': self._submitted, 'kind': kind, **payload}
+            self._append_journal(intent)
+            self._queue.put(intent)
+            return intent['seq']
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+
+            # Group commit: agrupar intenções que chegam dentro da janela
+            deadline = time.monotonic() + self.group_window
+            while True:
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            self._apply_or_discard(batch)
+            self._finish_batch(batch)
+
+    def _apply_with_retry(self, batch):
+        """Tenta gravar o lote, em novas tentativas só para erros transitórios; None se gravou"""
+        espera = 0.1
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                self.apply_batch(batch)
+                return None
+            except Exception as e:
+                self.last_error = e
+                if not isinstance(e, ERROS_TRANSITORIOS) or tentativa == self.max_tentativas:
+                    return e
+                time.sleep(espera)
+                espera = min(espera * 2, 5.0)
+
+    def _apply_or_discard(self, batch):
+        """Grava o lote; intenções que não puderem ser gravadas vão para o descarte"""
+        erro = self._apply_with_retry(batch)
+        if erro is None:
+            self.last_error = None
+            return
+
+        if isinstance(erro, ERROS_TRANSITORIOS) or len(batch) == 1:
+            for intent in batch:
+                self._discard(intent, erro)
+            return
+
+        # Erro permanente em um lote agrupado: separar as intenções válidas da que falhou
+        for intent in batch:
+            erro_intent = self._apply_with_retry([intent])
+            if erro_intent is not None:
+                self._discard(intent, erro_intent)
+
+    def _discard(self, intent, erro):
+        """Move uma intenção que não pôde ser gravada para o arquivo de descarte"""
+        mensagem = f"{type(erro).__name__}: {erro}"
+        registro = {**intent, 'erro': mensagem, 'descartado_em': time.time()}
+        with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, default=_json_default, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.descartados += 1
+        self._erros_descartados[intent['seq']] = mensagem
+
+    def _finish_batch(self, batch):
+        """Marca o lote como concluído no journal e libera quem aguarda"""
+        with self._lock:
+            ultimo = batch[-1]['seq']
+            if ultimo == self._submitted:
+                self._truncate_journal()
+            else:
+                self._append_journal({'applied': ultimo})
+
+        with self._applied_cond:
+            self._applied = ultimo
+            self._applied_cond.notify_all()
+
+    def is_failing(self):
+        """Indica se a última gravação falhou (last_error guarda o erro)"""
+        return self.last_error is not None
+
+    def is_applied(self, ticket):
+        """Indica se a intenção já foi processada (gravada ou descartada)"""
+        return self._applied >= ticket
+
+    def discard_error(self, ticket):
+        """Erro da intenção, se ela foi para o arquivo de descarte em vez do armazenamento (senão None)"""
+        return self._erros_descartados.get(ticket)
+
+    def wait(self, ticket, timeout=None):
+        """Aguarda a aplicação de uma intenção; retorna False se o tempo esgotar"""
+        with self._applied_cond:
+            return self._applied_cond.wait_for(lambda: self._applied >= ticket, timeout)
+
+    def flush(self, timeout=None):
+        """Aguarda a aplicação de todas as intenções registradas até agora"""
+        return self.wait(self._submitted, timeout)
+
+    def pending(self):
+        """Quantidade de intenções ainda não aplicadas"""
+        return self._submitted - self._applied
+
+
+def _json_default(value):
+    """Converte tipos numpy/pandas para JSON"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
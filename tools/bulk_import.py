@@ -0,0 +1,290 @@
+"""
+Importação em lote de arquivos de exames (JSON e CSV)
+
+Lê um manifesto CSV com as colunas arquivo, id_paciente e data_coleta
+(obrigatória para JSON; nos CSVs a data vem da coluna data_exame). Os
+arquivos são processados em paralelo por um pool de processos, com a
+mesma validação, busca e classificação da importação pela interface, e os
+exames são gravados no armazenamento em lotes: uma reserva de IDs e uma
+escrita por lote.
+
+O relatório (um registro por arquivo) é gravado à medida que os lotes são
+confirmados: antes da escrita de cada lote os arquivos entram como
+'pendente', com a faixa de id_exame reservada, e depois como 'ok'. Com
+--resume, arquivos 'ok' são pulados, assim como os 'pendente' cujos exames
+já estão no armazenamento (escrita interrompida antes da confirmação).
+Com --dry-run nada é gravado e os arquivos válidos entram no relatório com
+o status 'simulado', que o --resume não considera importado.
+
+Uso (a partir da raiz do projeto):
+    python -m tools.bulk_import manifesto.csv --workers 8 --batch-size 5000
+    python -m tools.bulk_import manifesto.csv --base-dir exportacao/ --resume
+    python -m tools.bulk_import manifesto.csv --dry-run
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+import pandas as pd
+
+from modules.data_manager import DataManager
+
+COLUNAS_RELATORIO = [
+    'arquivo', 'id_paciente', 'status', 'exames', 'desconhecidos',
+    'id_exame_inicio', 'id_exame_fim', 'erro'
+]
+
+# Analisadores de cada processo do pool (criados uma vez por processo)
+_analyzer_json = None
+_analyzer_csv = None
+
+
+def _init_worker(backend, data_dir):
+    global _analyzer_json, _analyzer_csv
+    from modules.exam_analyzer import ExamAnalyzer
+    from modules.exam_analyzer_v2 import ExamAnalyzerV2
+
+    data_manager = DataManager(backend=backend, data_dir=data_dir)
+    _analyzer_json = ExamAnalyzerV2(data_manager)
+    _analyzer_csv = ExamAnalyzer(data_manager)
+
+
+def _process_file(tarefa):
+    """Valida e processa um arquivo; retorna os exames reconhecidos e o resumo para o relatório"""
+    resultado = {
+        'arquivo': tarefa['arquivo'],
+        'id_paciente': tarefa['id_paciente'],
+        'status': 'erro',
+        'exames': 0,
+        'desconhecidos': 0,
+        'erro': '',
+        'conhecidos': []
+    }
+
+    try:
+        caminho = tarefa['caminho']
+        extensao = os.path.splitext(caminho)[1].lower()
+
+        if extensao == '.json':
+            if not tarefa['data_coleta']:
+                raise ValueError("data_coleta é obrigatória para arquivos JSON")
+            with open(caminho, encoding='utf-8-sig') as f:
+                json_data = json.load(f)
+            validation = _analyzer_json.validate_json_data(json_data)
+            if not validation['valid']:
+                raise ValueError(validation['error'])
+            result = _analyzer_json.process_json_import(
+                json_data, tarefa['id_paciente'], tarefa['sexo'], tarefa['data_coleta']
+            )
+        elif extensao == '.csv':
+            df = pd.read_csv(caminho)
+            validation = _analyzer_csv.validate_csv_data(df)
+            if not validation['valid']:
+                raise ValueError(validation['error'])
+            result = _analyzer_csv.process_csv_import(df, tarefa['id_paciente'], tarefa['sexo'])
+        else:
+            raise ValueError(f"Extensão não suportada: {extensao}")
+
+        resultado.update(
+            status='ok',
+            exames=len(result['conhecidos']),
+            desconhecidos=len(result['desconhecidos']),
+            conhecidos=result['conhecidos']
+        )
+    except Exception as e:
+        resultado['erro'] = str(e)
+
+    return resultado
+
+
+def _ler_manifesto(caminho, base_dir, sexos):
+    """Tarefas do manifesto; linhas com paciente desconhecido viram erros no relatório"""
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    faltando = [col for col in ('arquivo', 'id_paciente') if col not in df.columns]
+    if faltando:
+        raise SystemExit(f"Manifesto sem as colunas: {', '.join(faltando)}")
+
+    tarefas, invalidas = [], []
+    for row in df.to_dict('records'):
+        tarefa = {
+            'arquivo': row['arquivo'],
+            'caminho': os.path.join(base_dir, row['arquivo']),
+            'id_paciente': row['id_paciente'],
+            'data_coleta': row.get('data_coleta', '').strip()
+        }
+        try:
+            tarefa['id_paciente'] = int(row['id_paciente'])
+            tarefa['sexo'] = sexos[tarefa['id_paciente']]
+        except (ValueError, KeyError):
+            invalidas.append({**tarefa, 'status': 'erro', 'exames': 0, 'desconhecidos': 0,
+                              'erro': f"Paciente não encontrado: {row['id_paciente']}"})
+            continue
+        tarefas.append(tarefa)
+    return tarefas, invalidas
+
+
+def _importados(relatorio, data_manager):
+    """
+    Arquivos já importados em execuções anteriores
+
+    Arquivos só com a linha 'pendente' contam como importados se todos os
+    exames da sua faixa de id_exame estão no armazenamento.
+
+    Returns:
+        tuple: (arquivos importados, linhas 'ok' a acrescentar ao relatório,
+                linhas de erro dos arquivos gravados pela metade)
+    """
+    if not os.path.exists(relatorio):
+        return set(), [], []
+    df = pd.read_csv(relatorio, dtype=str, keep_default_na=False)
+    importados = set(df.loc[df['status'] == 'ok', 'arquivo'])
+
+    if 'id_exame_inicio' not in df.columns:
+        return importados, [], []
+
+    pendentes = df[(df['status'] == 'pendente') & ~df['arquivo'].isin(importados)]
+    pendentes = pendentes.drop_duplicates('arquivo', keep='last')
+    if pendentes.empty:
+        return importados, [], []
+
+    gravados = set(data_manager.load_exames()['id_exame'].dropna().astype(int))
+    confirmados, parciais = [], []
+    for linha in pendentes.to_dict('records'):
+        if linha['id_exame_inicio']:
+            faixa = range(int(linha['id_exame_inicio']), int(linha['id_exame_fim']) + 1)
+            presentes = sum(id_exame in gravados for id_exame in faixa)
+        else:
+            faixa, presentes = range(0), 0
+        if presentes == len(faixa):
+            importados.add(linha['arquivo'])
+            confirmados.append({**linha, 'status': 'ok'})
+        elif presentes:
+            importados.add(linha['arquivo'])
+            parciais.append({**linha, 'status': 'erro',
+                             'erro': f"Gravação parcial: {presentes} de {len(faixa)} exames; revisar manualmente"})
+    return importados, confirmados, parciais
+
+
+class _Relatorio:
+    def __init__(self, caminho, continuar):
+        novo = not (continuar and os.path.exists(caminho) and os.path.getsize(caminho) > 0)
+        colunas = COLUNAS_RELATORIO
+        if not novo:
+            # Relatório de uma versão anterior: continuar com as colunas que ele já tem
+            with open(caminho, encoding='utf-8', newline='') as f:
+                colunas = next(csv.reader(f), None) or COLUNAS_RELATORIO
+        self._file = open(caminho, 'w' if novo else 'a', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=colunas, extrasaction='ignore')
+        if novo:
+            self._writer.writeheader()
+
+    def write(self, linhas):
+        self._writer.writerows(linhas)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('manifest', help="CSV com as colunas arquivo, id_paciente, data_coleta")
+    parser.add_argument('--base-dir', default=None, help="Pasta dos arquivos (padrão: pasta do manifesto)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=5000, help="Exames gravados por lote")
+    parser.add_argument('--backend', default=None, choices=['excel', 'sqlite'])
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--report', default=None, help="Relatório CSV (padrão: <manifesto>.relatorio.csv)")
+    parser.add_argument('--resume', action='store_true', help="Pula arquivos já importados no relatório")
+    parser.add_argument('--dry-run', action='store_true', help="Processa os arquivos sem gravar exames")
+    parser.add_argument('--compact', action='store_true', help="Compacta o log de exames ao final")
+    args = parser.parse_args()
+
+    base_dir = args.base_dir or os.path.dirname(os.path.abspath(args.manifest))
+    relatorio_path = args.report or f"{os.path.splitext(args.manifest)[0]}.relatorio.csv"
+
+    data_manager = DataManager(backend=args.backend, data_dir=args.data_dir)
+    pacientes = data_manager.load_pacientes()
+    sexos = dict(zip(pacientes['id'].astype(int), pacientes['sexo']))
+
+    tarefas, invalidas = _ler_manifesto(args.manifest, base_dir, sexos)
+    confirmados, parciais = [], []
+    if args.resume:
+        importados, confirmados, parciais = _importados(relatorio_path, data_manager)
+        tarefas = [t for t in tarefas if t['arquivo'] not in importados]
+
+    relatorio = _Relatorio(relatorio_path, args.resume)
+    relatorio.write(invalidas + confirmados + parciais)
+
+    totais = {'arquivos': 0, 'ok': 0, 'erro': len(invalidas) + len(parciais), 'exames': 0, 'lotes': 0}
+    lote, lote_relatorio = [], []
+
+    def gravar_lote():
+        if args.dry_run:
+            relatorio.write([{**linha, 'status': 'simulado'} for linha in lote_relatorio])
+        elif lote_relatorio:
+            # Faixa de id_exame de cada arquivo (os exames de um arquivo são contíguos no lote)
+            ids = iter(data_manager.reserve_ids('exames', len(lote)))
+            for linha in lote_relatorio:
+                for exame in linha['conhecidos']:
+                    exame['id_exame'] = next(ids)
+                if linha['conhecidos']:
+                    linha['id_exame_inicio'] = linha['conhecidos'][0]['id_exame']
+                    linha['id_exame_fim'] = linha['conhecidos'][-1]['id_exame']
+
+            # 'pendente' antes da escrita permite ao --resume saber se o lote chegou ao armazenamento
+            relatorio.write([{**linha, 'status': 'pendente'} for linha in lote_relatorio])
+            if not data_manager.save_exames_lote(lote):
+                raise SystemExit("Falha ao gravar o lote; execute novamente com --resume")
+            if lote:
+                totais['lotes'] += 1
+            relatorio.write(lote_relatorio)
+        totais['exames'] += len(lote)
+        lote.clear()
+        lote_relatorio.clear()
+
+    inicio = time.perf_counter()
+    print(f"Arquivos a importar: {len(tarefas)} | processos: {args.workers} | lote: {args.batch_size} exames")
+
+    try:
+        with multiprocessing.Pool(args.workers, initializer=_init_worker,
+                                  initargs=(data_manager.backend.name, data_manager.data_dir)) as pool:
+            for resultado in pool.imap_unordered(_process_file, tarefas, chunksize=8):
+                totais['arquivos'] += 1
+                totais[resultado['status']] += 1
+
+                if resultado['status'] == 'ok':
+                    for exame in resultado['conhecidos']:
+                        exame['id_paciente'] = resultado['id_paciente']
+                    lote.extend(resultado['conhecidos'])
+                    lote_relatorio.append(resultado)
+                    if len(lote) >= args.batch_size:
+                        gravar_lote()
+                else:
+                    relatorio.write([resultado])
+
+                if totais['arquivos'] % 500 == 0:
+                    taxa = totais['arquivos'] / (time.perf_counter() - inicio)
+                    print(f"  {totais['arquivos']}/{len(tarefas)} arquivos ({taxa:.0f}/s)", flush=True)
+
+        gravar_lote()
+    finally:
+        relatorio.close()
+
+    if args.compact and not args.dry_run:
+        data_manager.compact_exames()
+
+    duracao = time.perf_counter() - inicio
+    print(f"Concluído em {duracao:.1f}s: {totais['ok']} arquivos importados, {totais['erro']} com erro, "
+          f"{totais['exames']} exames em {totais['lotes']} lotes{' (simulação)' if args.dry_run else ''}")
+    print(f"Relatório: {relatorio_path}")
+    raise SystemExit(1 if totais['erro'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Compacta o log de exames na base data/exames.xlsx
+
+Uso (a partir da raiz do projeto):
+    python -m tools.compact_exames
+"""
+
+from modules.data_manager import DataManager
+
+
+def main():
+    data_manager = DataManager()
+    pendentes = data_manager.backend.pending_rows()
+    print(f"Linhas pendentes no log: {pendentes}")
+
+    incorporadas = data_manager.compact_exames()
+    if incorporadas is None:
+        raise SystemExit(1)
+    print(f"Linhas incorporadas à base: {incorporadas}")
+
+
+if __name__ == "__main__":
+    main()
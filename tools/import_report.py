@@ -0,0 +1,131 @@
+"""
+Relatório de tempo de importação e inicialização da aplicação
+
+Executa um processo Python novo com -X importtime, importa os módulos que
+a aplicação carrega antes da primeira tela e constrói os gerenciadores
+(DataManager e analisador), como faz init_managers(). Mostra o tempo de cada
+etapa, os pacotes mais caros e quais pacotes pesados cada etapa carregou
+(importações feitas durante a construção indicam leitura antecipada de dados).
+
+Uso (a partir da raiz do projeto):
+    python -m tools.import_report
+    python -m tools.import_report --app retro --top 25
+    python -m tools.import_report --json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Módulos importados no topo de cada aplicação
+MODULOS_APP = {
+    'v2': ['modules.data_manager', 'modules.exam_analyzer_v2', 'modules.reference_table', 'modules.utils'],
+    'retro': ['modules.data_manager', 'modules.exam_analyzer', 'modules.utils']
+}
+
+ANALISADOR_APP = {
+    'v2': ('modules.exam_analyzer_v2', 'ExamAnalyzerV2'),
+    'retro': ('modules.exam_analyzer', 'ExamAnalyzer')
+}
+
+# Pacotes cuja presença no início indica importação antecipada
+PACOTES_PESADOS = ['plotly', 'openpyxl', 'pyarrow', 'sqlite3', 'numpy', 'pandas', 'streamlit']
+
+# Separa, na saída de -X importtime, a importação da construção dos gerenciadores
+_MARCA = '--- inicializacao ---'
+
+_CODIGO = """
+import json, sys, time
+inicio = time.perf_counter()
+{imports}
+importacao = time.perf_counter() - inicio
+sys.stderr.write({marca!r} + '\\n')
+from modules.data_manager import DataManager
+from {modulo_analisador} import {classe_analisador}
+inicio = time.perf_counter()
+data_manager = DataManager()
+analyzer = {classe_analisador}(data_manager)
+inicializacao = time.perf_counter() - inicio
+print(json.dumps({{'importacao': importacao, 'inicializacao': inicializacao}}))
+"""
+
+
+def _parse_importtime(linhas):
+    """Linhas de -X importtime -> [(pacote, nível, próprio_us, acumulado_us)]"""
+    registros = []
+    for linha in linhas:
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        partes = linha.split(':', 1)[1].split('|')
+        proprio, acumulado, nome = int(partes[0]), int(partes[1]), partes[2]
+        nivel = (len(nome) - len(nome.lstrip(' '))) // 2
+        registros.append((nome.strip(), nivel, proprio, acumulado))
+    return registros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--app', default='v2', choices=sorted(MODULOS_APP))
+    parser.add_argument('--top', type=int, default=15, help="Quantidade de pacotes listados")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    modulo_analisador, classe_analisador = ANALISADOR_APP[args.app]
+    codigo = _CODIGO.format(
+        imports='\n'.join(f"import {modulo}" for modulo in MODULOS_APP[args.app]),
+        modulo_analisador=modulo_analisador,
+        classe_analisador=classe_analisador,
+        marca=_MARCA
+    )
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        sys.stderr.write(processo.stderr)
+        raise SystemExit(processo.returncode)
+
+    tempos = json.loads(processo.stdout.strip().splitlines()[-1])
+    linhas = processo.stderr.splitlines()
+    corte = linhas.index(_MARCA)
+    etapas = {
+        'importacao': _parse_importtime(linhas[:corte]),
+        'inicializacao': _parse_importtime(linhas[corte + 1:])
+    }
+
+    relatorio = {'app': args.app}
+    for etapa, registros in etapas.items():
+        # Custo acumulado por pacote (importações diretas dos módulos do projeto e do código medido)
+        por_pacote = {}
+        for nome, nivel, _, acumulado in registros:
+            if nivel <= 1 and not nome.startswith('modules'):
+                pacote = nome.split('.')[0]
+                por_pacote[pacote] = por_pacote.get(pacote, 0) + acumulado
+        carregados = {nome.split('.')[0] for nome, _, _, _ in registros}
+
+        relatorio[etapa] = {
+            'tempo_ms': round(tempos[etapa] * 1000, 1),
+            'pacotes': [
+                {'pacote': pacote, 'acumulado_ms': round(us / 1000, 1)}
+                for pacote, us in sorted(por_pacote.items(), key=lambda item: -item[1])[:args.top]
+            ],
+            'pesados_carregados': [pacote for pacote in PACOTES_PESADOS if pacote in carregados]
+        }
+
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return
+
+    print(f"Aplicação: {args.app}")
+    for etapa, titulo in (('importacao', 'Importação dos módulos'),
+                          ('inicializacao', 'Construção dos gerenciadores')):
+        resultado = relatorio[etapa]
+        print(f"  {titulo}: {resultado['tempo_ms']:.1f} ms")
+        print(f"    Pacotes pesados carregados: {', '.join(resultado['pesados_carregados']) or 'nenhum'}")
+        for item in resultado['pacotes']:
+            print(f"    {item['pacote']:30} {item['acumulado_ms']:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
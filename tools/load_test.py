@@ -0,0 +1,275 @@
+"""
+Teste de carga com sessões simultâneas do app_v2 (sem navegador e sem rede)
+
+Cada sessão executa o app pelo AppTest do Streamlit e segue um roteiro:
+abre o app, seleciona um paciente, preenche valores em uma tabela de
+categoria, salva os exames, passa para a importação JSON, importa um
+arquivo e filtra o Acompanhamento. Para cada quantidade de sessões são
+medidas as latências de todas as reexecuções (p50/p95/p99) e o pico de
+memória (RSS amostrado e, com --tracemalloc, o pico de alocações Python).
+
+O AppTest guarda estado global do Streamlit durante cada execução
+(Runtime._instance), então não é possível ter dois no mesmo processo ao
+mesmo tempo: cada sessão roda em um processo próprio, todas liberadas
+juntas por uma barreira, sobre a mesma pasta de dados. Disputam CPU,
+disco e os locks do armazenamento, mas não compartilham os caches em
+memória como as sessões de um único servidor; o pico de memória é
+informado por sessão e somado.
+
+Limitações do AppTest refletidas no roteiro:
+- o file_uploader não é suportado: a importação é simulada chamando
+  process_json_import do analisador com itens sintéticos, e o tempo dessa
+  chamada entra nas latências como 'importar JSON (simulado)';
+- o st.data_editor não pode ser editado: as tabelas de categoria são
+  preenchidas no modo "Campos individuais";
+- o AppTest reexecuta o script inteiro mesmo em interações dentro de
+  fragmentos, então as latências são um limite superior das do navegador.
+
+Os dados são copiados para uma pasta temporária (a original não é alterada).
+
+Uso (a partir da raiz do projeto):
+    python -m tools.load_test --sessoes 1,2,4,8
+    python -m tools.load_test --sessoes 4 --iteracoes 3 --dados /tmp/nutri_1k --json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+class MonitorMemoria:
+    """Amostra o RSS do processo em segundo plano e guarda o pico"""
+
+    def __init__(self, intervalo=0.02):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    @staticmethod
+    def rss():
+        """RSS atual em bytes (/proc no Linux; senão o máximo já atingido pelo processo)"""
+        try:
+            with open('/proc/self/status') as f:
+                for linha in f:
+                    if linha.startswith('VmRSS:'):
+                        return int(linha.split()[1]) * 1024
+        except OSError:
+            pass
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo if sys.platform == 'darwin' else maximo * 1024
+
+    def _executar(self):
+        while not self._parar.is_set():
+            self.pico = max(self.pico, self.rss())
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self.pico = self.rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, self.rss())
+
+
+class Sessao:
+    """Uma sessão roteirizada do app; registra (etapa, segundos) de cada reexecução"""
+
+    def __init__(self, app_path, id_paciente, itens_json, campos, analyzer, timeout):
+        self.app_path = app_path
+        self.id_paciente = id_paciente
+        self.itens_json = itens_json
+        self.campos = campos
+        self.analyzer = analyzer
+        self.timeout = timeout
+        self.latencias = []
+        self.erros = []
+
+    def _etapa(self, nome, acao):
+        inicio = time.perf_counter()
+        at = acao()
+        self.latencias.append((nome, time.perf_counter() - inicio))
+        if hasattr(at, 'exception') and len(at.exception):
+            raise RuntimeError(f"{nome}: {at.exception[0].message}")
+        return at
+
+    def executar(self, iteracoes):
+        from streamlit.testing.v1 import AppTest
+
+        try:
+            at = self._etapa('abrir', lambda: AppTest.from_file(self.app_path, default_timeout=self.timeout).run())
+            self._etapa('selecionar paciente', lambda: at.button(key=f"select_{self.id_paciente}").click().run())
+
+            # Elementos são buscados de novo a cada etapa: cada reexecução gera uma nova árvore
+            def radio(label):
+                return next(r for r in at.radio if r.label == label)
+
+            for iteracao in range(iteracoes):
+                self._etapa('modo campos', lambda: at.radio(key="modo_insercao_manual").set_value("Campos individuais").run())
+                chaves = [n.key for n in at.number_input if n.key and n.key.endswith('_valor')][:self.campos]
+                for i, chave in enumerate(chaves):
+                    self._etapa('preencher valor', lambda: at.number_input(key=chave).set_value(float(10 + i + iteracao)).run())
+                self._etapa('salvar exames', lambda: next(
+                    b for b in at.button if 'Salvar todos os exames' in b.label
+                ).click().run())
+
+                self._etapa('abrir importação JSON', lambda: radio("Método de entrada:").set_value("Importação JSON").run())
+                self._etapa('importar JSON (simulado)', lambda: self.analyzer.process_json_import(
+                    self.itens_json, self.id_paciente, 'F', '2026-01-01'
+                ))
+                self._etapa('voltar à inserção manual', lambda: radio("Método de entrada:").set_value(
+                    "Inserção Manual por Categoria"
+                ).run())
+
+                filtro = next((s for s in at.selectbox if s.label == "Parâmetro"), None)
+                if filtro is not None and len(filtro.options) > 1:
+                    opcao = filtro.options[1 + iteracao % (len(filtro.options) - 1)]
+                    self._etapa('filtrar acompanhamento', lambda: filtro.set_value(opcao).run())
+        except Exception as e:
+            self.erros.append(str(e))
+
+
+def _percentis(valores):
+    if not valores:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    ms = np.array(valores) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(ms, 95)), 1),
+        'p99_ms': round(float(np.percentile(ms, 99)), 1),
+        'max_ms': round(float(ms.max()), 1)
+    }
+
+
+def _sessao_processo(indice, args, app_path, data_dir, id_paciente, barreira, fila):
+    """Processo de uma sessão: prepara o analisador, espera as demais e executa o roteiro"""
+    os.environ['NUTRI_DATA_DIR'] = data_dir
+    try:
+        from benchmarks.synthetic_data import carregar_parametros, gerar_json_importacao
+        from modules.data_manager import DataManager
+        from modules.exam_analyzer_v2 import ExamAnalyzerV2
+
+        data_manager = DataManager(data_dir=data_dir)
+        analyzer = ExamAnalyzerV2(data_manager)
+        itens_json = gerar_json_importacao(
+            np.random.default_rng(indice), carregar_parametros(data_manager.referencias_file), args.json_itens
+        )
+        sessao = Sessao(app_path, id_paciente, itens_json, args.campos, analyzer, args.timeout)
+    except Exception as e:
+        barreira.abort()
+        fila.put({'latencias': [], 'erros': [f"preparação: {e}"], 'pico_rss': 0, 'pico_tracemalloc': None})
+        return
+
+    try:
+        barreira.wait()
+    except threading.BrokenBarrierError:
+        fila.put({'latencias': [], 'erros': ["barreira interrompida"], 'pico_rss': 0, 'pico_tracemalloc': None})
+        return
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    with MonitorMemoria() as memoria:
+        sessao.executar(args.iteracoes)
+        data_manager.flush_writes()
+    pico_python = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+
+    fila.put({
+        'latencias': sessao.latencias,
+        'erros': sessao.erros,
+        'pico_rss': memoria.pico,
+        'pico_tracemalloc': pico_python
+    })
+
+
+def executar_nivel(n_sessoes, args, app_path, data_dir, pacientes):
+    """Executa n_sessoes simultâneas (um processo cada) e resume latências e memória"""
+    ctx = multiprocessing.get_context('spawn')
+    barreira = ctx.Barrier(n_sessoes)
+    fila = ctx.Queue()
+    processos = [
+        ctx.Process(target=_sessao_processo, args=(
+            i, args, app_path, data_dir, int(pacientes[i % len(pacientes)]), barreira, fila
+        ))
+        for i in range(n_sessoes)
+    ]
+    for processo in processos:
+        processo.start()
+    sessoes = [fila.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+
+    latencias = [segundos for sessao in sessoes for _, segundos in sessao['latencias']]
+    por_etapa = {}
+    for sessao in sessoes:
+        for etapa, segundos in sessao['latencias']:
+            por_etapa.setdefault(etapa, []).append(segundos)
+
+    picos_rss = [sessao['pico_rss'] for sessao in sessoes]
+    picos_python = [sessao['pico_tracemalloc'] for sessao in sessoes if sessao['pico_tracemalloc'] is not None]
+    return {
+        'sessoes': n_sessoes,
+        'reexecucoes': len(latencias),
+        **_percentis(latencias),
+        'pico_rss_sessao_mb': round(max(picos_rss) / 1024 ** 2, 1),
+        'pico_rss_total_mb': round(sum(picos_rss) / 1024 ** 2, 1),
+        'pico_tracemalloc_sessao_mb': round(max(picos_python) / 1024 ** 2, 1) if picos_python else None,
+        'erros': [erro for sessao in sessoes for erro in sessao['erros']],
+        'etapas': {etapa: {'n': len(valores), **_percentis(valores)} for etapa, valores in por_etapa.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessoes', default='1,2,4', help="Quantidades de sessões simultâneas (ex.: 1,2,4,8)")
+    parser.add_argument('--iteracoes', type=int, default=2, help="Repetições do roteiro por sessão")
+    parser.add_argument('--campos', type=int, default=3, help="Valores preenchidos por iteração")
+    parser.add_argument('--json-itens', type=int, default=200, help="Itens do JSON importado")
+    parser.add_argument('--app', default='app_v2.py')
+    parser.add_argument('--dados', default='data', help="Pasta de dados copiada para o teste")
+    parser.add_argument('--timeout', type=float, default=120, help="Tempo máximo de cada reexecução (s)")
+    parser.add_argument('--tracemalloc', action='store_true', help="Mede também o pico de alocações Python (mais lento)")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    niveis = [int(n) for n in args.sessoes.split(',')]
+    app_path = os.path.abspath(args.app)
+    data_dir = tempfile.mkdtemp(prefix='nutri_carga_')
+    shutil.copytree(args.dados, data_dir, dirs_exist_ok=True)
+
+    try:
+        pacientes = pd.read_excel(os.path.join(data_dir, 'pacientes.xlsx'))['id'].to_numpy()
+        resultados = [executar_nivel(n, args, app_path, data_dir, pacientes) for n in niveis]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+        return
+
+    colunas = ['sessoes', 'reexecucoes', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+               'pico_rss_sessao_mb', 'pico_rss_total_mb']
+    if args.tracemalloc:
+        colunas.append('pico_tracemalloc_sessao_mb')
+    with pd.option_context('display.width', 200):
+        print(pd.DataFrame(resultados)[colunas].to_string(index=False))
+    for resultado in resultados:
+        for erro in resultado['erros']:
+            print(f"[{resultado['sessoes']} sessões] erro: {erro}")
+
+
+if __name__ == "__main__":
+    main()
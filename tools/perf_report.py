@@ -0,0 +1,94 @@
+"""
+Resumo do log de desempenho por build (ver modules/perf, NUTRI_PERF=1)
+
+Agrupa as execuções registradas por build e rótulo ('app' ou o fragmento
+reexecutado) e mostra mediana e p95 do tempo total, médias de widgets
+criados e linhas lidas, e as funções mais caras por execução, permitindo
+comparar duas versões da aplicação.
+
+Uso (a partir da raiz do projeto):
+    python -m tools.perf_report
+    python -m tools.perf_report --log data/perf.jsonl --top 5 --json
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from modules.perf import read_log
+
+
+def resumir(registros, top=10):
+    """
+    Estatísticas das execuções por (build, rótulo)
+
+    Args:
+        registros (list): Registros do log
+        top (int): Quantidade de funções listadas por grupo
+
+    Returns:
+        list: [{'build', 'rotulo', 'execucoes', 'p50_ms', 'p95_ms', 'widgets', 'linhas_lidas', 'funcoes'}]
+    """
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault((registro.get('build') or '—', registro['rotulo']), []).append(registro)
+
+    resumo = []
+    for (build, rotulo), execucoes in grupos.items():
+        totais = np.array([e['total_ms'] for e in execucoes])
+        widgets = [e['widgets'] for e in execucoes if e.get('widgets') is not None]
+
+        # Tempo médio por execução de cada função (inclui as chamadas internas instrumentadas)
+        funcoes = {}
+        for e in execucoes:
+            for nome, chamada in e['chamadas'].items():
+                acumulado = funcoes.setdefault(nome, {'chamadas': 0, 'ms': 0.0})
+                acumulado['chamadas'] += chamada['n']
+                acumulado['ms'] += chamada['ms']
+
+        resumo.append({
+            'build': build,
+            'rotulo': rotulo,
+            'execucoes': len(execucoes),
+            'p50_ms': round(float(np.percentile(totais, 50)), 1),
+            'p95_ms': round(float(np.percentile(totais, 95)), 1),
+            'widgets': round(float(np.mean(widgets)), 1) if widgets else None,
+            'linhas_lidas': round(float(np.mean([e['linhas_lidas'] for e in execucoes])), 1),
+            'funcoes': [
+                {'funcao': nome,
+                 'chamadas_por_execucao': round(f['chamadas'] / len(execucoes), 2),
+                 'ms_por_execucao': round(f['ms'] / len(execucoes), 2)}
+                for nome, f in sorted(funcoes.items(), key=lambda item: -item[1]['ms'])[:top]
+            ]
+        })
+    return sorted(resumo, key=lambda r: (r['rotulo'], r['build']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--log', default=None, help="Arquivo de log (padrão: NUTRI_PERF_LOG ou data/perf.jsonl)")
+    parser.add_argument('--top', type=int, default=10, help="Funções listadas por grupo")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    resumo = resumir(read_log(args.log), args.top)
+    if args.json:
+        print(json.dumps(resumo, ensure_ascii=False, indent=2))
+        return
+    if not resumo:
+        print("Nenhuma execução registrada (ative com NUTRI_PERF=1)")
+        return
+
+    for grupo in resumo:
+        print(f"[{grupo['rotulo']}] build {grupo['build']}: {grupo['execucoes']} execuções, "
+              f"p50 {grupo['p50_ms']:.1f} ms, p95 {grupo['p95_ms']:.1f} ms, "
+              f"widgets {grupo['widgets'] if grupo['widgets'] is not None else '—'}, "
+              f"linhas lidas {grupo['linhas_lidas']}")
+        for funcao in grupo['funcoes']:
+            print(f"    {funcao['funcao']:45} {funcao['chamadas_por_execucao']:>7.2f}x "
+                  f"{funcao['ms_por_execucao']:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Reclassifica os exames gravados com os valores de referência atuais
+
+Sem argumentos, todos os exames de parâmetros da base são reavaliados. Com
+--anterior (uma planilha) ou --snapshot (uma versão do histórico, ver
+tools/reference_snapshots), apenas os parâmetros e sexos cujas faixas
+mudaram em relação a ela.
+
+Uso (a partir da raiz do projeto):
+    python -m tools.reclassify_exames
+    python -m tools.reclassify_exames --anterior data/valores_referencia_2025-01-01_10-00.xlsx
+    python -m tools.reclassify_exames --snapshot 3
+"""
+
+import argparse
+
+from modules.data_manager import DataManager
+from modules.excel_cache import read_excel
+from modules.reclassifier import referencias_por_parametro
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    anterior = parser.add_mutually_exclusive_group()
+    anterior.add_argument('--anterior', default=None, help="Planilha de referência anterior para comparação")
+    anterior.add_argument('--snapshot', type=int, default=None, help="Versão do histórico para comparação")
+    parser.add_argument('--backend', default=None, choices=['excel', 'sqlite'])
+    parser.add_argument('--data-dir', default=None)
+    args = parser.parse_args()
+
+    data_manager = DataManager(backend=args.backend, data_dir=args.data_dir)
+    referencias_antigas = {}
+    if args.anterior:
+        referencias_antigas = referencias_por_parametro(read_excel(args.anterior))
+    elif args.snapshot is not None:
+        referencias_antigas = referencias_por_parametro(data_manager.snapshots.load(args.snapshot))
+    referencias_novas = referencias_por_parametro(read_excel(data_manager.referencias_file))
+
+    relatorio = data_manager.reclassify_exames(referencias_antigas, referencias_novas)
+    print(f"Parâmetros alterados: {len(relatorio['parametros'])}")
+    print(f"Exames reavaliados: {relatorio['avaliados']}")
+    print(f"Exames com status alterado: {relatorio['alterados']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Histórico de versões da base de referência (listar, comparar, restaurar)
+
+Os snapshots ficam em data/snapshots/referencias (ver modules/snapshot_store).
+O comando importar registra no histórico os backups antigos
+valores_referencia_AAAA-MM-DD_HH-MM.xlsx da pasta de dados, com a data do
+nome do arquivo, e os apaga com --remover.
+
+Uso (a partir da raiz do projeto):
+    python -m tools.reference_snapshots listar
+    python -m tools.reference_snapshots diff 3          # versão 3 x base atual
+    python -m tools.reference_snapshots diff 3 5
+    python -m tools.reference_snapshots restaurar 3
+    python -m tools.reference_snapshots importar --remover
+    python -m tools.reference_snapshots limpar
+"""
+
+import argparse
+import glob
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from modules.data_manager import DataManager
+
+_PADRAO_LEGADO = 'valores_referencia_*.xlsx'
+
+
+def _listar(data_manager, args):
+    snapshots = data_manager.snapshots.list()
+    if not snapshots:
+        print("Nenhum snapshot registrado")
+        return
+    for s in snapshots:
+        print(f"{s['id']:>5}  {s['criado_em'][:19]}  {s['sha256'][:12]}  "
+              f"{s['tamanho_comprimido']:>9} B  {s['motivo']}")
+    stats = data_manager.snapshots.stats()
+    print(f"{stats['snapshots']} snapshots, {stats['objetos']} objetos, "
+          f"{stats['tamanho_em_disco']} B em disco ({stats['tamanho_original']} B sem deduplicação)")
+
+
+def _diff(data_manager, args):
+    diff = data_manager.diff_referencias(args.id, args.outro)
+    if diff.empty:
+        print("Sem diferenças")
+        return
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(diff.to_string(index=False))
+
+
+def _restaurar(data_manager, args):
+    relatorio = data_manager.restore_referencias(args.id)
+    if relatorio is False:
+        raise SystemExit(1)
+    print(f"Versão {args.id} restaurada; exames com status alterado: {relatorio['alterados']}")
+
+
+def _importar(data_manager, args):
+    arquivos = []
+    for path in glob.glob(os.path.join(data_manager.data_dir, _PADRAO_LEGADO)):
+        try:
+            criado_em = datetime.strptime(os.path.basename(path)[19:-5], '%Y-%m-%d_%H-%M')
+        except ValueError:
+            continue
+        arquivos.append((criado_em, path))
+
+    novos = 0
+    for criado_em, path in sorted(arquivos):
+        _, criado = data_manager.snapshots.snapshot(path, motivo='backup importado', criado_em=criado_em)
+        novos += criado
+        if args.remover:
+            os.remove(path)
+    print(f"{len(arquivos)} backups lidos, {novos} versões novas registradas")
+
+
+def _limpar(data_manager, args):
+    print(f"{data_manager.snapshots.prune()} snapshots removidos pela política de retenção")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=None)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('listar').set_defaults(func=_listar)
+
+    diff = comandos.add_parser('diff')
+    diff.add_argument('id', type=int)
+    diff.add_argument('outro', type=int, nargs='?', default=None, help="Padrão: base atual")
+    diff.set_defaults(func=_diff)
+
+    restaurar = comandos.add_parser('restaurar')
+    restaurar.add_argument('id', type=int)
+    restaurar.set_defaults(func=_restaurar)
+
+    importar = comandos.add_parser('importar')
+    importar.add_argument('--remover', action='store_true', help="Apaga os backups importados")
+    importar.set_defaults(func=_importar)
+
+    comandos.add_parser('limpar').set_defaults(func=_limpar)
+
+    args = parser.parse_args()
+    args.func(DataManager(data_dir=args.data_dir), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Teste de estresse de escritas concorrentes no armazenamento
+
+Dispara N processos que gravam exames e atualizam o mesmo paciente ao mesmo
+tempo, sobre uma cópia temporária da pasta de dados, e confere ao final que
+nenhuma linha foi perdida, que os IDs de exame são únicos e que nenhuma
+atualização do paciente foi sobrescrita.
+
+Uso (a partir da raiz do projeto):
+    python -m tools.stress_writers --writers 8 --batches 20 --rows 37 --updates 10
+    python -m tools.stress_writers --backend sqlite
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from modules.concurrency import ConflitoVersaoError
+from modules.data_manager import DataManager
+
+ID_PACIENTE_ALVO = 1
+
+
+def _writer(args):
+    """Processo escritor: lotes de exames + atualizações otimistas do paciente alvo"""
+    indice, backend, data_dir, batches, rows, updates = args
+    data_manager = DataManager(backend=backend, data_dir=data_dir)
+
+    for lote in range(batches):
+        exames = [{
+            'parametro': f"stress_{indice}",
+            'valor': float(lote * rows + i),
+            'unidade': 'u',
+            'data_coleta': '2025-01-01',
+            'status': 'Ideal'
+        } for i in range(rows)]
+        data_manager.enqueue_exames(exames, ID_PACIENTE_ALVO)
+
+    conflitos = 0
+    for _ in range(updates):
+        while True:
+            paciente = data_manager.get_paciente(ID_PACIENTE_ALVO)
+            paciente['idade'] = int(paciente['idade']) + 1
+            try:
+                data_manager.backend.save_paciente(paciente)
+                break
+            except ConflitoVersaoError:
+                conflitos += 1
+
+    data_manager.flush_writes()
+    return conflitos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=37)
+    parser.add_argument('--updates', type=int, default=10)
+    parser.add_argument('--backend', default='excel', choices=['excel', 'sqlite'])
+    parser.add_argument('--source', default='data', help="Pasta de dados copiada para o teste")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='nutri_stress_')
+    try:
+        for nome in ('pacientes.xlsx', 'exames.xlsx', 'valores_referencia.xlsx'):
+            shutil.copy(os.path.join(args.source, nome), data_dir)
+
+        inicial = DataManager(backend=args.backend, data_dir=data_dir)
+        exames_iniciais = len(inicial.load_exames())
+        idade_inicial = int(inicial.get_paciente(ID_PACIENTE_ALVO)['idade'])
+
+        inicio = time.perf_counter()
+        tarefas = [
+            (i, args.backend, data_dir, args.batches, args.rows, args.updates)
+            for i in range(args.writers)
+        ]
+        with multiprocessing.Pool(args.writers) as pool:
+            conflitos = sum(pool.map(_writer, tarefas))
+        duracao = time.perf_counter() - inicio
+
+        final = DataManager(backend=args.backend, data_dir=data_dir)
+        df_exames = final.load_exames()
+        novos = df_exames[df_exames['parametro'].astype(str).str.startswith('stress_')]
+        idade_final = int(final.get_paciente(ID_PACIENTE_ALVO)['idade'])
+
+        esperado_exames = args.writers * args.batches * args.rows
+        esperado_idade = idade_inicial + args.writers * args.updates
+        checks = {
+            'exames gravados': (len(novos), esperado_exames),
+            'total de exames': (len(df_exames), exames_iniciais + esperado_exames),
+            'ids de exame únicos': (novos['id_exame'].nunique(), esperado_exames),
+            'atualizações do paciente': (idade_final, esperado_idade),
+        }
+
+        print(f"Backend: {args.backend} | escritores: {args.writers} | duração: {duracao:.2f}s | conflitos resolvidos: {conflitos}")
+        ok = True
+        for nome, (obtido, esperado) in checks.items():
+            status = 'OK' if obtido == esperado else 'FALHA'
+            ok &= obtido == esperado
+            print(f"  {status:5} {nome}: {obtido} (esperado {esperado})")
+
+        raise SystemExit(0 if ok else 1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()